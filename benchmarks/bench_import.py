@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/benchmarks/bench_import.py
+Project: /workspace/code/benchmarks
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+The import time of the entry points, each import is run in a new python process (as the PBS task and the spawned worker),
+and the heavy libs loaded by the import are listed.
+With --importtime, the top cumulative imports of python -X importtime are printed.
+
+python benchmarks/bench_import.py --repeat 5
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 11:58:47 pm
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "project.main",
+    "project.trainer.train_3dcnn",
+    "project.trainer.train_2dcnn",
+    "project.helper",
+    "project.dataloader.data_loader",
+    "filter.main",
+]
+
+HEAVY = ["pytorchvideo", "matplotlib", "seaborn", "captum", "pytorch_grad_cam", "torchvision.models.optical_flow"]
+
+SNIPPET = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+print(",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def import_once(module: str) -> tuple[float, str]:
+    """import the module in a new process.
+
+    Returns:
+        tuple[float, str]: the import seconds, the loaded heavy libs.
+    """
+
+    out = subprocess.run(
+        [sys.executable, "-c", SNIPPET.format(module=module, heavy=HEAVY)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.splitlines()
+
+    return float(out[-2]), out[-1]
+
+
+def importtime(module: str, top: int) -> None:
+    """print the top cumulative imports of python -X importtime."""
+
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr.splitlines()
+
+    rows = []
+    for line in err:
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        rows.append((int(cumulative), name.strip()))
+
+    for cumulative, name in sorted(rows, reverse=True)[:top]:
+        print(f"    {cumulative / 1e6:8.3f}s {name}")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--importtime", action="store_true", help="print the top cumulative imports.")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        try:
+            results = [import_once(module) for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as e:
+            print(f"{module:<36} failed: {e.stderr.strip().splitlines()[-1]}")
+            continue
+
+        seconds = statistics.median(r[0] for r in results)
+        print(f"{module:<36} {seconds:.3f}s  heavy: {results[-1][1] or '-'}")
+
+        if args.importtime:
+            importtime(module, args.top)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/benchmarks/bench_precision.py
+Project: /workspace/code/benchmarks
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+CPU benchmark of the train step throughput with the precision and memory format options,
+same as train.precision and train.channels_last in the classifier config.
+The model is random init, so no pretrained weight is needed.
+
+python benchmarks/bench_precision.py --backbone 3dcnn --batch_size 2
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 6:02:44 pm
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+import argparse
+import time
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+def make_model(backbone: str, class_num: int) -> nn.Module:
+
+    if backbone == "3dcnn":
+        from pytorchvideo.models.hub import slow_r50
+
+        model = slow_r50(pretrained=False)
+        model.blocks[-1].proj = nn.Linear(2048, class_num)
+    else:
+        from torchvision.models import resnet50
+
+        model = resnet50(num_classes=class_num)
+
+    return model
+
+
+def make_input(backbone: str, batch_size: int, t: int, img_size: int) -> torch.Tensor:
+
+    if backbone == "3dcnn":
+        return torch.randn(batch_size, 3, t, img_size, img_size)
+
+    # the 2dcnn is frame wise, b*t frames
+    return torch.randn(batch_size * t, 3, img_size, img_size)
+
+
+def bench(model, video, label, precision: str, channels_last: bool, steps: int) -> float:
+    """the train step (forward + backward + step) per second."""
+
+    if channels_last:
+        memory_format = torch.channels_last_3d if video.dim() == 5 else torch.channels_last
+        model = model.to(memory_format=memory_format)
+        video = video.contiguous(memory_format=memory_format)
+
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-4)
+    autocast = precision == "bf16-mixed"
+
+    def step():
+        with torch.autocast("cpu", dtype=torch.bfloat16, enabled=autocast):
+            loss = F.cross_entropy(model(video), label)
+        optimizer.zero_grad(set_to_none=True)
+        loss.backward()
+        optimizer.step()
+
+    step()  # warm up
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+
+    return steps / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backbone", default="3dcnn", choices=["3dcnn", "2dcnn"])
+    parser.add_argument("--batch_size", type=int, default=2)
+    parser.add_argument("--t", type=int, default=8)
+    parser.add_argument("--img_size", type=int, default=224)
+    parser.add_argument("--class_num", type=int, default=3)
+    parser.add_argument("--steps", type=int, default=5)
+    args = parser.parse_args()
+
+    torch.manual_seed(42)
+
+    video = make_input(args.backbone, args.batch_size, args.t, args.img_size)
+    label = torch.randint(0, args.class_num, (video.shape[0],))
+
+    base = None
+    for precision in ["32-true", "bf16-mixed"]:
+        for channels_last in [False, True]:
+            model = make_model(args.backbone, args.class_num).train()
+            it_s = bench(model, video, label, precision, channels_last, args.steps)
+            base = base or it_s
+
+            print(
+                f"{args.backbone} precision={precision:<10} channels_last={str(channels_last):<5} "
+                f"{it_s:.3f} it/s ({it_s * video.shape[0]:.2f} samples/s), x{it_s / base:.2f}"
+            )
@@ -32,8 +32,6 @@ import torch
 from torch.utils.data import DataLoader
 from torchvision.transforms.v2 import functional as F, Transform
 
-from pytorchvideo.data import make_clip_sampler
-from pytorchvideo.data.labeled_video_dataset import labeled_video_dataset
 
 from filter.dataloader.filter_gait_video_dataset import (
     labeled_gait_video_dataset,
@@ -196,6 +194,9 @@ class WalkDataModule(LightningDataModule):
 
         if "whole" in self._experiment:
             # * Here we use 1s30 frames to get a static image
+            # * pytorchvideo is only imported for the whole video experiment.
+            from pytorchvideo.data import make_clip_sampler
+            from pytorchvideo.data.labeled_video_dataset import labeled_video_dataset
 
             # train dataset
             self.train_gait_dataset = labeled_video_dataset(
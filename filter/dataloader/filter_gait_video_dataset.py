@@ -28,7 +28,9 @@ import json
 from typing import Any, Callable, Dict, List, Optional, Tuple, Union, Type
 
 import torch
-from torchvision.io import read_video, write_png
+from torchvision.io import write_png
+
+from project.dataloader.utils import read_frames
 
 
 logger = logging.getLogger(__name__)
@@ -105,7 +107,7 @@ class LabeledGaitVideoDataset(torch.utils.data.Dataset):
         # load video info from json file
         video_name = file_info_dict["video_name"]
         video_path = file_info_dict["video_path"]
-        vframes, _, _ = read_video(video_path, output_format="TCHW", pts_unit="sec")
+        vframes = read_frames(video_path)
         label = file_info_dict["label"]
         disease = file_info_dict["disease"]
         gait_cycle_index = file_info_dict["gait_cycle_index"]
@@ -30,6 +30,8 @@ from imblearn.under_sampling import RandomUnderSampler
 from sklearn.model_selection import StratifiedGroupKFold, train_test_split, GroupKFold
 from pathlib import Path
 
+from project.dataloader.catalog import DatasetCatalog
+
 class_num_mapping_Dict: Dict = {
     2: {
         0: "ASD",
@@ -64,6 +66,8 @@ class DefineCrossValidation(object):
 
         self.class_num: int = config.model.model_class_num
 
+        self._catalog = None
+
     @staticmethod
     def random_sampler(X: list, y: list, train_idx: list, val_idx: list, sampler):
         # train
@@ -146,8 +150,8 @@ class DefineCrossValidation(object):
         shutil.rmtree(temp_path, ignore_errors=True)
 
         for path in val_idx:
-            with open(path) as f:
-                file_info_dict = json.load(f)
+            # the header is from the catalog, not open the json file again.
+            file_info_dict = self.catalog.header(path)
 
             video_name = file_info_dict["video_name"]
             video_path = file_info_dict["video_path"]
@@ -199,26 +203,19 @@ class DefineCrossValidation(object):
 
         return new_train_mapped_path, new_val_mapped_path
     
-    @staticmethod
-    def map_class_num(class_num: int, raw_video_path: Path) -> Dict:
-
-        _class_num = class_num_mapping_Dict[class_num]
+    @property
+    def catalog(self) -> DatasetCatalog:
+        """the catalog of the json files, scanned once."""
 
-        res_dict = {v:[] for k,v in _class_num.items()}
+        if self._catalog is None:
+            self._catalog = DatasetCatalog(self.video_path)
 
-        for disease in raw_video_path.iterdir():
+        return self._catalog
 
-            for one_json_file in disease.iterdir():
-
-                if disease.name in res_dict.keys():
-                    res_dict[disease.name].append(one_json_file)
-                elif disease.name == 'log':
-                    continue;
-                else:
-                    res_dict["non-ASD"].append(one_json_file)
-
-        return res_dict
+    @staticmethod
+    def map_class_num(class_num: int, raw_video_path: Path) -> Dict:
 
+        return DatasetCatalog(raw_video_path).map_class_num(class_num)
 
     def prepare(self):
         """define cross validation first, with the K.
@@ -236,7 +233,7 @@ class DefineCrossValidation(object):
 
         ans_fold = {}
 
-        mapped_class_Dict = self.map_class_num(self.class_num, self.video_path)
+        mapped_class_Dict = self.catalog.map_class_num(self.class_num)
 
         # define the cross validation
         # X: video path, in path.Path foramt. len = 1954
@@ -31,7 +31,8 @@ import torch.nn as nn
 
 from torchvision.transforms.functional import resize
 
-from project.models.make_model import MakeVideoModule, MakeImageModule, MakeViTModule
+from project.models.make_model import MakeVideoModule, MakeImageModule
+from project.utils.checkpoint import load_lightning_state_dict
 
 class Filter(nn.Module):
 
@@ -39,8 +40,15 @@ class Filter(nn.Module):
         
         super(Filter, self).__init__()
 
-        self.gpu_num = hparams.train.gpu_num
+        # the device can be override by filter.device, e.g. cpu for the inference node.
+        self.gpu_num = hparams.filter.get("device", hparams.train.gpu_num)
         self.phase = hparams.filter.phase
+
+        # the int8 model made by filter.filter_score.quantize, only run on cpu.
+        self.quantize = hparams.filter.get("quantize", False)
+        if self.quantize:
+            self.gpu_num = "cpu"
+            torch.backends.quantized.engine = hparams.filter.get("quantize_backend", "x86")
         self._IMG_SIZE = hparams.data.img_size
 
         self.init_filter_model(hparams)
@@ -53,8 +61,6 @@ class Filter(nn.Module):
             model = MakeVideoModule(hparams).make_resnet()
         elif filter_model == "2dcnn":
             model = MakeImageModule(hparams).make_resnet()
-        elif filter_model == "vit":
-            model = MakeViTModule(hparams).make_vit()
         else:
             raise ValueError(f"the {filter_model} is not supported.")
         
@@ -68,16 +74,12 @@ class Filter(nn.Module):
             # * load the stance and swing model
 
             stance_ckpt_path = os.path.join(hparams.filter.path, "stance", f"{hparams.train.current_fold}_best_model.ckpt")
-            self.stance_model = self.load_model(hparams)
-            _ckpt = self.convert_to_torch_model(stance_ckpt_path)
-            self.stance_model.load_state_dict((_ckpt['state_dict']))
+            self.stance_model = self.load_phase_model(hparams, stance_ckpt_path)
 
             # logging.info(f"load stance model from {stance_ckpt_path}")
 
             swing_ckpt_path = os.path.join(hparams.filter.path, "swing", f"{hparams.train.current_fold}_best_model.ckpt")
-            self.swing_model = self.load_model(hparams)
-            _ckpt = self.convert_to_torch_model(swing_ckpt_path)
-            self.swing_model.load_state_dict((_ckpt['state_dict']))
+            self.swing_model = self.load_phase_model(hparams, swing_ckpt_path)
 
             # logging.info(f"load swing model from {swing_ckpt_path}")
 
@@ -85,14 +87,39 @@ class Filter(nn.Module):
 
             # * load the model
             ckpt_path = os.path.join(hparams.filter.path, hparams.filter.phase, f"{hparams.train.current_fold}_best_model.ckpt")
-            self._model = self.load_model(hparams)
-            _ckpt = self.convert_to_torch_model(ckpt_path)
-            self._model.load_state_dict(_ckpt['state_dict'])
+            self._model = self.load_phase_model(hparams, ckpt_path)
 
             # logging.info(f"load model from {ckpt_path}")
 
+    def load_phase_model(self, hparams, ckpt_path: str) -> nn.Module:
+        """load the filter model of one phase, in eval mode.
+        When filter.quantize, load the int8 TorchScript model saved beside the ckpt.
+
+        Args:
+            hparams (hydra): the hyperparameters.
+            ckpt_path (str): the lightning ckpt path, {path}/{phase}/{fold}_best_model.ckpt
+
+        Returns:
+            nn.Module: the filter model.
+        """
+
+        if self.quantize:
+            int8_path = ckpt_path.replace(".ckpt", "_int8.pt")
+            if not os.path.exists(int8_path):
+                raise FileNotFoundError(
+                    f"{int8_path} not found, run python -m filter.filter_score.quantize first."
+                )
+            return torch.jit.load(int8_path, map_location="cpu").eval()
+
+        model = self.load_model(hparams)
+        _ckpt = self.convert_to_torch_model(ckpt_path)
+        model.load_state_dict(_ckpt['state_dict'])
+
+        return model.eval()
+
     def convert_to_torch_model(self, ckpt_path: str) -> Dict[str, Any]:
-        """convert pytorch lightning model to torch model
+        """convert pytorch lightning model to torch model.
+        The ckpt is mmap loaded and cached in the process, the model. prefix is stripped lazily.
 
         Args:
             ckpt_path (str): ckpt path
@@ -101,13 +128,7 @@ class Filter(nn.Module):
             Dict[str, Any]: loaded model info
         """
 
-        _ckpt = torch.load(ckpt_path)
-        
-        for k in list(_ckpt['state_dict'].keys()):
-            if k.startswith('model.'):
-                _ckpt['state_dict'][k[6:]] = _ckpt['state_dict'].pop(k)
-
-        return _ckpt
+        return {'state_dict': load_lightning_state_dict(ckpt_path, 'model.')}
 
     def preprocess(self, vframes: list[torch.Tensor]) -> torch.Tensor:
         """preprocess the video frames
@@ -132,7 +153,7 @@ class Filter(nn.Module):
 
         Args:
             phase (List[torch.Tensor]): phase with video frames
-            label (_type_): phase label
+            label (_type_): phase label, when None (new patient without diagnosis), use the max score over classes.
             model (nn.Module): filter model
 
         Returns:
@@ -153,7 +174,10 @@ class Filter(nn.Module):
 
             # compare the phase prediction with the phase_idx
             # extract the score of each sample on its target category
-            filtered_scores = one_phase_preds[:, label]
+            if label is None:
+                filtered_scores = one_phase_preds.max(dim=1).values
+            else:
+                filtered_scores = one_phase_preds[:, label]
 
             # sort the scores, return the sorted indices
             sorted_indices = torch.argsort(filtered_scores, descending=True)
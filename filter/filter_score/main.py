@@ -32,9 +32,10 @@ import multiprocessing
 from tqdm import tqdm
 
 import torch
-from torchvision.io import read_video
 
-from project.filter_score.filter import Filter
+from filter.filter_score.filter import Filter
+from project.dataloader.catalog import DatasetCatalog
+from project.dataloader.utils import read_frames
 
 class_num_mapping_Dict: Dict = {
     2: {
@@ -78,22 +79,24 @@ def split_gait_cycle(video_tensor: torch.Tensor, gait_cycle_index: list, gait_cy
 
 def map_class_num(class_num: int, raw_video_path: Path) -> Dict:
 
-    _class_num = class_num_mapping_Dict[class_num]
+    return DatasetCatalog(raw_video_path).map_class_num(class_num)
 
-    res_dict = {v:[] for k,v in _class_num.items()}
+# * the filter model of each fold, built once in the process and used for all the videos.
+# * all the fold models (two per fold for the mix phase) stay on the device in each disease process,
+# * set filter.cache_models=False to build them again for each video when the gpu memory is not enough.
+_FILTER_CACHE: Dict[int, Filter] = {}
 
-    for disease in raw_video_path.iterdir():
+def get_filter(config, fold_idx: int) -> Filter:
 
-        for one_json_file in disease.iterdir():
+    if not config.filter.get("cache_models", True):
+        config.train.current_fold = fold_idx
+        return Filter(config)
 
-            if disease.name in res_dict.keys():
-                res_dict[disease.name].append(one_json_file)
-            elif disease.name == 'log':
-                continue;
-            else:
-                res_dict["non-ASD"].append(one_json_file)
+    if fold_idx not in _FILTER_CACHE:
+        config.train.current_fold = fold_idx
+        _FILTER_CACHE[fold_idx] = Filter(config)
 
-    return res_dict
+    return _FILTER_CACHE[fold_idx]
 
 def inference_one_path(one_path: Path, config) -> Dict:
 
@@ -103,7 +106,8 @@ def inference_one_path(one_path: Path, config) -> Dict:
     # load video info from json file
     video_name = file_info_dict["video_name"]
     video_path = file_info_dict["video_path"]
-    vframes, _, _ = read_video(video_path, output_format="TCHW", pts_unit="sec")
+    # * the video or the jpg archive (.pt) of the precrop exporter.
+    vframes = read_frames(video_path)
     label = file_info_dict["label"]
     disease = file_info_dict["disease"]
     gait_cycle_index = file_info_dict["gait_cycle_index"]
@@ -124,8 +128,7 @@ def inference_one_path(one_path: Path, config) -> Dict:
 
     for fold_idx in range(config.train.fold):
 
-        config.train.current_fold = fold_idx
-        filter_model = Filter(config)
+        filter_model = get_filter(config, fold_idx)
 
         filtered_res: dict = filter_model(filter_info)
 
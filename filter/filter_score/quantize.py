@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''
+File: /workspace/project/filter/filter_score/quantize.py
+Project: /workspace/project/filter/filter_score
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+Post-training static INT8 quantization of the filter model, for the cpu only scoring node.
+The ResNet-50 filter model is quantized with the FX graph mode, calibrated on the phases from the json dataset.
+The int8 model is saved as TorchScript beside the ckpt, {path}/{phase}/{fold}_best_model_int8.pt,
+and used by the Filter when filter.quantize=True.
+The throughput and the top-k frame ranking agreement against fp32 are saved into quantize_report.json.
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 5:21:09 pm
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+'''
+
+import os
+import json
+import time
+import random
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import hydra
+from omegaconf import open_dict
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+from filter.filter_score.filter import Filter
+from filter.filter_score.main import split_gait_cycle
+from project.dataloader.utils import read_frames
+
+logger = logging.getLogger(__name__)
+
+
+def iter_phases(json_path_list: List[Path], root_path: str, keys: List[str]) -> Iterator[torch.Tensor]:
+    """the phase frames of the json files, one video is decoded at a time and released after its phases.
+
+    Args:
+        json_path_list (List[Path]): the json file list.
+        root_path (str): the data.root_path, replace the /workspace/data in the video_path.
+        keys (List[str]): first_phase and (or) second_phase.
+
+    Yields:
+        torch.Tensor: one phase frames, t, c, h, w
+    """
+
+    for one_path in json_path_list:
+        with open(one_path, "r") as f:
+            file_info_dict = json.load(f)
+
+        vframes = read_frames(file_info_dict["video_path"].replace("/workspace/data", root_path))
+        gait_cycle_index = file_info_dict["gait_cycle_index"]
+
+        for key in keys:
+            phases, _ = split_gait_cycle(vframes, gait_cycle_index, 0 if key == "first_phase" else 1)
+            yield from phases
+
+
+def quantize_model(
+    model: nn.Module, calib_frames: Iterable[torch.Tensor], backend: str = "x86"
+) -> Tuple[nn.Module, torch.Tensor]:
+    """static int8 quantization with the FX graph mode.
+
+    Args:
+        model (nn.Module): the fp32 filter model on cpu.
+        calib_frames (Iterable[torch.Tensor]): the preprocessed phase frames for calibration, t, c, h, w
+        backend (str, optional): the quantized engine, x86 or qnnpack. Defaults to "x86".
+
+    Raises:
+        ValueError: no calibration frames.
+
+    Returns:
+        Tuple[nn.Module, torch.Tensor]: the int8 model, and the first calibration frames as the example input.
+    """
+
+    torch.backends.quantized.engine = backend
+
+    calib_frames = iter(calib_frames)
+    example = next(calib_frames, None)
+    if example is None:
+        raise ValueError("no calibration phase, check quantize.calib_num.")
+
+    model = model.eval()
+
+    prepared = prepare_fx(model, get_default_qconfig_mapping(backend), (example,))
+
+    # * calibrate the activation observer, one phase at a time.
+    with torch.no_grad():
+        prepared(example)
+        for frames in calib_frames:
+            prepared(frames)
+
+    return convert_fx(prepared), example
+
+
+def elapsed(model: nn.Module, frames: torch.Tensor) -> float:
+    """the seconds of one forward."""
+
+    start = time.perf_counter()
+    with torch.no_grad():
+        model(frames)
+
+    return time.perf_counter() - start
+
+
+def topk_agreement(
+    fp32_sorted_idx: List[List[int]], int8_sorted_idx: List[List[int]], k: int
+) -> float:
+    """the mean overlap of the top-k frame index between fp32 and int8.
+
+    Args:
+        fp32_sorted_idx (List[List[int]]): the sorted frame index of each phase from fp32.
+        int8_sorted_idx (List[List[int]]): the sorted frame index of each phase from int8.
+        k (int): the top-k.
+
+    Returns:
+        float: the agreement, 1.0 is the same top-k frames.
+    """
+
+    agreement = []
+
+    for fp32_idx, int8_idx in zip(fp32_sorted_idx, int8_sorted_idx):
+        _k = min(k, len(fp32_idx))
+        if _k == 0:
+            continue
+        agreement.append(len(set(fp32_idx[:_k]) & set(int8_idx[:_k])) / _k)
+
+    return sum(agreement) / max(len(agreement), 1)
+
+
+def quantize_one_phase(
+    config,
+    filter_model: Filter,
+    model: nn.Module,
+    calib_phases: Iterable[torch.Tensor],
+    bench_phases: Iterable[torch.Tensor],
+) -> Tuple[torch.jit.ScriptModule, Dict[str, float]]:
+    """quantize the filter model of one phase, and compare with the fp32 model.
+    The phases are consumed one by one, no phase of all the videos is kept in memory.
+
+    Args:
+        config (hydra): the hyperparameters.
+        filter_model (Filter): the fp32 Filter, used for preprocess and inference.
+        model (nn.Module): the fp32 model of this phase.
+        calib_phases (Iterable[torch.Tensor]): the phase frames of the calibration videos, t, c, h, w
+        bench_phases (Iterable[torch.Tensor]): the phase frames of the benchmark videos (not in the calibration), t, c, h, w
+
+    Raises:
+        ValueError: no calibration or benchmark phase.
+
+    Returns:
+        Tuple[torch.jit.ScriptModule, Dict[str, float]]: the int8 TorchScript model and the report.
+    """
+
+    int8_model, example = quantize_model(
+        model, (filter_model.preprocess(p) for p in calib_phases), config.filter.quantize_backend
+    )
+    int8_model = torch.jit.trace(int8_model, example)
+
+    # * warm up with the example, then time each benchmark phase.
+    elapsed(model, example)
+    elapsed(int8_model, example)
+
+    fp32_time, int8_time, frame_num = 0.0, 0.0, 0
+    agreement = []
+
+    for phase in bench_phases:
+        frames = filter_model.preprocess(phase)
+        fp32_time += elapsed(model, frames)
+        int8_time += elapsed(int8_model, frames)
+        frame_num += frames.shape[0]
+
+        # * the new data has no label, so compare the ranking with the max score over classes.
+        _, fp32_sorted_idx = filter_model.inference([phase], None, model)
+        _, int8_sorted_idx = filter_model.inference([phase], None, int8_model)
+        agreement.append(topk_agreement(fp32_sorted_idx, int8_sorted_idx, config.quantize.top_k))
+
+    if frame_num == 0:
+        raise ValueError("no benchmark phase, check quantize.bench_num.")
+
+    fp32_fps, int8_fps = frame_num / fp32_time, frame_num / int8_time
+
+    report = {
+        "fp32_fps": fp32_fps,
+        "int8_fps": int8_fps,
+        "speedup": int8_fps / fp32_fps,
+        f"top{config.quantize.top_k}_agreement": sum(agreement) / max(len(agreement), 1),
+    }
+
+    return int8_model, report
+
+
+@hydra.main(
+    version_base=None,
+    config_path="../../configs",  # * the config_path is relative to location of the python script
+    config_name="filter_score.yaml",
+)
+def init_params(config):
+
+    if config.quantize.num_threads is not None:
+        torch.set_num_threads(config.quantize.num_threads)
+
+    # * the fp32 model on cpu, as the baseline and the quantize input.
+    with open_dict(config):
+        config.filter.device = "cpu"
+        config.filter.quantize = False
+
+    json_path_list = sorted(Path(config.data.gait_seg_data_path).rglob("*.json"))
+    random.Random(42).shuffle(json_path_list)
+
+    # * the calibration and the benchmark are split by the video, the benchmark never sees the calibration videos.
+    calib_num, bench_num = config.quantize.calib_num, config.quantize.bench_num
+    calib_paths = json_path_list[:calib_num]
+    bench_paths = json_path_list[calib_num : calib_num + bench_num]
+
+    if len(calib_paths) < calib_num or len(bench_paths) < bench_num:
+        raise ValueError(
+            f"{len(json_path_list)} json files, less than quantize.calib_num {calib_num} + quantize.bench_num {bench_num}."
+        )
+
+    # * the videos are decoded again for each model, instead of keeping all the phases in memory.
+    root_path = config.data.get("root_path", "/workspace/data")
+    logger.info(f"{len(calib_paths)} calibration json files, {len(bench_paths)} benchmark json files")
+
+    report = {}
+
+    for fold in range(config.train.fold):
+
+        config.train.current_fold = fold
+        filter_model = Filter(config)
+
+        if config.filter.phase == "mix":
+            phase_models = {
+                "stance": (filter_model.stance_model, ["first_phase"]),
+                "swing": (filter_model.swing_model, ["second_phase"]),
+            }
+        else:
+            phase_models = {
+                config.filter.phase: (filter_model._model, ["first_phase", "second_phase"])
+            }
+
+        for phase, (model, keys) in phase_models.items():
+
+            int8_model, one_report = quantize_one_phase(
+                config,
+                filter_model,
+                model,
+                iter_phases(calib_paths, root_path, keys),
+                iter_phases(bench_paths, root_path, keys),
+            )
+
+            int8_path = Path(config.filter.path) / phase / f"{fold}_best_model_int8.pt"
+            int8_model.save(str(int8_path))
+
+            report[f"{phase}_fold{fold}"] = one_report
+            logger.info(f"save the int8 model to {int8_path}, {one_report}")
+
+    save_path = Path(config.train.log_path)
+    save_path.mkdir(parents=True, exist_ok=True)
+
+    with open(save_path / "quantize_report.json", "w") as f:
+        json.dump(report, f, indent=4)
+
+
+if __name__ == '__main__':
+
+    os.environ["HYDRA_FULL_ERROR"] = "1"
+    init_params()
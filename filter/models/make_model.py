@@ -27,7 +27,7 @@ from typing import Any, List
 import torch
 import torch.nn as nn
 
-from torchvision.models import resnet101, ResNet101_Weights
+from project.models.factory import make_pretrained
 
 
 class MakeVideoModule(nn.Module):
@@ -43,12 +43,12 @@ class MakeVideoModule(nn.Module):
         self.model_name = hparams.model.model
         self.model_class_num = hparams.model.model_class_num
         self.model_depth = hparams.model.model_depth
+        self.ckpt = hparams.ckpt
 
     def make_resnet(self, input_channel: int = 3) -> nn.Module:
 
-        slow = torch.hub.load(
-            "facebookresearch/pytorchvideo", "slow_r50", pretrained=True
-        )
+        # * the local weight only (cache or ckpt.res3dcnn), not the torch.hub.
+        slow = make_pretrained("slow_r50", "res3dcnn", self.ckpt)
 
         # for the folw model and rgb model
         slow.blocks[0].conv = nn.Conv3d(
@@ -84,10 +84,12 @@ class MakeImageModule(nn.Module):
 
         self.model_name = hparams.model.model
         self.model_class_num = hparams.model.model_class_num
+        self.ckpt = hparams.ckpt
 
     def make_resnet(self, input_channel: int = 3) -> nn.Module:
 
-        model = torch.hub.load("pytorch/vision:v0.10.0", "resnet50", pretrained=True)
+        # * the local weight only (cache or ckpt.res2dcnn), not the torch.hub.
+        model = make_pretrained("resnet50", "res2dcnn", self.ckpt)
         model.conv1 = nn.Conv2d(
             input_channel, 64, kernel_size=7, stride=2, padding=3, bias=False
         )
@@ -97,7 +99,7 @@ class MakeImageModule(nn.Module):
 
     def make_resnet101(self, input_channel:int = 3) -> nn.Module:
 
-        model = resnet101(weights=ResNet101_Weights.DEFAULT)
+        model = make_pretrained("resnet101", "res101dcnn", self.ckpt)
 
         model.conv1 = nn.Conv2d(input_channel, 64, kernel_size=7, stride=2, padding=3, bias=False)
         model.fc = nn.Linear(2048, self.model_class_num)
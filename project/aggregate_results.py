@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/project/aggregate_results.py
+Project: /workspace/code/project
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+Aggregate the cross-fold results under one log root.
+Every {run}/best_preds/{fold}_pred.pt and {fold}_label.pt under the log root is loaded (mmap),
+then the per-fold mean ± std, the pooled metrics over all folds, the bootstrap confidence interval
+and the combined confusion matrix are saved into one json and one csv file.
+
+python -m project.aggregate_results --log_root logs/classifier
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 8:31:55 pm
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+import argparse
+import csv
+import json
+import logging
+from pathlib import Path
+
+import torch
+
+from project.helper import compute_metrics
+
+logger = logging.getLogger(__name__)
+
+SCALAR_METRICS = ["accuracy", "precision", "recall", "f1_score", "aurroc"]
+
+
+def load_tensor(path: Path) -> torch.Tensor:
+    """load the saved tensor with mmap, the old (non zip) format fallback to the normal load."""
+
+    try:
+        return torch.load(path, map_location="cpu", mmap=True)
+    except (RuntimeError, TypeError):
+        return torch.load(path, map_location="cpu")
+
+
+def load_run(pred_path: Path) -> dict[str, tuple[torch.Tensor, torch.Tensor]]:
+    """load the pred and label of all the folds in one run.
+
+    Args:
+        pred_path (Path): the best_preds path of one run.
+
+    Returns:
+        dict[str, tuple[torch.Tensor, torch.Tensor]]: fold to (pred, label).
+    """
+
+    res = {}
+
+    for pred_file in sorted(pred_path.glob("*_pred.pt")):
+        fold = pred_file.name[: -len("_pred.pt")]
+        label_file = pred_path / f"{fold}_label.pt"
+
+        if not label_file.exists():
+            logger.warning(f"the label of {pred_file} is not found, skip.")
+            continue
+
+        res[fold] = (load_tensor(pred_file).float(), load_tensor(label_file).long())
+
+    return res
+
+
+def confusion_counts(pred: torch.Tensor, label: torch.Tensor, num_class: int) -> torch.Tensor:
+    """the confusion matrix count, row is the label, column is the pred.
+
+    Args:
+        pred (torch.Tensor): the pred class, n or b, n
+        label (torch.Tensor): the label, n or b, n
+        num_class (int): number of class.
+
+    Returns:
+        torch.Tensor: num_class, num_class or b, num_class, num_class
+    """
+
+    single = pred.dim() == 1
+    if single:
+        pred, label = pred.unsqueeze(0), label.unsqueeze(0)
+
+    b = pred.shape[0]
+
+    # the offset of each batch, so all the batch are counted with one bincount.
+    offset = torch.arange(b).unsqueeze(1) * num_class * num_class
+    flat = (offset + label * num_class + pred).reshape(-1)
+
+    counts = torch.bincount(flat, minlength=b * num_class * num_class)
+    counts = counts.view(b, num_class, num_class)
+
+    return counts[0] if single else counts
+
+
+def metrics_from_counts(counts: torch.Tensor) -> dict[str, torch.Tensor]:
+    """the accuracy and macro precision/recall/f1 from the confusion matrix count.
+
+    Args:
+        counts (torch.Tensor): ..., num_class, num_class
+
+    Returns:
+        dict[str, torch.Tensor]: the metric name and value, with the batch shape.
+    """
+
+    counts = counts.float()
+    tp = counts.diagonal(dim1=-2, dim2=-1)
+    fp = counts.sum(dim=-2) - tp
+    fn = counts.sum(dim=-1) - tp
+
+    # * the zero division is 0, same as the torchmetrics default.
+    precision = tp / (tp + fp).clamp(min=1)
+    recall = tp / (tp + fn).clamp(min=1)
+    f1_score = 2 * tp / (2 * tp + fp + fn).clamp(min=1)
+
+    # * same as the torchmetrics macro average, the class neither in the label nor in the pred is not averaged,
+    # * the class only in the label or only in the pred is averaged as 0.
+    weights = (tp + fp + fn > 0).float()
+
+    def macro(score: torch.Tensor) -> torch.Tensor:
+        return (score * weights).sum(dim=-1) / weights.sum(dim=-1).clamp(min=1)
+
+    return {
+        "accuracy": macro(recall),  # torchmetrics MulticlassAccuracy is macro by default
+        "precision": macro(precision),
+        "recall": macro(recall),
+        "f1_score": macro(f1_score),
+    }
+
+
+def bootstrap_ci(
+    pred: torch.Tensor,
+    label: torch.Tensor,
+    num_class: int,
+    num_samples: int = 1000,
+    alpha: float = 0.05,
+    seed: int = 42,
+    max_elements: int = 1 << 24,
+) -> dict[str, tuple[float, float]]:
+    """the bootstrap confidence interval of the pooled metrics, the resamples are computed chunk by chunk.
+
+    Args:
+        pred (torch.Tensor): the softmax pred, n, class_num
+        label (torch.Tensor): the label, n
+        num_class (int): number of class.
+        num_samples (int, optional): the bootstrap resample number. Defaults to 1000.
+        alpha (float, optional): the significance level. Defaults to 0.05.
+        seed (int, optional): the random seed. Defaults to 42.
+        max_elements (int, optional): the max resample index number of one chunk, bounds the memory. Defaults to 1 << 24.
+
+    Returns:
+        dict[str, tuple[float, float]]: the metric name and (low, high).
+    """
+
+    generator = torch.Generator().manual_seed(seed)
+    n = label.shape[0]
+
+    pred_class = pred.argmax(dim=1)
+    chunk = max(1, min(num_samples, max_elements // max(n, 1)))
+
+    res: dict[str, list[torch.Tensor]] = {}
+    for start in range(0, num_samples, chunk):
+        idx = torch.randint(0, n, (min(chunk, num_samples - start), n), generator=generator)
+        counts = confusion_counts(pred_class[idx], label[idx], num_class)
+
+        for name, value in metrics_from_counts(counts).items():
+            res.setdefault(name, []).append(value)
+
+    q = torch.tensor([alpha / 2, 1 - alpha / 2])
+
+    return {
+        name: tuple(torch.quantile(torch.cat(value), q).tolist())
+        for name, value in res.items()
+    }
+
+
+def aggregate_run(
+    folds: dict[str, tuple[torch.Tensor, torch.Tensor]],
+    num_class: int,
+    num_samples: int,
+) -> dict:
+    """aggregate all the folds of one run.
+
+    Args:
+        folds (dict[str, tuple[torch.Tensor, torch.Tensor]]): fold to (pred, label).
+        num_class (int): number of class.
+        num_samples (int): the bootstrap resample number.
+
+    Returns:
+        dict: the structured result of one run.
+    """
+
+    fold_metrics = {
+        fold: compute_metrics([pred], [label], num_class) for fold, (pred, label) in folds.items()
+    }
+
+    pred = torch.cat([p for p, _ in folds.values()], dim=0)
+    label = torch.cat([l for _, l in folds.values()], dim=0)
+    pooled = compute_metrics([pred], [label], num_class)
+
+    ci = bootstrap_ci(pred, label, num_class, num_samples)
+
+    summary = {}
+    for name in SCALAR_METRICS:
+        values = torch.stack([m[name].float() for m in fold_metrics.values()])
+        summary[name] = {
+            "mean": values.mean().item(),
+            "std": values.std().item() if values.numel() > 1 else 0.0,
+            "pooled": pooled[name].item(),
+            "ci": ci.get(name),
+        }
+
+    counts = confusion_counts(pred.argmax(dim=1), label, num_class)
+
+    return {
+        "fold_num": len(folds),
+        "sample_num": label.shape[0],
+        "folds": {
+            fold: {name: m[name].item() for name in SCALAR_METRICS}
+            for fold, m in fold_metrics.items()
+        },
+        "summary": summary,
+        "confusion_matrix": counts.tolist(),
+        "confusion_matrix_normalized": pooled["confusion_matrix"].tolist(),
+    }
+
+
+def save_results(results: dict, save_path: Path):
+    """save the results into json, and the summary into csv, one row for one run/metric."""
+
+    with open(save_path.with_suffix(".json"), "w") as f:
+        json.dump(results, f, indent=4)
+
+    with open(save_path.with_suffix(".csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["run", "fold_num", "metric", "mean", "std", "pooled", "ci_low", "ci_high"])
+
+        for run, res in results.items():
+            for name, value in res["summary"].items():
+                ci_low, ci_high = value["ci"] if value["ci"] is not None else ("", "")
+                writer.writerow(
+                    [run, res["fold_num"], name, value["mean"], value["std"], value["pooled"], ci_low, ci_high]
+                )
+
+    logger.info(f"save the results into {save_path}.json/.csv")
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="aggregate the cross-fold results under the log root.")
+    parser.add_argument("--log_root", type=str, required=True, help="the log root, search all the best_preds under it.")
+    parser.add_argument("--num_class", type=int, default=3)
+    parser.add_argument("--bootstrap", type=int, default=1000, help="the bootstrap resample number.")
+    parser.add_argument("--save_name", type=str, default="results_summary")
+    args = parser.parse_args()
+
+    log_root = Path(args.log_root)
+    results = {}
+
+    for pred_path in sorted(log_root.rglob("best_preds")):
+        folds = load_run(pred_path)
+        if not folds:
+            continue
+
+        run = str(pred_path.parent.relative_to(log_root))
+        results[run] = aggregate_run(folds, args.num_class, args.bootstrap)
+
+        logger.info(
+            f"{run}: "
+            + ", ".join(
+                f"{k} {v['mean']:.4f}±{v['std']:.4f}" for k, v in results[run]["summary"].items()
+            )
+        )
+
+    save_results(results, log_root / args.save_name)
@@ -20,7 +20,8 @@ Date      	By	Comments
 ----------	---	---------------------------------------------------------
 """
 
-import os, json, shutil, copy, random
+import os, json, shutil, copy, random, hashlib
+import logging
 from typing import Any, Dict, List, Tuple
 
 from imblearn.over_sampling import RandomOverSampler
@@ -30,6 +31,10 @@ from imblearn.under_sampling import RandomUnderSampler
 from sklearn.model_selection import StratifiedGroupKFold, train_test_split, GroupKFold
 from pathlib import Path
 
+from project.dataloader.catalog import DatasetCatalog
+
+logger = logging.getLogger(__name__)
+
 class_num_mapping_Dict: Dict = {
     2: {0: "ASD", 1: "non-ASD"},
     3: {0: "ASD", 1: "DHS", 2: "LCS_HipOA"},
@@ -57,6 +62,8 @@ class DefineCrossValidation(object):
 
         self.filter_method: str = config.train.filter_method
 
+        self._catalog = None
+
     @staticmethod
     def random_sampler(X: list, y: list, train_idx: list, val_idx: list, sampler):
         # train
@@ -146,8 +153,8 @@ class DefineCrossValidation(object):
         shutil.rmtree(temp_path, ignore_errors=True)
 
         for path in val_idx:
-            with open(path) as f:
-                file_info_dict = json.load(f)
+            # the header is from the catalog, not open the json file again.
+            file_info_dict = self.catalog.header(path)
 
             video_name = file_info_dict["video_name"]
             video_path = file_info_dict["video_path"]
@@ -167,68 +174,93 @@ class DefineCrossValidation(object):
 
     @staticmethod
     def magic_move(train_mapped_path, val_mapped_path):
+        """move the non-ASD video between the train and val split.
+        For each patient name (the prefix before "-"), the last path in train is moved to val,
+        and the last path in val is moved to train. Only the first occurrence of the moved path is removed,
+        the other oversampled duplicates are kept.
 
-        new_train_mapped_path = copy.deepcopy(train_mapped_path)
-        new_val_mapped_path = copy.deepcopy(val_mapped_path)
+        Args:
+            train_mapped_path (list): the train path.
+            val_mapped_path (list): the val path.
 
-        # train magic
-        train_tmp_dict = {}
-        for i in train_mapped_path:
-            # not move ASD
-            if "ASD" in i.name:
-                continue
+        Returns:
+            tuple[list, list]: the new train and val path.
+        """
 
-            train_tmp_dict[i.name.split("-")[0]] = i
+        def _moved(mapped_path: list) -> list:
+            # * one path for one name, the dict keep the first insert order and the last value.
+            tmp_dict = {}
+            for i in mapped_path:
+                # not move ASD
+                if "ASD" in i.name:
+                    continue
+                tmp_dict[i.name.split("-")[0]] = i
+            return list(tmp_dict.values())
+
+        def _remove_first(mapped_path: list, moved: list) -> list:
+            # remove the first occurrence of each moved path in one pass.
+            pending = set(moved)
+            res = []
+            for i in mapped_path:
+                if i in pending:
+                    pending.discard(i)
+                    continue
+                res.append(i)
+            return res
 
-        val_tmp_dict = {}
-        for i in val_mapped_path:
-            # not move ASD
-            if "ASD" in i.name:
-                continue
-            val_tmp_dict[i.name.split("-")[0]] = i
+        train_moved = _moved(train_mapped_path)
+        val_moved = _moved(val_mapped_path)
 
-        for k, v in train_tmp_dict.items():
-            new_val_mapped_path.append(v)
+        new_train_mapped_path = _remove_first(train_mapped_path, train_moved) + val_moved
+        new_val_mapped_path = _remove_first(val_mapped_path, val_moved) + train_moved
 
-            rm_idx = new_train_mapped_path.index(v)
-            new_train_mapped_path.pop(rm_idx)
+        return new_train_mapped_path, new_val_mapped_path
 
-        for k, v in val_tmp_dict.items():
-            new_train_mapped_path.append(v)
+    @property
+    def catalog(self) -> DatasetCatalog:
+        """the catalog of the json files, scanned once."""
 
-            rm_idx = new_val_mapped_path.index(v)
-            new_val_mapped_path.pop(rm_idx)
+        if self._catalog is None:
+            self._catalog = DatasetCatalog(self.video_path)
 
-        return new_train_mapped_path, new_val_mapped_path
+        return self._catalog
 
     @staticmethod
     def map_class_num(class_num: int, raw_video_path: Path) -> Dict:
 
-        _class_num = class_num_mapping_Dict[class_num]
+        return DatasetCatalog(raw_video_path).map_class_num(class_num)
 
-        res_dict = {v: [] for k, v in _class_num.items()}
+    def split_key(self, mapped_class_Dict: Dict) -> str:
+        """the hash key of the split index file.
+        The key is made by the json file list with mtime, and the K, sampler, class_num, filter_method.
+        So the changed dataset or config will make a new split, the same one will reuse the cached split.
 
-        for disease in raw_video_path.iterdir():
+        Args:
+            mapped_class_Dict (Dict): the disease to json file path list, from map_class_num.
 
-            for one_json_file in disease.iterdir():
+        Returns:
+            str: the hash key.
+        """
 
-                if disease.name in res_dict.keys():
-                    res_dict[disease.name].append(one_json_file)
-                elif disease.name == "log":
-                    continue
-                else:
-                    res_dict["non-ASD"].append(one_json_file)
+        h = hashlib.sha256()
 
-        return res_dict
+        for disease in sorted(mapped_class_Dict.keys()):
+            for path in sorted(mapped_class_Dict[disease]):
+                h.update(f"{disease}:{path}:{self.catalog.mtime_ns(path)}\n".encode())
 
-    def prepare(self):
+        h.update(
+            f"K={self.K},sampler={self.sampler},class_num={self.class_num},filter_method={self.filter_method}".encode()
+        )
+
+        return h.hexdigest()[:16]
+
+    def prepare(self, mapped_class_Dict: Dict = None):
         """define cross validation first, with the K.
         #! the 1 fold and K fold should return the same format.
         fold: [train/val]: [path]
 
         Args:
-            video_path (str): the index of the video path, in .json format.
-            K (int, optional): crossed number of validation. Defaults to 5, can be 1 or K.
+            mapped_class_Dict (Dict, optional): the disease to json file path list, if None, scan the video_path.
 
         Returns:
             list: the format like upper.
@@ -237,7 +269,8 @@ class DefineCrossValidation(object):
 
         ans_fold = {}
 
-        mapped_class_Dict = self.map_class_num(self.class_num, self.video_path)
+        if mapped_class_Dict is None:
+            mapped_class_Dict = self.catalog.map_class_num(self.class_num)
 
         # define the cross validation
         # X: video path, in path.Path foramt. len = 1954
@@ -287,63 +320,46 @@ class DefineCrossValidation(object):
 
     def __call__(self, *args: Any, **kwds: Any) -> Any:
 
-        target_path = self.gait_seg_idx_path / str(self.class_num) 
+        mapped_class_Dict = self.catalog.map_class_num(self.class_num)
 
-        # * when json file changed, need to reprocess the dataset.
-        if not os.path.exists(target_path):
-
-            fold_dataset_idx, *_ = self.prepare()
+        # * the index file is keyed by the dataset and the split config, when json file changed, a new split is made.
+        split_key = self.split_key(mapped_class_Dict)
+        index_file = (
+            self.gait_seg_idx_path
+            / str(self.class_num)
+            / f"{self.filter_method}_{split_key}_index.json"
+        )
 
-            json_fold_dataset_idx = copy.deepcopy(fold_dataset_idx)
+        if index_file.exists():
+            with open(index_file, "r") as f:
+                fold_dataset_idx = json.load(f)
 
+            # unpack the
             for k, v in fold_dataset_idx.items():
+                # train mapping, include the gait cycle index
+                fold_dataset_idx[k][0] = [Path(i) for i in v[0]]
 
-                # train mapping path, include the gait cycle index
-                train_mapping_idx = v[0]
-                json_fold_dataset_idx[k][0] = [str(i) for i in train_mapping_idx]
-
-                val_mapping_idx = v[1]
-                json_fold_dataset_idx[k][1] = [str(i) for i in val_mapping_idx]
+                # val mapping, include the gait cycle index
+                fold_dataset_idx[k][1] = [Path(i) for i in v[1]]
 
-                # train video path
-                # train_video_idx = v[2]
-                # json_fold_dataset_idx[k][2] = str(train_video_idx)
+            logger.info(f"load the cached split index from {index_file}")
 
-                # # val video path
-                # val_dataset_idx = v[3]
-                # json_fold_dataset_idx[k][3] = str(val_dataset_idx)
+        else:
+            fold_dataset_idx, *_ = self.prepare(mapped_class_Dict)
 
-            _save_path = self.gait_seg_idx_path / str(self.class_num)
+            json_fold_dataset_idx = {
+                k: [[str(i) for i in v[0]], [str(i) for i in v[1]]]
+                for k, v in fold_dataset_idx.items()
+            }
 
-            if not os.path.exists(_save_path):
-                os.makedirs(_save_path, exist_ok=True)
+            index_file.parent.mkdir(parents=True, exist_ok=True)
 
-            with open(
-                (
-                    _save_path
-                    / f"{self.filter_method}_index.json"
-                ),
-                "w",
-            ) as f:
+            # write to the tmp file first, the other process never read the half written index.
+            tmp_file = index_file.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_file, "w") as f:
                 json.dump(json_fold_dataset_idx, f, sort_keys=True, indent=4)
+            os.replace(tmp_file, index_file)
 
-        elif os.path.exists(target_path):
-            with open(target_path / f"{self.filter_method}_index.json", "r") as f:
-                fold_dataset_idx = json.load(f)
-
-            # unpack the
-            for k, v in fold_dataset_idx.items():
-                # train mapping, include the gait cycle index
-                train_mapping_idx = v[0]
-                fold_dataset_idx[k][0] = [Path(i) for i in train_mapping_idx]
-
-                # val mapping, include the gait cycle index
-                val_mapping_idx = v[1]
-                fold_dataset_idx[k][1] = [Path(i) for i in val_mapping_idx]
-
-        else:
-            raise ValueError(
-                "the gait seg idx path is not exist, please check the path."
-            )
+            logger.info(f"save the split index into {index_file}")
 
         return fold_dataset_idx
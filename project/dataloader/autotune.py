@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/project/dataloader/autotune.py
+Project: /workspace/code/project/dataloader
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+Auto tune the dataloader worker settings on the current machine.
+The train dataloader of the fold 0 is iterated with each num_workers/prefetch_factor in the autotune config,
+the fastest setting (batch per second, after the first batch) is written back into configs/classifier_config.yaml.
+
+python -m project.dataloader.autotune autotune.num_batches=100
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 9:48:20 pm
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+import re
+import time
+import logging
+from pathlib import Path
+
+import hydra
+from omegaconf import DictConfig
+
+from project.dataloader.data_loader import WalkDataModule
+from project.cross_validation import DefineCrossValidation
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = Path(__file__).parents[2] / "configs" / "classifier_config.yaml"
+
+
+def time_loader(data_module: WalkDataModule, num_batches: int) -> tuple[float, float]:
+    """iterate the train dataloader, and time it.
+
+    Args:
+        data_module (WalkDataModule): the data module, with the worker settings.
+        num_batches (int): the timed batch number.
+
+    Returns:
+        tuple[float, float]: the first batch time (worker startup), batch per second after the first batch.
+    """
+
+    start = time.perf_counter()
+    loader = iter(data_module.train_dataloader())
+
+    next(loader)
+    first_batch = time.perf_counter() - start
+
+    count = 0
+    start = time.perf_counter()
+    for _ in range(num_batches):
+        try:
+            next(loader)
+        except StopIteration:
+            break
+        count += 1
+
+    # * shutdown the (persistent) workers before the next setting.
+    del loader
+
+    return first_batch, count / max(time.perf_counter() - start, 1e-9)
+
+
+def write_back(config_path: Path, values: dict) -> None:
+    """write the values into the data section of the config file, line by line,
+    so the comments and the order of the yaml are kept.
+
+    Args:
+        config_path (Path): the config file path.
+        values (dict): the key and value in the data section.
+    """
+
+    lines = config_path.read_text().splitlines(keepends=True)
+
+    section = None
+    for i, line in enumerate(lines):
+        top = re.match(r"^(\w+):", line)
+        if top:
+            section = top.group(1)
+            continue
+
+        if section != "data":
+            continue
+
+        for key, value in values.items():
+            lines[i] = re.sub(
+                rf"^(\s+{key}:\s*)[^\s#]+", lambda m: f"{m.group(1)}{value}", lines[i]
+            )
+
+    config_path.write_text("".join(lines))
+
+
+@hydra.main(
+    version_base=None,
+    config_path="../../configs",
+    config_name="classifier_config.yaml",
+)
+def autotune(config: DictConfig):
+
+    fold_dataset_idx = DefineCrossValidation(config)()
+    fold, dataset_idx = next(iter(fold_dataset_idx.items()))
+
+    config.train.current_fold = int(fold)
+
+    results = []
+
+    for num_workers in config.autotune.num_workers:
+        # * the prefetch_factor is not used without the worker process.
+        prefetch_list = config.autotune.prefetch_factor if num_workers > 0 else [None]
+
+        for prefetch_factor in prefetch_list:
+            config.data.num_workers = num_workers
+            if prefetch_factor is not None:
+                config.data.prefetch_factor = prefetch_factor
+
+            data_module = WalkDataModule(config, dataset_idx)
+            data_module.setup("fit")
+
+            first_batch, batch_per_sec = time_loader(
+                data_module, config.autotune.num_batches
+            )
+            results.append((batch_per_sec, num_workers, prefetch_factor))
+
+            logger.info(
+                f"num_workers={num_workers} prefetch_factor={prefetch_factor}: "
+                f"first batch {first_batch:.2f}s, {batch_per_sec:.3f} batch/s"
+            )
+
+    batch_per_sec, num_workers, prefetch_factor = max(results, key=lambda x: x[0])
+    logger.info(
+        f"best: num_workers={num_workers} prefetch_factor={prefetch_factor}, {batch_per_sec:.3f} batch/s"
+    )
+
+    if config.autotune.write_back:
+        values = {"num_workers": num_workers}
+        if prefetch_factor is not None:
+            values["prefetch_factor"] = prefetch_factor
+
+        write_back(CONFIG_PATH, values)
+        logger.info(f"write back {values} into {CONFIG_PATH}")
+
+
+if __name__ == "__main__":
+
+    autotune()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/project/dataloader/bbox_tube.py
+Project: /workspace/code/project/dataloader
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+The bbox tube, the crop window of each gait cycle segment (gait_cycle_index[j], gait_cycle_index[j + 1]).
+The bbox of the none_index frame (no person detected) is linearly interpolated from the neighbour frames,
+the bbox is smoothed with the moving average along the time, then the window of each segment is
+the x range of the widest frame (same as the PhaseMix.process_phase) and the y range of the segment.
+The window is stored as int16 (x1, y1, x2, y2), one row for one segment.
+
+The tubes of the whole dataset are built once into {data.gait_seg_data_path}/bbox_tube.pt, with the json mtime,
+the tube of the changed json is built again on the fly.
+python -m project.dataloader.bbox_tube data.tube_smooth=5
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 10:21:07 pm
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict
+
+import hydra
+import torch
+import torch.nn.functional as F
+
+from project.dataloader.catalog import DatasetCatalog
+
+logger = logging.getLogger(__name__)
+
+TUBE_NAME = "bbox_tube.pt"
+
+
+def interpolate_none(bbox: torch.Tensor, none_index: list) -> torch.Tensor:
+    """linearly interpolate the bbox of the none_index frame from the nearest valid frames.
+    The frame before the first (after the last) valid frame uses the first (last) valid bbox.
+
+    Args:
+        bbox (torch.Tensor): the bbox of each frame, t, 4
+        none_index (list): the frame index without the person.
+
+    Returns:
+        torch.Tensor: the interpolated bbox, t, 4
+    """
+
+    t = bbox.shape[0]
+
+    valid = torch.ones(t, dtype=torch.bool)
+    none_index = [i for i in none_index if 0 <= i < t]
+    valid[none_index] = False
+
+    if valid.all() or not valid.any():
+        return bbox
+
+    pos = torch.nonzero(valid).squeeze(1)
+    frames = torch.arange(t)
+
+    right = torch.searchsorted(pos, frames).clamp(max=pos.shape[0] - 1)
+    left = (right - 1).clamp(min=0)
+    l, r = pos[left], pos[right]
+
+    weight = ((frames - l) / (r - l).clamp(min=1)).clamp(0, 1).unsqueeze(1)
+
+    return bbox[l] * (1 - weight) + bbox[r] * weight
+
+
+def smooth_bbox(bbox: torch.Tensor, kernel_size: int = 1) -> torch.Tensor:
+    """the moving average of the bbox along the time, the border is replicated.
+
+    Args:
+        bbox (torch.Tensor): t, 4
+        kernel_size (int, optional): the odd window size, 1 is no smoothing. Defaults to 1.
+
+    Returns:
+        torch.Tensor: t, 4
+    """
+
+    if kernel_size <= 1:
+        return bbox
+
+    pad = kernel_size // 2
+    x = F.pad(bbox.t().unsqueeze(0), (pad, pad), mode="replicate")  # 1, 4, t + 2 * pad
+
+    return F.avg_pool1d(x, kernel_size, stride=1).squeeze(0).t()[: bbox.shape[0]]
+
+
+def build_tube(
+    bbox: list,
+    gait_cycle_index: list,
+    none_index: list = (),
+    smooth: int = 1,
+) -> torch.Tensor:
+    """build the crop window of each gait cycle segment.
+
+    Args:
+        bbox (list): the bbox (center x, center y, w, h) of each frame from json file.
+        gait_cycle_index (list): the gait cycle index from json file.
+        none_index (list, optional): the frame index without the person. Defaults to ().
+        smooth (int, optional): the moving average window size. Defaults to 1.
+
+    Returns:
+        torch.Tensor: int16, len(gait_cycle_index) - 1, 4 (x1, y1, x2, y2)
+    """
+
+    box = torch.as_tensor(bbox, dtype=torch.float32).reshape(-1, 4)
+    box = smooth_bbox(interpolate_none(box, list(none_index)), smooth)
+
+    x, y, w, h = box.unbind(dim=1)
+    # * truncate to int same as the int() in the process_phase, and not out of the frame.
+    xyxy = torch.stack([x - w / 2, y - h / 2, x + w / 2, y + h / 2], dim=1).long().clamp(min=0)
+
+    tube = torch.zeros(max(len(gait_cycle_index) - 1, 0), 4, dtype=torch.long)
+
+    for j in range(tube.shape[0]):
+        segment = xyxy[gait_cycle_index[j] : gait_cycle_index[j + 1]]
+        if segment.shape[0] == 0:
+            continue
+
+        # the first widest frame in the segment.
+        k = (segment[:, 2] - segment[:, 0]).argmax()
+        tube[j] = torch.stack(
+            [segment[k, 0], segment[:, 1].min(), segment[k, 2], segment[:, 3].max()]
+        )
+
+    return tube.to(torch.int16)
+
+
+def tube_key(json_path: Path, root: Path) -> str:
+    """the key of the json file in the tube file, disease/video.json"""
+
+    return Path(json_path).relative_to(root).as_posix()
+
+
+def json_mtime_ns(root: Path, key: str) -> int:
+    """the mtime of the json file of the tube key, -1 when the file is removed."""
+
+    try:
+        return os.stat(Path(root) / key).st_mtime_ns
+    except FileNotFoundError:
+        return -1
+
+
+def load_tubes(root: Path, smooth: int) -> Dict[str, torch.Tensor]:
+    """load the prebuilt tubes of the dataset, empty when not built or built with other smooth.
+    The tube of the json file changed (by mtime, same as the DatasetCatalog) after the build is dropped,
+    so it is built on the fly from the new json.
+
+    Args:
+        root (Path): the data.gait_seg_data_path.
+        smooth (int): the moving average window size.
+
+    Returns:
+        Dict[str, torch.Tensor]: tube_key to the tube.
+    """
+
+    tube_path = Path(root) / TUBE_NAME
+
+    if not tube_path.exists():
+        return {}
+
+    saved = torch.load(tube_path, map_location="cpu")
+
+    if saved["smooth"] != smooth:
+        logger.warning(
+            f"the tube {tube_path} is built with smooth {saved['smooth']}, not {smooth}, build on the fly."
+        )
+        return {}
+
+    if "mtime_ns" not in saved:
+        logger.warning(f"the tube {tube_path} has no json mtime, rebuild it. build on the fly.")
+        return {}
+
+    tubes = {
+        key: tube
+        for key, tube in saved["tubes"].items()
+        if saved["mtime_ns"].get(key) == json_mtime_ns(root, key)
+    }
+
+    if len(tubes) < len(saved["tubes"]):
+        logger.warning(
+            f"{len(saved['tubes']) - len(tubes)} json files changed after the tube {tube_path} was built, build them on the fly."
+        )
+
+    return tubes
+
+
+def read_tube(json_path: Path, smooth: int) -> torch.Tensor:
+    """build the tube from one json file."""
+
+    with open(json_path, "r") as f:
+        file_info_dict = json.load(f)
+
+    return build_tube(
+        file_info_dict["bbox"],
+        file_info_dict["gait_cycle_index"],
+        file_info_dict["none_index"],
+        smooth,
+    )
+
+
+@hydra.main(
+    version_base=None,
+    config_path="../../configs",
+    config_name="classifier_config.yaml",
+)
+def build_dataset_tubes(config):
+
+    root = Path(config.data.gait_seg_data_path)
+    smooth = config.data.tube_smooth
+
+    json_paths = sorted(Path(p) for p in DatasetCatalog(root).entries.keys())
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        tubes = pool.map(lambda p: read_tube(p, smooth), json_paths)
+
+        res = {tube_key(p, root): tube for p, tube in zip(json_paths, tubes)}
+
+    # * the json mtime of each tube, the changed json is not read from the stale tube.
+    mtime_ns = {key: json_mtime_ns(root, key) for key in res}
+
+    torch.save({"smooth": smooth, "tubes": res, "mtime_ns": mtime_ns}, root / TUBE_NAME)
+    logger.info(f"save {len(res)} tubes into {root / TUBE_NAME}")
+
+
+if __name__ == "__main__":
+
+    build_dataset_tubes()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/project/dataloader/catalog.py
+Project: /workspace/code/project/dataloader
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+The dataset catalog of the gait cycle json files.
+The dataset tree ({root}/{disease}/{video}.json) is scanned once with os.scandir in a thread pool,
+and the small header fields of each json file are cached into {root}/.dataset_catalog.
+Only the new or changed (by mtime) json file is parsed again in the next scan.
+Used by the map_class_num of the cross validation and the filter score.
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 9:12:40 pm
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+import os
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+CATALOG_NAME = ".dataset_catalog"  # not .json, so the rglob("*.json") of the dataset not find it.
+
+class_num_mapping_Dict: Dict = {
+    2: {0: "ASD", 1: "non-ASD"},
+    3: {0: "ASD", 1: "DHS", 2: "LCS_HipOA"},
+    4: {0: "ASD", 1: "DHS", 2: "LCS_HipOA", 3: "normal"},
+}
+
+
+def read_header(path: str) -> Dict:
+    """read the header fields from one json file.
+
+    Args:
+        path (str): the json file path.
+
+    Returns:
+        Dict: video_name, video_path, disease, label, gait_cycle_num, frame_num
+    """
+
+    with open(path, "r") as f:
+        file_info_dict = json.load(f)
+
+    return {
+        "video_name": file_info_dict.get("video_name"),
+        "video_path": file_info_dict.get("video_path"),
+        "disease": file_info_dict.get("disease"),
+        "label": file_info_dict.get("label"),
+        "gait_cycle_num": len(file_info_dict.get("gait_cycle_index", [])),
+        "frame_num": len(file_info_dict.get("bbox", [])),
+    }
+
+
+class DatasetCatalog(object):
+    """
+    The catalog of the json files under the root, {path: {disease_dir, mtime_ns, header}}.
+    """
+
+    def __init__(self, root: Path, num_workers: int = 16) -> None:
+
+        self.root = Path(root)
+        self.num_workers = num_workers
+        self.catalog_path = self.root / CATALOG_NAME
+
+        self.entries: Dict[str, Dict] = self.load()
+
+    @staticmethod
+    def scan_dir(disease_dir: str) -> List[tuple]:
+        """scan one disease folder.
+
+        Args:
+            disease_dir (str): the disease folder path.
+
+        Returns:
+            List[tuple]: (path, mtime_ns) of the json files.
+        """
+
+        with os.scandir(disease_dir) as it:
+            return [
+                (entry.path, entry.stat().st_mtime_ns)
+                for entry in it
+                if entry.is_file() and entry.name.endswith(".json")
+            ]
+
+    def scan(self) -> Dict[str, tuple]:
+        """scan all the disease folders in the thread pool.
+
+        Returns:
+            Dict[str, tuple]: path to (disease folder name, mtime_ns).
+        """
+
+        with os.scandir(self.root) as it:
+            disease_dirs = [entry for entry in it if entry.is_dir() and entry.name != "log"]
+
+        with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+            scanned = pool.map(self.scan_dir, [d.path for d in disease_dirs])
+
+            return {
+                path: (disease_dir.name, mtime_ns)
+                for disease_dir, files in zip(disease_dirs, scanned)
+                for path, mtime_ns in files
+            }
+
+    def load(self) -> Dict[str, Dict]:
+        """load the catalog, only the new or changed json file is parsed.
+
+        Returns:
+            Dict[str, Dict]: path to the catalog entry.
+        """
+
+        cached = {}
+        if self.catalog_path.exists():
+            try:
+                with open(self.catalog_path, "r") as f:
+                    cached = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"the catalog {self.catalog_path} is broken, rebuild it. {e}")
+
+        scanned = self.scan()
+
+        entries = {}
+        stale = []
+        for path, (disease_dir, mtime_ns) in scanned.items():
+            entry = cached.get(path)
+            if entry is not None and entry["mtime_ns"] == mtime_ns:
+                entries[path] = entry
+            else:
+                stale.append(path)
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+                headers = pool.map(read_header, stale)
+
+                for path, header in zip(stale, headers):
+                    disease_dir, mtime_ns = scanned[path]
+                    entries[path] = {
+                        "disease_dir": disease_dir,
+                        "mtime_ns": mtime_ns,
+                        "header": header,
+                    }
+
+        if stale or len(entries) != len(cached):
+            self.save(entries)
+
+        logger.info(
+            f"catalog {self.root}: {len(entries)} json files, {len(stale)} parsed."
+        )
+
+        return entries
+
+    def save(self, entries: Dict[str, Dict]) -> None:
+        """save the catalog, the read only dataset only keep the catalog in memory."""
+
+        tmp_path = self.catalog_path.with_name(f"{CATALOG_NAME}.{os.getpid()}.tmp")
+
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.catalog_path)
+        except OSError as e:
+            logger.warning(f"can not save the catalog into {self.catalog_path}. {e}")
+
+    def header(self, path) -> Dict:
+        """the header fields of one json file."""
+
+        return self.entries[str(path)]["header"]
+
+    def mtime_ns(self, path) -> int:
+        """the mtime of one json file when scanned."""
+
+        return self.entries[str(path)]["mtime_ns"]
+
+    def map_class_num(self, class_num: int) -> Dict[str, List[Path]]:
+        """map the json files into the class of class_num, by the disease folder name.
+        The disease not in the class mapping is non-ASD.
+
+        Args:
+            class_num (int): the class number.
+
+        Returns:
+            Dict[str, List[Path]]: disease to the json file path list.
+        """
+
+        _class_num = class_num_mapping_Dict[class_num]
+
+        res_dict = {v: [] for k, v in _class_num.items()}
+
+        for path in sorted(self.entries.keys()):
+            disease = self.entries[path]["disease_dir"]
+
+            if disease in res_dict.keys():
+                res_dict[disease].append(Path(path))
+            else:
+                res_dict["non-ASD"].append(Path(path))
+
+        return res_dict
@@ -30,9 +30,12 @@ from pytorch_lightning import LightningDataModule
 
 
 import torch
-from torch.utils.data import DataLoader
+from torch.utils.data import DataLoader, WeightedRandomSampler, get_worker_info
 
+from project.dataloader.catalog import DatasetCatalog, read_header
+from project.dataloader.features import FeatureGaitVideoDataset, FeatureStore
 from project.dataloader.gait_video_dataset import labeled_gait_video_dataset
+from project.dataloader.shards import ShardedGaitVideoDataset, split_sample_num, split_shards
 from project.dataloader.utils import Div255
 
 
@@ -51,6 +54,9 @@ class WalkDataModule(LightningDataModule):
         self._val_batch_size = opt.data.val_batch_size
 
         self._num_workers = opt.data.num_workers
+        self._prefetch_factor = opt.data.get("prefetch_factor", 2)
+        self._persistent_workers = opt.data.get("persistent_workers", False)
+        self._pin_memory = opt.data.get("pin_memory", True)
         self._img_size = opt.data.img_size
 
         self._uniform_sample = opt.train.uniform_temporal_subsample_num
@@ -61,8 +67,23 @@ class WalkDataModule(LightningDataModule):
 
         self._experiment = opt.train.experiment
 
+        # over, under, weighted, none. the over/under is done in the cross validation by the path.
+        self._sampling = opt.data.sampling
+
+        # the tar shards of python -m project.dataloader.shards, None is the json files.
+        self._shard_path = opt.data.get("shard_path", None)
+        self._shuffle_buffer = opt.data.get("shuffle_buffer", 0)
+
+        # the frame features of python -m project.dataloader.features, instead of the pixels.
+        self._head_only = opt.train.get("head_only", False)
+
         self.opt = opt
 
+        # * file_system for the too many open files error, when many workers share the video tensor.
+        sharing_strategy = opt.data.get("sharing_strategy", None)
+        if sharing_strategy is not None:
+            torch.multiprocessing.set_sharing_strategy(sharing_strategy)
+
         self.mapping_transform = Compose(
             [Div255(), Resize(size=[self._img_size, self._img_size])]
         )
@@ -83,6 +104,14 @@ class WalkDataModule(LightningDataModule):
             stage (Optional[str], optional): trainer.stage, in ('fit', 'validate', 'test', 'predict'). Defaults to None.
         """
 
+        if self._head_only:
+            self.setup_features()
+            return
+
+        if self._shard_path is not None:
+            self.setup_shards()
+            return
+
         # train dataset
         self.train_gait_dataset = labeled_gait_video_dataset(
             experiment=self._experiment,
@@ -113,6 +142,130 @@ class WalkDataModule(LightningDataModule):
             hparams=self.opt,
         )
 
+    def setup_shards(self) -> None:
+        """the streaming datasets from the tar shards of the current fold, only the train is shuffled."""
+
+        fold = self.opt.train.current_fold
+
+        self.train_gait_dataset = ShardedGaitVideoDataset(
+            experiment=self._experiment,
+            shard_paths=split_shards(self._shard_path, fold, "train"),
+            transform=self.mapping_transform,
+            hparams=self.opt,
+            shuffle_buffer=self._shuffle_buffer,
+            sample_num=split_sample_num(self._shard_path, fold, "train"),
+        )
+
+        self.val_gait_dataset = ShardedGaitVideoDataset(
+            experiment=self._experiment,
+            shard_paths=split_shards(self._shard_path, fold, "val"),
+            transform=self.mapping_transform,
+            hparams=self.opt,
+            sample_num=split_sample_num(self._shard_path, fold, "val"),
+        )
+
+        self.test_gait_dataset = self.val_gait_dataset
+
+    def setup_features(self) -> None:
+        """the frame feature datasets for the head-only training, only the plain clip mode."""
+
+        if self.opt.train.filter or self.opt.train.temporal_mix:
+            raise ValueError("the head-only training is only for the plain clip mode, set train.filter=False and train.temporal_mix=False.")
+
+        store = FeatureStore(self.opt.feature.save_path)
+
+        self.train_gait_dataset = FeatureGaitVideoDataset(self._dataset_idx[0], store, self.opt)
+        self.val_gait_dataset = FeatureGaitVideoDataset(self._dataset_idx[1], store, self.opt)
+        self.test_gait_dataset = self.val_gait_dataset
+
+    def disease_to_label(self, disease: str) -> int:
+        """map the disease name to the label, the disease not in the mapping dict is non-ASD."""
+
+        mapping = disease_to_num_mapping_Dict[self._class_num]
+
+        if disease in mapping.keys():
+            return mapping[disease]
+        else:
+            return mapping["non-ASD"]
+
+    def weighted_sampler(self, dataset_idx: list) -> WeightedRandomSampler:
+        """balance the class by the sample weight, instead of the duplicated path.
+        The disease is the json disease field (from the DatasetCatalog header), same as the label in the collate_fn.
+
+        Args:
+            dataset_idx (list): the train json file path.
+
+        Returns:
+            WeightedRandomSampler: the sampler, one epoch has the same sample number with the train split.
+        """
+
+        catalog = DatasetCatalog(self.opt.data.gait_seg_data_path)
+
+        def _disease(path) -> str:
+            try:
+                return catalog.header(path)["disease"]
+            except KeyError:
+                # * the json file out of the catalog root.
+                return read_header(str(path))["disease"]
+
+        labels = torch.tensor([self.disease_to_label(_disease(i)) for i in dataset_idx])
+        class_count = torch.bincount(labels, minlength=self._class_num).float()
+
+        # the class weight is 1 / class count, the missing class has no sample.
+        weights = (1.0 / class_count.clamp(min=1))[labels]
+
+        return WeightedRandomSampler(
+            weights=weights.double(), num_samples=len(dataset_idx), replacement=True
+        )
+
+    def loader_kwargs(self) -> Dict[str, Any]:
+        """the worker settings shared by the train/val/test dataloader.
+        The persistent workers keep the dataset (with the Filter/PhaseMix) alive between the epochs,
+        instead of the fork and re-init every epoch.
+
+        Returns:
+            Dict[str, Any]: the DataLoader keyword arguments.
+        """
+
+        kwargs = {
+            "num_workers": self._num_workers,
+            "pin_memory": self._pin_memory,
+            "collate_fn": self.collate_fn,
+        }
+
+        # * the prefetch_factor and persistent_workers are only valid with the worker process.
+        if self._num_workers > 0:
+            kwargs["prefetch_factor"] = self._prefetch_factor
+            kwargs["persistent_workers"] = self._persistent_workers
+
+        return kwargs
+
+    @staticmethod
+    def cat_video(batch_video: list[torch.Tensor]) -> torch.Tensor:
+        """cat the sample video into the batch video.
+        In the worker process, the output is allocated directly in the shared memory with the known clip number
+        (same as the default_collate), so each sample is copied once, and the batch is sent to the main process
+        without another copy.
+
+        Args:
+            batch_video (list[torch.Tensor]): the video of each sample, n, c, t, h, w
+
+        Returns:
+            torch.Tensor: the batch video, sum(n), c, t, h, w
+        """
+
+        elem = batch_video[0]
+        out = None
+
+        if get_worker_info() is not None:
+            clip_num = sum(v.shape[0] for v in batch_video)
+            numel = clip_num * elem[0].numel()
+            # * the new shared storage, not the share_memory_ of a normal tensor, which copies it again.
+            storage = elem.untyped_storage()._new_shared(numel * elem.element_size())
+            out = elem.new(storage).resize_(clip_num, *elem.shape[1:])
+
+        return torch.cat(batch_video, dim=0, out=out)
+
     def collate_fn(self, batch):
         """this function process the batch data, and return the batch data.
 
@@ -122,11 +275,12 @@ class WalkDataModule(LightningDataModule):
             Here we only cat the one patient video tensor, and label tensor.
 
         Returns:
-            dict: {video: torch.tensor, label: torch.tensor, info: list}
+            dict: {video: torch.tensor, label: torch.tensor, video_index: torch.tensor, info: list}
         """
 
         batch_label = []
-        batch_video = []
+        batch_video_index = []
+        batch_info = []
 
         # * mapping label
         for i in batch:
@@ -134,28 +288,25 @@ class WalkDataModule(LightningDataModule):
             gait_num, *_ = i["video"].shape
             disease = i["disease"]
 
-            batch_video.append(i["video"])
-            for _ in range(gait_num):
-                if disease in disease_to_num_mapping_Dict[self._class_num].keys():
-                    batch_label.append(
-                        disease_to_num_mapping_Dict[self._class_num][disease]
-                    )
-                else:
-                    # * if the disease not in the mapping dict, then set the label to non-ASD.
-                    batch_label.append(
-                        disease_to_num_mapping_Dict[self._class_num]["non-ASD"]
-                    )
-
-        video = torch.cat(batch_video, dim=0)
+            batch_video_index.append(torch.full((gait_num,), i["video_index"], dtype=torch.long))
+            # * if the disease not in the mapping dict, then set the label to non-ASD.
+            batch_label.extend([self.disease_to_label(disease)] * gait_num)
+            # * the video is already in the batch video, not send it twice.
+            batch_info.append({k: v for k, v in i.items() if k != "video"})
+
+        video = self.cat_video([i["video"] for i in batch])
         label = torch.tensor(batch_label, dtype=torch.float32)
+        video_index = torch.cat(batch_video_index, dim=0)
 
         # video, b, c, t, h, w, which include the video frame from sample info
         # label, b, which include the video frame from sample info
+        # video_index, b, the patient video index of each clip, used for the patient-level metrics
         # sample info, the raw sample info from dataset
         return {
             "video": video,
             "label": label,
-            "info": batch,
+            "video_index": video_index,
+            "info": batch_info,
         }
 
     def train_dataloader(self) -> DataLoader:
@@ -165,14 +316,22 @@ class WalkDataModule(LightningDataModule):
         normalizes the video before applying the scale, crop and flip augmentations.
         """
 
+        # * the weighted sampler replace the shuffle, the val/test is not balanced.
+        # * the shards are shuffled by the shuffle buffer in the dataset.
+        if self._shard_path is not None and not self._head_only:
+            sampler, shuffle = None, False
+        elif self._sampling == "weighted":
+            sampler, shuffle = self.weighted_sampler(self._dataset_idx[0]), False
+        else:
+            sampler, shuffle = None, True
+
         train_data_loader = DataLoader(
             self.train_gait_dataset,
             batch_size=self._train_batch_size,
-            num_workers=self._num_workers,
-            pin_memory=True,
-            shuffle=True,
+            shuffle=shuffle,
+            sampler=sampler,
             drop_last=True,
-            collate_fn=self.collate_fn,
+            **self.loader_kwargs(),
         )
 
         return train_data_loader
@@ -187,11 +346,9 @@ class WalkDataModule(LightningDataModule):
         val_data_loader = DataLoader(
             self.val_gait_dataset,
             batch_size=self._val_batch_size,
-            num_workers=self._num_workers,
-            pin_memory=True,
             shuffle=False,
             drop_last=False,
-            collate_fn=self.collate_fn,
+            **self.loader_kwargs(),
         )
 
         return val_data_loader
@@ -206,10 +363,9 @@ class WalkDataModule(LightningDataModule):
         test_data_loader = DataLoader(
             self.test_gait_dataset,
             batch_size=self._val_batch_size,
-            num_workers=self._num_workers,
             shuffle=False,
             drop_last=False,
-            collate_fn=self.collate_fn,
+            **self.loader_kwargs(),
         )
 
         return test_data_loader
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/project/dataloader/features.py
+Project: /workspace/code/project/dataloader
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+The frame-level feature cache of the 2D CNN trunk (resnet50 without the fc), for the head-only ablation.
+Each frame is transformed same as the plain clip mode (Div255, Resize to data.img_size), and the 2048-d pooled feature
+is saved as float16 into one memory-mapped file:
+{feature.save_path}/features.f16, (total frames, 2048)
+{feature.save_path}/index.json, {disease/video.json: [offset, frame number]} and the meta.
+
+The trunk is the pretrained resnet50 (ckpt.res2dcnn), or the trunk of the trained ckpt with feature.ckpt_path.
+Train the head with train.head_only=True, the fc of the 2dcnn, or the fc + lstm of the cnn_lstm.
+The head-only module loads the same trunk (from the meta of index.json), so its ckpt also works on the pixels.
+
+python -m project.dataloader.features feature.ckpt_path=logs/.../0_best_model.ckpt feature.prefix=model.
+
+Have a good code time :)
+-----
+Last Modified: Tuesday October 20th 2026 1:02:44 am
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import hydra
+import numpy as np
+import torch
+import torch.nn as nn
+from torchvision.transforms import Compose, Resize
+
+from project.dataloader.bbox_tube import tube_key
+from project.dataloader.catalog import DatasetCatalog
+from project.dataloader.utils import Div255, read_frames, window_starts
+
+logger = logging.getLogger(__name__)
+
+FEATURE_DIM = 2048
+FEATURE_NAME = "features.f16"
+INDEX_NAME = "index.json"
+
+
+def build_trunk(ckpt, ckpt_path: Optional[str] = None, prefix: str = "model.") -> nn.Module:
+    """the resnet50 trunk, the output is the 2048-d pooled feature.
+
+    Args:
+        ckpt (DictConfig): the hparams.ckpt, the pretrained res2dcnn.
+        ckpt_path (Optional[str], optional): the trained lightning ckpt of the trunk. Defaults to None, the pretrained trunk.
+        prefix (str, optional): the trunk prefix in the ckpt, model. for the 2dcnn, model.cnn. for the cnn_lstm. Defaults to "model.".
+
+    Returns:
+        nn.Module: the trunk in eval mode.
+    """
+
+    from project.models.factory import make_pretrained
+    from project.utils.checkpoint import load_lightning_state_dict
+
+    model = make_pretrained("resnet50", "res2dcnn", ckpt)
+    model.fc = nn.Identity()
+
+    if ckpt_path is not None:
+        # * the trained trunk, the fc is the head.
+        state_dict = load_lightning_state_dict(ckpt_path, prefix)
+        keys = model.state_dict().keys()
+        trunk = {k: v for k, v in state_dict.items() if k in keys}
+        model.load_state_dict(trunk)
+        logger.info(f"load the trunk from {ckpt_path}, {len(trunk)} tensors.")
+
+    return model.eval()
+
+
+def make_trunk(config) -> nn.Module:
+    """the trunk of the feature extraction, from the feature section of the config."""
+
+    return build_trunk(
+        config.ckpt, config.feature.get("ckpt_path", None), config.feature.get("prefix", "model.")
+    )
+
+
+def load_feature_trunk(model: nn.Module, hparams) -> None:
+    """load the trunk which made the feature cache (the meta in index.json) into the model, the fc is kept.
+    So the head trained on the features gives the same result on the pixels.
+
+    Args:
+        model (nn.Module): the resnet50 of the classifier, the fc is the head.
+        hparams (DictConfig): the classifier config, with the feature section.
+
+    Raises:
+        RuntimeError: the trunk is not same as the model.
+    """
+
+    index_path = Path(hparams.feature.save_path) / INDEX_NAME
+    if not index_path.exists():
+        logger.warning(f"{index_path} not found, the trunk is not loaded, it should be from the trained ckpt.")
+        return
+
+    with open(index_path, "r") as f:
+        meta = json.load(f)["meta"]
+
+    trunk = build_trunk(
+        hparams.ckpt,
+        meta.get("ckpt_path", None),
+        meta.get("prefix", hparams.feature.get("prefix", "model.")),
+    )
+
+    missing, unexpected = model.load_state_dict(trunk.state_dict(), strict=False)
+    if unexpected or any(not k.startswith("fc.") for k in missing):
+        raise RuntimeError(f"the feature trunk is not same as the model, missing {missing}, unexpected {unexpected}")
+
+    logger.info(f"load the feature trunk ({meta.get('ckpt_path', None) or 'pretrained'}) into the model.")
+
+
+class FeatureStore(object):
+    """
+    The float16 memory-mapped frame features, indexed by (video, frame).
+    The file is opened lazily, so each dataloader worker has its own mmap.
+    """
+
+    def __init__(self, save_path: Path) -> None:
+
+        self.save_path = Path(save_path)
+
+        with open(self.save_path / INDEX_NAME, "r") as f:
+            index = json.load(f)
+
+        self.meta = index["meta"]
+        self.index: Dict[str, Tuple[int, int]] = index["videos"]
+        self.dim = self.meta["dim"]
+
+        self._features: Optional[np.memmap] = None
+
+    @property
+    def features(self) -> np.memmap:
+
+        if self._features is None:
+            self._features = np.memmap(
+                self.save_path / FEATURE_NAME, dtype=np.float16, mode="r"
+            ).reshape(-1, self.dim)
+
+        return self._features
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def __getstate__(self) -> Dict[str, Any]:
+
+        # * the mmap is not sent to the worker, it is opened again in the worker.
+        state = self.__dict__.copy()
+        state["_features"] = None
+        return state
+
+    def read(self, key: str, frames: Optional[slice] = None) -> torch.Tensor:
+        """the features of one video.
+
+        Args:
+            key (str): the video key, disease/video.json
+            frames (Optional[slice], optional): the frame slice. Defaults to None, all the frames.
+
+        Returns:
+            torch.Tensor: float16, t, dim
+        """
+
+        offset, frame_num = self.index[key]
+        start, stop, _ = (frames or slice(None)).indices(frame_num)
+
+        return torch.from_numpy(np.array(self.features[offset + start : offset + stop]))
+
+
+@torch.no_grad()
+def extract_video(
+    trunk: nn.Module, vframes: torch.Tensor, transform, batch_size: int, device
+) -> np.ndarray:
+    """the float16 features of all the frames of one video.
+
+    Args:
+        trunk (nn.Module): the resnet50 trunk.
+        vframes (torch.Tensor): uint8, t, c, h, w
+        transform (Callable): the frame transform, same as the WalkDataModule.
+        batch_size (int): the frame number of one forward.
+        device (str): the trunk device.
+
+    Returns:
+        np.ndarray: float16, t, 2048
+    """
+
+    res = []
+
+    for chunk in vframes.split(batch_size, dim=0):
+        frames = transform(chunk).to(device)
+        res.append(trunk(frames).half().cpu())
+
+    return torch.cat(res, dim=0).numpy()
+
+
+def write_features(
+    json_paths: List[Path], root: Path, save_path: Path, trunk: nn.Module, config
+) -> int:
+    """extract the features of the json files, and write the feature file and the index.
+
+    Returns:
+        int: the total frame number.
+    """
+
+    save_path.mkdir(parents=True, exist_ok=True)
+
+    device = config.feature.get("device", "cpu")
+    trunk = trunk.to(device)
+    transform = Compose([Div255(), Resize(size=[config.data.img_size, config.data.img_size])])
+
+    videos = {}
+    offset = 0
+
+    # * the features are appended as the raw float16, and read back with np.memmap.
+    with open(save_path / FEATURE_NAME, "wb") as f:
+        for i, json_path in enumerate(json_paths):
+            with open(json_path, "r") as jf:
+                file_info_dict = json.load(jf)
+
+            video_path = file_info_dict["video_path"].replace("/workspace/data", config.data.root_path)
+            features = extract_video(
+                trunk, read_frames(video_path), transform, config.feature.batch_size, device
+            )
+
+            f.write(features.tobytes())
+            videos[tube_key(json_path, root)] = [offset, features.shape[0]]
+            offset += features.shape[0]
+
+            logger.info(f"[{i + 1}/{len(json_paths)}] {json_path}: {features.shape[0]} frames")
+
+    index = {
+        "meta": {
+            "dim": FEATURE_DIM,
+            "img_size": config.data.img_size,
+            "ckpt_path": config.feature.get("ckpt_path", None),
+            "prefix": config.feature.get("prefix", "model."),
+        },
+        "videos": videos,
+    }
+
+    with open(save_path / INDEX_NAME, "w") as f:
+        json.dump(index, f)
+
+    return offset
+
+
+class FeatureGaitVideoDataset(torch.utils.data.Dataset):
+    """
+    The plain clip mode of the LabeledGaitVideoDataset, the frame features instead of the pixels.
+    The video is (B, 2048, t), the feature dim is in the channel dim, so the clip number and the t are same as the pixels.
+    """
+
+    def __init__(self, labeled_video_paths: list, store: FeatureStore, hparams: Dict = None) -> None:
+        super().__init__()
+
+        self._labeled_videos = labeled_video_paths
+        self._store = store
+        self.root = Path(hparams.data.gait_seg_data_path)
+        self.uniform_temporal_subsample = hparams.train.uniform_temporal_subsample_num
+        self.clip_stride = hparams.train.get("clip_stride", None) or self.uniform_temporal_subsample
+        self.clip_tail = hparams.train.get("clip_tail", False)
+
+    def __len__(self):
+        return len(self._labeled_videos)
+
+    def __getitem__(self, index) -> Dict[str, Any]:
+
+        json_path = self._labeled_videos[index]
+        with open(json_path, "r") as f:
+            file_info_dict = json.load(f)
+
+        features = self._store.read(tube_key(json_path, self.root)).float()  # t, dim
+
+        # * same clips as the plain clip mode, train.clip_stride apart, train.clip_tail for the remainder frames.
+        t = self.uniform_temporal_subsample
+        starts = window_starts(features.shape[0], t, self.clip_stride, self.clip_tail)
+        video = torch.stack([features[s : s + t] for s in starts], dim=0).permute(0, 2, 1)  # B, dim, t
+
+        return {
+            "video": video,
+            "label": file_info_dict["label"],
+            "disease": file_info_dict["disease"],
+            "video_name": file_info_dict["video_name"],
+            "video_index": index,
+            "gait_cycle_index": file_info_dict["gait_cycle_index"],
+            "bbox_none_index": file_info_dict["none_index"],
+        }
+
+
+@hydra.main(
+    version_base=None,
+    config_path="../../configs",
+    config_name="classifier_config.yaml",
+)
+def extract_features(config):
+
+    root = Path(config.data.gait_seg_data_path)
+    json_paths = sorted(Path(p) for p in DatasetCatalog(root).entries.keys())
+
+    frame_num = write_features(json_paths, root, Path(config.feature.save_path), make_trunk(config), config)
+
+    logger.info(f"save {len(json_paths)} videos, {frame_num} frames into {config.feature.save_path}")
+
+
+if __name__ == "__main__":
+
+    extract_features()
@@ -24,15 +24,16 @@ from __future__ import annotations
 
 import logging
 import json
+from pathlib import Path
 
 from typing import Any, Callable, Dict, List, Optional, Tuple, Union, Type
 
 import torch
 
-from torchvision.io import read_video
-
 from project.dataloader.phase_mix import PhaseMix
 from project.dataloader.filter import Filter
+from project.dataloader.bbox_tube import build_tube, load_tubes, tube_key
+from project.dataloader.utils import read_frames, window_starts
 
 logger = logging.getLogger(__name__)
 
@@ -58,6 +59,10 @@ class LabeledGaitVideoDataset(torch.utils.data.Dataset):
         self.temporal_mix = hparams.train.temporal_mix
         self.uniform_temporal_subsample = hparams.train.uniform_temporal_subsample_num
 
+        # * the sliding window of the plain clip mode, the stride same as the window is the non-overlapping clips.
+        self.clip_stride = hparams.train.get("clip_stride", None) or self.uniform_temporal_subsample
+        self.clip_tail = hparams.train.get("clip_tail", False)
+
         if self.filter:
             self._filter = Filter(hparams)
         else:
@@ -68,6 +73,30 @@ class LabeledGaitVideoDataset(torch.utils.data.Dataset):
         else:
             self._temporal_mix = False
 
+        # * the prebuilt bbox tube, python -m project.dataloader.bbox_tube
+        # * only the PhaseMix uses the tube, the inference config has no gait_seg_data_path.
+        self.tube_smooth = hparams.data.get("tube_smooth", 1)
+        self.tube_root = None
+        self._tubes = {}
+
+        tube_root = hparams.data.get("gait_seg_data_path", None)
+        if self.temporal_mix and tube_root is not None:
+            self.tube_root = Path(tube_root)
+            self._tubes = load_tubes(self.tube_root, self.tube_smooth)
+
+    def tube(
+        self, index: int, bbox: list, gait_cycle_index: list, none_index: list
+    ) -> torch.Tensor:
+        """the crop window of each gait cycle segment, build on the fly when not prebuilt."""
+
+        try:
+            if self._tubes:
+                return self._tubes[tube_key(self._labeled_videos[index], self.tube_root)]
+        except (KeyError, ValueError):
+            pass
+
+        return build_tube(bbox, gait_cycle_index, none_index, self.tube_smooth)
+
     def move_transform(self, vframes: list[torch.Tensor]) -> None:
 
         if self._transform is not None:
@@ -90,23 +119,53 @@ class LabeledGaitVideoDataset(torch.utils.data.Dataset):
         with open(self._labeled_videos[index]) as f:
             file_info_dict = json.load(f)
 
+        # replace the video path with the full path
+        video_path = file_info_dict["video_path"]
+        try:
+            video_path = video_path.replace("/workspace/data", self.root_path)
+            vframes = read_frames(video_path)
+        except Exception as e:
+            logger.error(f"Error reading video {video_path}: {e}")
+            raise RuntimeError(f"Failed to read video {video_path}")
+
+        tube = None
+        if self.temporal_mix:
+            tube = self.tube(
+                index,
+                file_info_dict["bbox"],
+                file_info_dict["gait_cycle_index"],
+                file_info_dict["none_index"],
+            )
+
+        return self.make_sample(file_info_dict, vframes, index, tube)
+
+    def make_sample(
+        self,
+        file_info_dict: Dict,
+        vframes: torch.Tensor,
+        index: int,
+        tube: Optional[torch.Tensor] = None,
+    ) -> Dict[str, Any]:
+        """make the sample from the json info and the decoded frames.
+
+        Args:
+            file_info_dict (Dict): the json file info.
+            vframes (torch.Tensor): the decoded frames, t, c, h, w
+            index (int): the video index in the split.
+            tube (Optional[torch.Tensor], optional): the bbox tube, build on the fly when None. Defaults to None.
+
+        Returns:
+            Dict[str, Any]: the sample info dict.
+        """
+
         # load video info from json file
         video_name = file_info_dict["video_name"]
-        video_path = file_info_dict["video_path"]
         label = file_info_dict["label"]
         disease = file_info_dict["disease"]
         gait_cycle_index = file_info_dict["gait_cycle_index"]
         bbox_none_index = file_info_dict["none_index"]
         bbox = file_info_dict["bbox"]
 
-        # replace the video path with the full path
-        try:
-            video_path = video_path.replace("/workspace/data", self.root_path)
-            vframes, _, _ = read_video(video_path, output_format="TCHW", pts_unit="sec")
-        except Exception as e:
-            logger.error(f"Error reading video {video_path}: {e}")
-            raise RuntimeError(f"Failed to read video {video_path}")
-
         filter_info = file_info_dict["filter_info"]
 
         # FIXME: 下面的两部分功能重叠了，但是不影响使用
@@ -119,7 +178,14 @@ class LabeledGaitVideoDataset(torch.utils.data.Dataset):
         if self.temporal_mix:
 
             defined_vframes = self._temporal_mix(
-                vframes, gait_cycle_index, bbox, label, filter_info
+                vframes,
+                gait_cycle_index,
+                bbox,
+                label,
+                filter_info,
+                tube=tube
+                if tube is not None
+                else build_tube(bbox, gait_cycle_index, bbox_none_index, self.tube_smooth),
             )
             defined_vframes = self.move_transform(defined_vframes)
 
@@ -127,18 +193,16 @@ class LabeledGaitVideoDataset(torch.utils.data.Dataset):
 
             b, c, h, w = vframes.shape
             t = self.uniform_temporal_subsample
-            valid_frame_count = (b // t) * t  # 向下取整
-
-            if b != valid_frame_count:
-                print(f"[Warning] Discarding {b - valid_frame_count} extra frames")
+            starts = window_starts(b, t, self.clip_stride, self.clip_tail)
 
-            video = vframes[:valid_frame_count]  # 舍弃多余帧
+            covered = starts[-1] + t if starts else 0
+            if b != covered:
+                print(f"[Warning] Discarding {b - covered} extra frames")
 
-            B = valid_frame_count // t
             clips = []
 
-            for i in range(B):
-                clip = video[i * t : (i + 1) * t]  # (t, c, h, w)
+            for start in starts:
+                clip = vframes[start : start + t]  # (t, c, h, w)
                 clip = clip.permute(1, 0, 2, 3)  # (c, t, h, w)
                 clips.append(clip)
 
@@ -29,6 +29,8 @@ from typing import Any, Callable, Dict, List, Optional, Tuple, Union, Type
 
 import torch
 
+from project.dataloader.bbox_tube import build_tube
+
 logger = logging.getLogger(__name__)
 
 
@@ -70,76 +72,29 @@ class PhaseMix(object):
         # self.filter = Filter(hparams)
         self.current_fold = hparams.train.current_fold
         self.uniform_temporal_subsample = hparams.train.uniform_temporal_subsample_num
+        self.tube_smooth = hparams.data.get("tube_smooth", 1)
 
     @staticmethod
     def process_phase(
-        phase_frame: List[torch.Tensor], phase_idx: List[int], bbox: List[torch.Tensor]
+        phase_frame: List[torch.Tensor], phase_window: List[torch.Tensor]
     ) -> List[torch.Tensor]:
-        """Crop the human area with bbox, and normalize them with max width.
+        """Crop the human area with the tube window, one slice for one frame pack.
 
         Args:
-            phase_frame (List[torch.Tensor]): procedded frame by gait index
-            phase_idx (List[int]): gait cycle index
-            bbox (List[torch.Tensor]): _description_
+            phase_frame (List[torch.Tensor]): procedded frame by gait index, each is b, c, h, w
+            phase_window (List[torch.Tensor]): the tube window (x1, y1, x2, y2) of each frame pack.
 
         Returns:
-            List[torch.Tensor]: _description_
+            List[torch.Tensor]: the cropped frame pack, b, c, h, x2 - x1
         """
-        # find the max width of phase and crop them.
-        cropped_frame_list: List[torch.Tensor] = []
-
-        for i in range(len(phase_idx)):
-
-            one_pack_frames = phase_frame[i]  # frame pack
-            one_pack_start_idx = phase_idx[i]
-            b, c, h, w = one_pack_frames.shape  # b is one frame pack size
-
-            stored_x_max = float("-inf")
-            stored_xmax = 0
-            stored_xmin = 0
-
-            one_pack_frames_list: List[torch.Tensor] = []
-
-            # * step1: find the max width and max height for one frame pack.
-            for k in range(b):
-
-                frame_bbox = bbox[one_pack_start_idx + k]
-                x, y, w, h = frame_bbox
-                xmin = int(x - w / 2)
-                xmax = int(x + w / 2)
-
-                if xmax - xmin > stored_x_max:
-                    stored_x_max = xmax - xmin
-                    stored_xmax = xmax
-                    stored_xmin = xmin
-
-            # * step2: crop human area with bbox, and normalized with max width
-            for k in range(b):
-
-                frame_bbox = bbox[i + k]
-                x, y, w, h = frame_bbox
-
-                frame = one_pack_frames[k]
-                cropped_one_frame_human = frame[:, :, stored_xmin:stored_xmax]
-                one_pack_frames_list.append(cropped_one_frame_human)
 
-                # write_png(input=cropped_one_frame_human, filename=f'/workspace/skeleton/logs/img/test{k}.png')
+        assert len(phase_frame) == len(phase_window), "frame pack length is not equal"
 
-            # * step3: stack the cropped frame, for next step to fuse them
-            cropped_frame_list.append(
-                torch.stack(one_pack_frames_list, dim=0)
-            )  # b, c, h, w
-
-        # shape check
-        assert (
-            len(cropped_frame_list) == len(phase_frame) == len(phase_idx)
-        ), "frame pack length is not equal"
-        for i in range(len(phase_frame)):
-            assert (
-                cropped_frame_list[i].size()[0] == phase_frame[i].size()[0]
-            ), f"the {i} frame pack size is not equal"
-
-        return cropped_frame_list
+        # * the width is normalized with the widest bbox of the pack, the height is kept.
+        return [
+            one_pack_frames[..., int(window[0]) : int(window[2])]
+            for one_pack_frames, window in zip(phase_frame, phase_window)
+        ]
 
     @staticmethod
     def filter_video_frames(
@@ -188,91 +143,74 @@ class PhaseMix(object):
 
         return torch.stack(res_batch_frames, dim=0), used_indices  # (B, C, T, H, W)
 
+    @staticmethod
+    def phase_index(sorted_idx: List[int], fuse_frame_num: int) -> torch.Tensor:
+        """the frame index of one phase pack, the top fuse_frame_num of the sorted idx in the time order.
+        The short pack is padded with the last index.
+
+        Args:
+            sorted_idx (List[int]): the frame idx sorted by the filter score.
+            fuse_frame_num (int): the frame number of the fused clip.
+
+        Raises:
+            ValueError: the sorted idx is empty, no frame to select.
+
+        Returns:
+            torch.Tensor: long, fuse_frame_num frame idx.
+        """
+
+        if len(sorted_idx) == 0:
+            raise ValueError("the sorted idx of the phase pack is empty.")
+
+        idx = sorted(sorted_idx[:fuse_frame_num])
+        idx += idx[-1:] * (fuse_frame_num - len(idx))
+
+        return torch.tensor(idx, dtype=torch.long)
+
     def fuse_frames(
         self,
         processed_first_phase: List[torch.Tensor],
         processed_second_phase: List[torch.Tensor],
         first_phase_sorted_idx: List[torch.Tensor],
         second_phase_sorted_idx: List[torch.Tensor],
-    ) -> torch.Tensor:
+    ) -> List[torch.Tensor]:
+        """fuse the first phase and second phase of each pack along the width.
+        The index of both phases is computed first, and each phase is gathered once into its half of the output.
 
-        res_fused_frames: List[torch.Tensor] = []
+        Args:
+            processed_first_phase (List[torch.Tensor]): the cropped first phase pack, b, c, h, w1
+            processed_second_phase (List[torch.Tensor]): the cropped second phase pack, b, c, h, w2
+            first_phase_sorted_idx (List[torch.Tensor]): the sorted frame idx of the first phase.
+            second_phase_sorted_idx (List[torch.Tensor]): the sorted frame idx of the second phase.
 
-        for pack in range(len(processed_first_phase)):
-
-            fuse_frame_num = self.uniform_temporal_subsample
-
-            first_phase_frame_ans = []
-            second_phase_frame_ans = []
-
-            ##############
-            # first phase
-            ##############
-            # * split > sort > alignment > select from the sorted idx
-            # * resort the frame idx with fuse_frame_num, keep the time order.
-            first_phase_sorted_idx[pack] = first_phase_sorted_idx[pack][:fuse_frame_num]
-            first_phase_sorted_idx[pack] = sorted(first_phase_sorted_idx[pack])
-
-            # * keep the frame num equal to fuse_frame_num
-            if processed_first_phase[pack].size()[0] < fuse_frame_num:
-                for _ in range(fuse_frame_num - processed_first_phase[pack].size()[0]):
-                    processed_first_phase[pack] = torch.cat(
-                        [
-                            processed_first_phase[pack],
-                            processed_first_phase[pack][-1].unsqueeze(0),
-                        ],
-                        dim=0,
-                    )
-                    first_phase_sorted_idx[pack].append(
-                        first_phase_sorted_idx[pack][-1]
-                    )
-
-            for idx in range(fuse_frame_num):
-                first_phase_frame_ans.append(
-                    processed_first_phase[pack][first_phase_sorted_idx[pack][idx]]
-                )
+        Returns:
+            List[torch.Tensor]: the fused frames of each pack, t, c, h, w1 + w2
+        """
 
-            uniform_first_phase = torch.stack(first_phase_frame_ans, dim=0)
-
-            ##############
-            # second phase
-            ##############
-
-            # * resort the frame idx with fuse_frame_num, keep the time order.
-            second_phase_sorted_idx[pack] = second_phase_sorted_idx[pack][
-                :fuse_frame_num
-            ]
-            second_phase_sorted_idx[pack] = sorted(second_phase_sorted_idx[pack])
-
-            # * keep the frame num equal to fuse_frame_num
-            if processed_second_phase[pack].size()[0] < fuse_frame_num:
-                for _ in range(fuse_frame_num - processed_second_phase[pack].size()[0]):
-                    processed_second_phase[pack] = torch.cat(
-                        [
-                            processed_second_phase[pack],
-                            processed_second_phase[pack][-1].unsqueeze(0),
-                        ],
-                        dim=0,
-                    )
-                    second_phase_sorted_idx[pack].append(
-                        second_phase_sorted_idx[pack][-1]
-                    )
-
-            for idx in range(fuse_frame_num):
-                second_phase_frame_ans.append(
-                    processed_second_phase[pack][second_phase_sorted_idx[pack][idx]]
-                )
+        fuse_frame_num = self.uniform_temporal_subsample
 
-            uniform_second_phase = torch.stack(second_phase_frame_ans, dim=0)
+        res_fused_frames: List[torch.Tensor] = []
+
+        for first, second, first_sorted, second_sorted in zip(
+            processed_first_phase,
+            processed_second_phase,
+            first_phase_sorted_idx,
+            second_phase_sorted_idx,
+        ):
+
+            # * split > sort > alignment > select from the sorted idx, keep the time order.
+            first_idx = self.phase_index(first_sorted, fuse_frame_num)
+            second_idx = self.phase_index(second_sorted, fuse_frame_num)
 
-            #################
-            # fuse width dim
-            #################
-            fused_frames = torch.cat([uniform_first_phase, uniform_second_phase], dim=3)
+            _, c, h, first_w = first.shape
+            second_w = second.shape[-1]
 
-            # write the fused frame to png
-            # for i in range(fused_frames.size()[0]):
-            #     write_png(input=fused_frames[i], filename=f'/workspace/project/logs/img/fused{i}.png')
+            # * fuse width dim, each phase is written into its half of the output.
+            fused_frames = torch.empty(
+                (fuse_frame_num, c, h, first_w + second_w), dtype=first.dtype, device=first.device
+            )
+            fused_frames[..., :first_w] = first[first_idx]
+            fused_frames[..., first_w:] = second[second_idx]
 
             res_fused_frames.append(fused_frames)
 
@@ -285,8 +223,16 @@ class PhaseMix(object):
         bbox: List[torch.Tensor],
         label: List[torch.Tensor],
         filter_info: Dict[str, dict],
+        tube: Optional[torch.Tensor] = None,
+        none_index: list = (),
     ) -> torch.Tensor:
 
+        # * the crop window of each gait cycle segment, from the prebuilt tube or the raw bbox.
+        # * the none_index bbox is interpolated same as the training tube.
+        if tube is None:
+            tube = build_tube(bbox, gait_cycle_index, none_index, self.tube_smooth)
+        segment_window = {start: tube[j] for j, start in enumerate(gait_cycle_index[:-1])}
+
         # * step1: first find the phase frames (pack) and phase index.
         first_phase, first_phase_idx = split_gait_cycle(
             video_tensor, gait_cycle_index, 0
@@ -316,9 +262,11 @@ class PhaseMix(object):
             first_phase_sorted_idx.append(first_phase_sorted_idx[-1])
 
         # * step3: process on pack, crop the human area with bbox
-        processed_first_phase = self.process_phase(first_phase, first_phase_idx, bbox)
+        processed_first_phase = self.process_phase(
+            first_phase, [segment_window[i] for i in first_phase_idx]
+        )
         processed_second_phase = self.process_phase(
-            second_phase, second_phase_idx, bbox
+            second_phase, [segment_window[i] for i in second_phase_idx]
         )
 
         # * step3: fuse the first phase and second phase
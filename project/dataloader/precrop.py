@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/project/dataloader/precrop.py
+Project: /workspace/code/project/dataloader
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+Export the person-centred crop of the gait video, so the loader decodes the small crop instead of the full frame.
+Each gait cycle segment is cropped with one fixed square window around the bbox tube (no jitter in the segment),
+and resized to precrop.img_size. The frames outside the gait cycle use the nearest segment window.
+The frame number, gait_cycle_index, none_index and filter_info are not changed,
+the bbox is mapped into the crop coordinate, and the video_path points to the new video (or jpg archive).
+
+The video is decoded frame by frame and cropped in chunks of precrop.chunk_size frames, to bound the memory.
+The json tree is same as the data.gait_seg_data_path, so train with data.gait_seg_data_path=${precrop.save_path}.
+The run fails (non-zero exit) when any video is not exported, so the partial export is not used for training.
+python -m project.dataloader.precrop precrop.img_size=256 precrop.format=video
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 10:58:36 pm
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import List, Tuple
+
+import hydra
+import torch
+from torchvision.io import VideoReader, encode_jpeg, write_video
+
+from project.dataloader.bbox_tube import build_tube
+from project.dataloader.catalog import DatasetCatalog
+from project.utils.utils import clip_pad_with_bbox_batched, square_pad_boxes
+
+logger = logging.getLogger(__name__)
+
+
+def segment_windows(
+    tube: torch.Tensor, gait_cycle_index: list, frame_num: int, start: int = 0
+) -> torch.Tensor:
+    """the tube window of each frame, from its gait cycle segment.
+
+    Args:
+        tube (torch.Tensor): the tube of the video, s, 4 (x1, y1, x2, y2)
+        gait_cycle_index (list): the gait cycle index from json file.
+        frame_num (int): the end frame (exclusive), the frame number of the video.
+        start (int, optional): the first frame, for the chunk of the video. Defaults to 0.
+
+    Returns:
+        torch.Tensor: frame_num - start, 4 (x1, y1, x2, y2)
+    """
+
+    windows = tube.long()
+
+    # * the segment of each frame, the frame before (after) the gait cycle uses the first (last) segment.
+    starts = torch.tensor(gait_cycle_index[:-1])
+    segment = torch.searchsorted(starts, torch.arange(start, frame_num), right=True) - 1
+
+    return windows[segment.clamp(0, windows.shape[0] - 1)]
+
+
+def map_bbox(bbox: list, regions: torch.Tensor, img_size: int) -> list:
+    """map the bbox (center x, center y, w, h) into the crop coordinate.
+
+    Args:
+        bbox (list): the bbox of each frame from json file.
+        regions (torch.Tensor): the square crop region of each frame, t, 4
+        img_size (int): the crop size.
+
+    Returns:
+        list: the bbox in the crop, same format with the json file.
+    """
+
+    box = torch.as_tensor(bbox, dtype=torch.float32).reshape(-1, 4)
+
+    scale_x = img_size / (regions[:, 2] - regions[:, 0]).clamp(min=1)
+    scale_y = img_size / (regions[:, 3] - regions[:, 1]).clamp(min=1)
+
+    mapped = torch.stack(
+        [
+            (box[:, 0] - regions[:, 0]) * scale_x,
+            (box[:, 1] - regions[:, 1]) * scale_y,
+            box[:, 2] * scale_x,
+            box[:, 3] * scale_y,
+        ],
+        dim=1,
+    )
+
+    return mapped.tolist()
+
+
+def save_frames(frames: torch.Tensor, save_path: Path, fmt: str, fps: float, quality: int) -> Path:
+    """save the cropped frames as the video or the jpg archive.
+
+    Args:
+        frames (torch.Tensor): uint8, t, c, h, w
+        save_path (Path): the save path without the suffix.
+        fmt (str): video or frames.
+        fps (float): the fps of the source video.
+        quality (int): the jpg quality of the frames archive.
+
+    Returns:
+        Path: the saved file path.
+    """
+
+    if fmt == "video":
+        save_path = save_path.with_suffix(".mp4")
+        write_video(str(save_path), frames.permute(0, 2, 3, 1), fps=fps)
+    elif fmt == "frames":
+        save_path = save_path.with_suffix(".pt")
+        torch.save(
+            {"fps": fps, "frames": [encode_jpeg(f, quality=quality) for f in frames]},
+            save_path,
+        )
+    else:
+        raise ValueError(f"the precrop format {fmt} is not supported.")
+
+    return save_path
+
+
+def crop_video(
+    video_path: str, tube: torch.Tensor, gait_cycle_index: list, img_size: int, chunk_size: int
+) -> Tuple[torch.Tensor, torch.Tensor, float]:
+    """decode the video frame by frame and crop it in chunks of chunk_size frames,
+    only one chunk of the full resolution frames (and its float copy in the crop) is kept in memory.
+
+    Args:
+        video_path (str): the source video path.
+        tube (torch.Tensor): the tube of the video, s, 4
+        gait_cycle_index (list): the gait cycle index from json file.
+        img_size (int): the crop size.
+        chunk_size (int): the frame number of one crop.
+
+    Returns:
+        Tuple[torch.Tensor, torch.Tensor, float]: the cropped frames (uint8, t, c, img_size, img_size), the square region of each frame (t, 4), the fps.
+    """
+
+    reader = VideoReader(video_path, "video")
+    fps = reader.get_metadata()["video"]["fps"][0]
+
+    cropped, regions = [], []
+    chunk: List[torch.Tensor] = []
+    start = 0
+
+    def crop_chunk() -> None:
+        nonlocal start
+
+        windows = segment_windows(tube, gait_cycle_index, start + len(chunk), start)
+        # * the windows are padded to the square inside, same region as the square_pad_boxes.
+        cropped.append(clip_pad_with_bbox_batched(torch.stack(chunk, dim=0), windows, img_size))
+        regions.append(square_pad_boxes(windows))
+
+        start += len(chunk)
+        chunk.clear()
+
+    for frame in reader:
+        chunk.append(frame["data"])
+
+        if len(chunk) == chunk_size:
+            crop_chunk()
+
+    if chunk:
+        crop_chunk()
+
+    return torch.cat(cropped, dim=0), torch.cat(regions, dim=0), fps
+
+
+def precrop_one(json_path: Path, root: Path, config) -> None:
+    """crop one video and write the new json file.
+
+    Args:
+        json_path (Path): the json file path under the data.gait_seg_data_path.
+        root (Path): the data.gait_seg_data_path.
+        config (DictConfig): the classifier config.
+    """
+
+    save_root = Path(config.precrop.save_path)
+    img_size = config.precrop.img_size
+
+    with open(json_path, "r") as f:
+        file_info_dict = json.load(f)
+
+    video_path = file_info_dict["video_path"].replace("/workspace/data", config.data.root_path)
+
+    tube = build_tube(
+        file_info_dict["bbox"],
+        file_info_dict["gait_cycle_index"],
+        file_info_dict["none_index"],
+        config.data.tube_smooth,
+    )
+    cropped, regions, fps = crop_video(
+        video_path,
+        tube,
+        file_info_dict["gait_cycle_index"],
+        img_size,
+        config.precrop.get("chunk_size", 64),
+    )
+
+    json_save_path = save_root / json_path.relative_to(root)
+    json_save_path.parent.mkdir(parents=True, exist_ok=True)
+
+    saved_path = save_frames(
+        cropped,
+        json_save_path.with_suffix(""),
+        config.precrop.format,
+        fps,
+        config.precrop.jpg_quality,
+    )
+
+    file_info_dict["precrop"] = {
+        "img_size": img_size,
+        "source_video_path": file_info_dict["video_path"],
+    }
+    file_info_dict["video_path"] = str(saved_path)
+    file_info_dict["bbox"] = map_bbox(file_info_dict["bbox"], regions, img_size)
+
+    with open(json_save_path, "w") as f:
+        json.dump(file_info_dict, f, indent=4)
+
+
+@hydra.main(
+    version_base=None,
+    config_path="../../configs",
+    config_name="classifier_config.yaml",
+)
+def precrop(config):
+
+    root = Path(config.data.gait_seg_data_path)
+    json_paths = sorted(Path(p) for p in DatasetCatalog(root).entries.keys())
+
+    failed = []
+
+    for i, json_path in enumerate(json_paths):
+        try:
+            precrop_one(json_path, root, config)
+        except Exception as e:
+            logger.error(f"failed to precrop {json_path}: {e}")
+            failed.append(json_path)
+            continue
+
+        logger.info(f"[{i + 1}/{len(json_paths)}] precrop {json_path}")
+
+    # * the partial export is not used silently, fix the failed videos and run again.
+    if failed:
+        for json_path in failed:
+            logger.error(f"not exported: {json_path}")
+
+        raise RuntimeError(f"{len(failed)}/{len(json_paths)} videos failed to precrop, the export is incomplete.")
+
+
+if __name__ == "__main__":
+
+    precrop()
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/project/dataloader/shards.py
+Project: /workspace/code/project/dataloader
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+The WebDataset-style tar shards of the gait video dataset, for the cluster shared filesystem.
+Each sample is packed as {key}.json and {key}.mp4 (or {key}.pt, the jpg archive of the precrop exporter)
+into ~shard.max_size tar files, one shard set for one fold split:
+{shard.save_path}/fold{fold}/{train,val}-{000000}.tar, {train,val}.json (the sample number)
+The samples are written round robin into a multiple of shard.num_shards shards (the devices x data.num_workers),
+so each reader gets the same number of samples, and the distributed ranks do not hang at the end of the epoch.
+
+The ShardedGaitVideoDataset reads the shards sequentially (one large read instead of the small random reads),
+each dataloader worker (and each distributed rank) reads its own shards, and the encoded records are shuffled with the shuffle buffer
+(only the yielded record is decoded, so the buffer holds the compressed bytes, not the decoded videos).
+Train with data.shard_path=${shard.save_path}.
+
+python -m project.dataloader.shards shard.max_size=1000000000
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 11:36:02 pm
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+import io
+import itertools
+import json
+import math
+import os
+import random
+import logging
+import tarfile
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import hydra
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+
+from project.dataloader.gait_video_dataset import LabeledGaitVideoDataset
+from project.dataloader.utils import read_frames
+
+logger = logging.getLogger(__name__)
+
+
+class ShardWriter(object):
+    """
+    Write the samples into the tar shards, start a new shard when the size is over max_size.
+    """
+
+    def __init__(self, save_path: Path, prefix: str, max_size: float = 1e9) -> None:
+
+        self.save_path = Path(save_path)
+        self.save_path.mkdir(parents=True, exist_ok=True)
+
+        self.prefix = prefix
+        self.max_size = max_size
+
+        self.shard_num = 0
+        self.size = 0
+        self.tar = None
+
+    def next_shard(self) -> None:
+
+        self.close()
+
+        shard_path = self.save_path / f"{self.prefix}-{self.shard_num:06d}.tar"
+        self.tar = tarfile.open(shard_path, "w")
+        self.shard_num += 1
+        self.size = 0
+
+        logger.info(f"write the shard {shard_path}")
+
+    def add(self, name: str, data: bytes) -> None:
+
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        self.tar.addfile(info, io.BytesIO(data))
+
+    def write(self, key: str, file_info_dict: Dict, video_path: str) -> None:
+        """write one sample, the json and the video with the same key.
+
+        Args:
+            key (str): the sample key, without the dot.
+            file_info_dict (Dict): the json file info.
+            video_path (str): the video (or jpg archive) path.
+        """
+
+        if self.tar is None or self.size >= self.max_size:
+            self.next_shard()
+
+        suffix = Path(video_path).suffix.lstrip(".")
+        video = Path(video_path).read_bytes()
+
+        # * the video in the shard is the member name.
+        file_info_dict = dict(file_info_dict, video_path=f"{key}.{suffix}")
+        info = json.dumps(file_info_dict).encode()
+
+        self.add(f"{key}.json", info)
+        self.add(f"{key}.{suffix}", video)
+
+        self.size += len(info) + len(video)
+
+    def close(self) -> None:
+
+        if self.tar is not None:
+            self.tar.close()
+            self.tar = None
+
+
+def split_meta_path(save_path: Path, prefix: str) -> Path:
+    """the meta of one split, {save_path}/{prefix}.json, the sample number and the shard number."""
+
+    return Path(save_path) / f"{prefix}.json"
+
+
+def write_split(
+    json_paths: List[Path],
+    save_path: Path,
+    prefix: str,
+    root_path: str,
+    max_size: float,
+    num_shards: int = 1,
+) -> int:
+    """pack one split into the shards, the oversampled path is packed as many times as in the split.
+    The shard number is a multiple of num_shards, and the sample i is written into the shard i % shard number,
+    so the shard j of the world_size * num_workers readers has the samples with i % (world_size * num_workers) == j.
+
+    Args:
+        json_paths (List[Path]): the json file path of the split.
+        save_path (Path): the shard save path.
+        prefix (str): train or val.
+        root_path (str): the data.root_path, replace the /workspace/data in the video_path.
+        max_size (float): the max shard size in bytes.
+        num_shards (int, optional): the shard number is a multiple of it, the devices x data.num_workers. Defaults to 1.
+
+    Returns:
+        int: the shard number.
+    """
+
+    def _video_path(json_path: Path) -> str:
+        with open(json_path, "r") as f:
+            return json.load(f)["video_path"].replace("/workspace/data", root_path)
+
+    # * the shard number from the total size, rounded up to the multiple of num_shards.
+    num_shards = max(num_shards, 1)
+    total_size = sum(os.path.getsize(_video_path(p)) for p in json_paths)
+    shard_num = max(math.ceil(total_size / max_size / num_shards), 1) * num_shards
+
+    # * the shard is closed by the round robin, not by the size.
+    writer = ShardWriter(save_path, prefix, float("inf"))
+
+    for shard in range(shard_num):
+        writer.next_shard()
+
+        for index in range(shard, len(json_paths), shard_num):
+            with open(json_paths[index], "r") as f:
+                file_info_dict = json.load(f)
+
+            # * the index in the split, used as the video_index for the patient-level metrics.
+            file_info_dict["shard_index"] = index
+            video_path = file_info_dict["video_path"].replace("/workspace/data", root_path)
+
+            writer.write(f"{index:08d}", file_info_dict, video_path)
+
+    writer.close()
+
+    with open(split_meta_path(save_path, prefix), "w") as f:
+        json.dump({"sample_num": len(json_paths), "shard_num": shard_num}, f)
+
+    return writer.shard_num
+
+
+def iter_tar(shard_path: Path) -> Iterator[Dict[str, bytes]]:
+    """read the tar shard sequentially, group the members by the key.
+
+    Args:
+        shard_path (Path): the tar shard path.
+
+    Yields:
+        Dict[str, bytes]: {__key__: key, json: bytes, mp4 or pt: bytes}
+    """
+
+    sample = {}
+
+    with tarfile.open(shard_path, "r|") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+
+            key, suffix = member.name.split(".", 1)
+
+            if sample and sample["__key__"] != key:
+                yield sample
+                sample = {}
+
+            sample["__key__"] = key
+            sample[suffix] = tar.extractfile(member).read()
+
+    if sample:
+        yield sample
+
+
+def decode_video(suffix: str, data: bytes) -> torch.Tensor:
+    """decode the video bytes into the frames, t, c, h, w"""
+
+    # * the video decoder needs the file, use the local tmp instead of the shared filesystem.
+    with tempfile.NamedTemporaryFile(suffix=f".{suffix}") as f:
+        f.write(data)
+        f.flush()
+
+        return read_frames(f.name)
+
+
+class ShardedGaitVideoDataset(IterableDataset):
+    """
+    The streaming gait video dataset from the tar shards, same sample as the LabeledGaitVideoDataset.
+    """
+
+    def __init__(
+        self,
+        experiment: str,
+        shard_paths: List[Path],
+        transform: Optional[Callable[[dict], Any]] = None,
+        hparams: Dict = None,
+        shuffle_buffer: int = 0,
+        seed: int = 42,
+        sample_num: Optional[int] = None,
+    ) -> None:
+        super().__init__()
+
+        self.shard_paths = sorted(shard_paths)
+        # * the sample number of the split, each distributed rank yields the same number of samples.
+        self.sample_num = sample_num
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.epoch = 0
+
+        # * the sample process is same as the map style dataset, no json path.
+        self._dataset = LabeledGaitVideoDataset(
+            experiment=experiment,
+            labeled_video_paths=[],
+            transform=transform,
+            hparams=hparams,
+        )
+
+    def epoch_seed(self) -> int:
+        """the seed of this epoch, same for all the workers of one epoch.
+        In the worker, it is the base seed of the dataloader iterator (fixed by seed_everything) plus the epoch counter,
+        the counter is kept by the persistent worker, and the base seed is new for the non persistent worker.
+        """
+
+        self.epoch += 1
+        worker_info = get_worker_info()
+
+        if worker_info is not None:
+            return worker_info.seed - worker_info.id + self.epoch
+
+        return self.seed + self.epoch
+
+    @staticmethod
+    def reader_info() -> Tuple[int, int, int]:
+        """the reader slot of this worker, (slot, readers, world_size).
+        One reader for one dataloader worker of one distributed rank.
+        """
+
+        rank, world_size = 0, 1
+        if torch.distributed.is_available() and torch.distributed.is_initialized():
+            rank, world_size = torch.distributed.get_rank(), torch.distributed.get_world_size()
+
+        worker_info = get_worker_info()
+        worker_id, num_workers = (0, 1) if worker_info is None else (worker_info.id, worker_info.num_workers)
+
+        return rank * num_workers + worker_id, world_size * num_workers, world_size
+
+    def worker_shards(self, seed: int) -> List[Path]:
+        """the shards of this worker, split by the distributed rank and the dataloader worker.
+        The shards are written round robin (write_split), so each reader has the samples of the same index modulo.
+
+        Args:
+            seed (int): the seed of this epoch, for the shard order in the worker.
+
+        Returns:
+            List[Path]: the shard paths.
+        """
+
+        slot, total, _ = self.reader_info()
+
+        if len(self.shard_paths) % total != 0:
+            logger.warning(
+                f"{len(self.shard_paths)} shards for {total} readers, the sample number of each reader is not balanced, "
+                f"write the shards with shard.num_shards a multiple of {total}."
+            )
+
+        shards = self.shard_paths[slot::total]
+
+        if self.shuffle_buffer > 0:
+            random.Random(seed).shuffle(shards)
+
+        return shards
+
+    def worker_sample_num(self) -> Optional[int]:
+        """the sample number of this worker, same for all the readers in the distributed training, None is all."""
+
+        _, total, world_size = self.reader_info()
+
+        if world_size == 1 or self.sample_num is None:
+            return None
+
+        return self.sample_num // total
+
+    def iter_records(self, shards: List[Path]) -> Iterator[Dict[str, bytes]]:
+        """the raw records (the json and the encoded video bytes) of the shards."""
+
+        for shard_path in shards:
+            yield from iter_tar(shard_path)
+
+    def decode_record(self, record: Dict[str, bytes]) -> Dict[str, Any]:
+        """decode the record into the sample, same as the LabeledGaitVideoDataset."""
+
+        file_info_dict = json.loads(record["json"])
+        suffix = file_info_dict["video_path"].split(".", 1)[1]
+
+        vframes = decode_video(suffix, record[suffix])
+
+        return self._dataset.make_sample(
+            file_info_dict, vframes, file_info_dict["shard_index"]
+        )
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+
+        sample_num = self.worker_sample_num()
+
+        # * the ranks yield the same number of samples, the extra samples are dropped in this epoch.
+        if sample_num is not None:
+            return itertools.islice(self.iter_samples(), sample_num)
+
+        return self.iter_samples()
+
+    def iter_samples(self) -> Iterator[Dict[str, Any]]:
+        """the decoded samples of this worker, shuffled by the shuffle buffer."""
+
+        seed = self.epoch_seed()
+        records = self.iter_records(self.worker_shards(seed))
+
+        if self.shuffle_buffer <= 0:
+            for record in records:
+                yield self.decode_record(record)
+            return
+
+        worker_info = get_worker_info()
+        rng = random.Random(seed + (0 if worker_info is None else worker_info.id + 1))
+
+        # * the shuffle buffer keeps the encoded records, only the yielded one is decoded.
+        buffer = []
+        for record in records:
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(record)
+                continue
+
+            i = rng.randrange(len(buffer))
+            yield self.decode_record(buffer[i])
+            buffer[i] = record
+
+        rng.shuffle(buffer)
+        for record in buffer:
+            yield self.decode_record(record)
+
+
+def split_shards(shard_path: Path, fold: int, split: str) -> List[Path]:
+    """the shard paths of one fold split."""
+
+    return sorted((Path(shard_path) / f"fold{fold}").glob(f"{split}-*.tar"))
+
+
+def split_sample_num(shard_path: Path, fold: int, split: str) -> Optional[int]:
+    """the sample number of one fold split, None for the shards written without the meta."""
+
+    meta_path = split_meta_path(Path(shard_path) / f"fold{fold}", split)
+
+    if not meta_path.exists():
+        logger.warning(f"{meta_path} not found, the distributed ranks may get different sample numbers.")
+        return None
+
+    with open(meta_path, "r") as f:
+        return json.load(f)["sample_num"]
+
+
+@hydra.main(
+    version_base=None,
+    config_path="../../configs",
+    config_name="classifier_config.yaml",
+)
+def write_shards(config):
+
+    from project.cross_validation import DefineCrossValidation
+
+    fold_dataset_idx = DefineCrossValidation(config)()
+
+    for fold, (train_idx, val_idx) in fold_dataset_idx.items():
+        save_path = Path(config.shard.save_path) / f"fold{fold}"
+
+        for prefix, json_paths in [("train", train_idx), ("val", val_idx)]:
+            shard_num = write_split(
+                json_paths,
+                save_path,
+                prefix,
+                config.data.root_path,
+                config.shard.max_size,
+                config.shard.get("num_shards", 1),
+            )
+            logger.info(f"fold {fold} {prefix}: {len(json_paths)} samples, {shard_num} shards.")
+
+
+if __name__ == "__main__":
+
+    write_shards()
@@ -21,8 +21,9 @@ Date      	By	Comments
 """
 
 import torch
+from torchvision.io import decode_jpeg, read_video
 from torchvision.transforms.v2 import functional as F, Transform
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 
 class UniformTemporalSubsample(Transform):
@@ -87,3 +88,45 @@ class Div255(torch.nn.Module):
             x (Tensor): Scaled tensor by dividing 255.
         """
         return x / 255.0
+
+
+def read_frames(video_path: str) -> torch.Tensor:
+    """
+    Read all the frames of the video, or of the jpg archive (.pt) from the precrop exporter.
+
+    Args:
+        video_path (str): the video path, or the jpg archive path.
+
+    Returns:
+        torch.Tensor: uint8, (T, C, H, W)
+    """
+    if str(video_path).endswith(".pt"):
+        archive = torch.load(video_path, map_location="cpu")
+        return torch.stack([decode_jpeg(frame) for frame in archive["frames"]], dim=0)
+
+    vframes, _, _ = read_video(str(video_path), output_format="TCHW", pts_unit="sec")
+    return vframes
+
+
+def window_starts(frame_num: int, window: int, stride: int, tail: bool = False) -> List[int]:
+    """
+    The start frame of each sliding window, the overlap of the neighbor windows is window - stride.
+
+    Args:
+        frame_num (int): the frame number of the video.
+        window (int): the window length, uniform_temporal_subsample_num.
+        stride (int): the window stride, window is the non-overlapping clips.
+        tail (bool, optional): add the last window ending at the last frame, when the remainder frames are not covered. Defaults to False.
+
+    Returns:
+        List[int]: the start frames, empty when the video is shorter than the window.
+    """
+    if stride < 1:
+        raise ValueError(f"the window stride {stride} should be >= 1.")
+
+    starts = list(range(0, frame_num - window + 1, stride))
+
+    if tail and starts and starts[-1] + window < frame_num:
+        starts.append(frame_num - window)
+
+    return starts
@@ -22,10 +22,9 @@ Date      	By	Comments
 
 import logging
 from pathlib import Path
-import matplotlib.pyplot as plt
-import seaborn as sns
 import torch
 
+from torchmetrics import MetricCollection
 from torchmetrics.classification import (
     MulticlassAccuracy,
     MulticlassPrecision,
@@ -35,11 +34,63 @@ from torchmetrics.classification import (
     MulticlassAUROC,
 )
 
-from pytorch_grad_cam import GradCAMPlusPlus
-from captum.attr import visualization as viz
+from project.patient_aggregate import patient_metrics, save_group, save_patient_metrics
 
 logger = logging.getLogger(__name__)
 
+# * the order of metrics.txt, the MetricCollection sorts the keys.
+METRIC_NAMES = ("accuracy", "precision", "recall", "f1_score", "aurroc", "confusion_matrix")
+
+
+def to_cpu_buffer(
+    pred: torch.Tensor, label: torch.Tensor
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """move the per-batch pred and label out of the device memory, for the test buffer.
+    The pred is kept as float16 on cpu, the metrics are computed in float32.
+
+    Args:
+        pred (torch.Tensor): the softmax pred of one batch, b, class_num
+        label (torch.Tensor): the label of one batch, b
+
+    Returns:
+        tuple[torch.Tensor, torch.Tensor]: the cpu pred and label.
+    """
+
+    return pred.detach().to("cpu", torch.float16), label.detach().to("cpu")
+
+
+def compute_metrics(
+    all_pred: list[torch.Tensor], all_label: list[torch.Tensor], num_class: int
+) -> dict[str, torch.Tensor]:
+    """compute the metrics on cpu, the metric state is updated batch by batch and computed once.
+
+    Args:
+        all_pred (list[torch.Tensor]): the pred of each batch.
+        all_label (list[torch.Tensor]): the label of each batch.
+        num_class (int): number of class.
+
+    Returns:
+        dict[str, torch.Tensor]: the metric name and value, in the order of METRIC_NAMES.
+    """
+
+    metrics = MetricCollection(
+        {
+            "accuracy": MulticlassAccuracy(num_class),
+            "precision": MulticlassPrecision(num_class),
+            "recall": MulticlassRecall(num_class),
+            "f1_score": MulticlassF1Score(num_class),
+            "aurroc": MulticlassAUROC(num_class),
+            "confusion_matrix": MulticlassConfusionMatrix(num_class, normalize="true"),
+        }
+    )
+
+    for pred, label in zip(all_pred, all_label):
+        metrics.update(pred.cpu().float(), label.cpu().long())
+
+    res = metrics.compute()
+
+    return {name: res[name] for name in METRIC_NAMES}
+
 
 def save_helper(
     all_pred: list[torch.Tensor],
@@ -47,6 +98,9 @@ def save_helper(
     fold: str,
     save_path: str,
     num_class: int,
+    all_group: list[torch.Tensor] = None,
+    video_name: dict = None,
+    aggregate: str = "mean",
 ):
     """save the inference results and metrics.
 
@@ -56,14 +110,30 @@ def save_helper(
         fold (str): fold number.
         save_path (str): save path.
         num_class (int): number of class.
+        all_group (list, optional): the video index of each row, for the patient-level metrics. Defaults to None.
+        video_name (dict, optional): video index to video name. Defaults to None.
+        aggregate (str, optional): the patient-level aggregate method, mean, max or vote. Defaults to "mean".
     """
 
-    all_pred: torch.Tensor = torch.cat(all_pred, dim=0)
+    metrics = compute_metrics(all_pred, all_label, num_class)
+
+    all_pred: torch.Tensor = torch.cat(all_pred, dim=0).float()
     all_label: torch.Tensor = torch.cat(all_label, dim=0)
 
     save_inference(all_pred, all_label, fold, save_path)
-    save_metrics(all_pred, all_label, fold, save_path, num_class)
-    save_CM(all_pred, all_label, save_path, num_class, fold)
+    save_metrics(metrics, fold, save_path)
+    save_CM(metrics["confusion_matrix"], save_path, fold)
+
+    if all_group is not None:
+        save_group(all_group, video_name or {}, fold, save_path)
+        save_patient_metrics(
+            patient_metrics(
+                all_pred, all_label, torch.cat(all_group, dim=0), num_class, aggregate
+            ),
+            fold,
+            save_path,
+            aggregate,
+        )
 
 
 def save_inference(
@@ -97,66 +167,43 @@ def save_inference(
 
 
 def save_metrics(
-    all_pred: torch.Tensor,
-    all_label: torch.Tensor,
+    metrics: dict[str, torch.Tensor],
     fold: str,
     save_path: str,
-    num_class: int,
 ):
     """save the metrics to .txt file.
 
     Args:
-        all_pred (list): all the predict result.
-        all_label (list): all the label result.
+        metrics (dict[str, torch.Tensor]): the computed metrics, from compute_metrics.
         fold (str): the fold number.
         save_path (str): the path to save the metrics.
-        num_class (int): number of class.
     """
 
     save_path = Path(save_path) / "metrics.txt"
 
-    _accuracy = MulticlassAccuracy(num_class).cuda()
-    _precision = MulticlassPrecision(num_class).cuda()
-    _recall = MulticlassRecall(num_class).cuda()
-    _f1_score = MulticlassF1Score(num_class).cuda()
-    _auroc = MulticlassAUROC(num_class).cuda()
-    _confusion_matrix = MulticlassConfusionMatrix(num_class, normalize="true").cuda()
-
     logger.info("*" * 100)
-    logger.info("accuracy: %s" % _accuracy(all_pred, all_label))
-    logger.info("precision: %s" % _precision(all_pred, all_label))
-    logger.info("recall: %s" % _recall(all_pred, all_label))
-    logger.info("f1_score: %s" % _f1_score(all_pred, all_label))
-    logger.info("aurroc: %s" % _auroc(all_pred, all_label.long()))
-    logger.info("confusion_matrix: %s" % _confusion_matrix(all_pred, all_label))
+    for name, value in metrics.items():
+        logger.info(f"{name}: {value}")
     logger.info("#" * 100)
 
     with open(save_path, "a") as f:
         f.writelines(f"Fold {fold}\n")
-        f.writelines(f"accuracy: {_accuracy(all_pred, all_label)}\n")
-        f.writelines(f"precision: {_precision(all_pred, all_label)}\n")
-        f.writelines(f"recall: {_recall(all_pred, all_label)}\n")
-        f.writelines(f"f1_score: {_f1_score(all_pred, all_label)}\n")
-        f.writelines(f"aurroc: {_auroc(all_pred, all_label.long())}\n")
-        f.writelines(f"confusion_matrix: {_confusion_matrix(all_pred, all_label)}\n")
+        for name, value in metrics.items():
+            f.writelines(f"{name}: {value}\n")
         f.writelines("#" * 100)
         f.writelines("\n")
 
 
 def save_CM(
-    all_pred: torch.Tensor,
-    all_label: torch.Tensor,
+    confusion_matrix: torch.Tensor,
     save_path: str,
-    num_class: int,
     fold: str,
 ):
     """save the confusion matrix to file.
 
     Args:
-        all_pred (list): predict result.
-        all_label (list): label result.
+        confusion_matrix (torch.Tensor): the normalized confusion matrix, num_class, num_class
         save_path (Path): the path to save the confusion matrix.
-        num_class (int): the number of class.
         fold (str): the fold number.
     """
 
@@ -165,14 +212,14 @@ def save_CM(
     if save_path.exists() is False:
         save_path.mkdir(parents=True)
 
-    _confusion_matrix = MulticlassConfusionMatrix(num_class, normalize="true").cuda()
-
-    logger.info("_confusion_matrix: %s" % _confusion_matrix(all_pred, all_label))
+    # * the plotting libs are only imported when the confusion matrix is saved.
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
     # set the font and title
     plt.rcParams.update({"font.size": 30, "font.family": "sans-serif"})
     
-    confusion_matrix_data = _confusion_matrix(all_pred, all_label).cpu().numpy() * 100
+    confusion_matrix_data = confusion_matrix.cpu().numpy() * 100
 
     axis_labels = ["ASD", "DHS", "LCS_HipOA"]
 
@@ -194,6 +241,7 @@ def save_CM(
     plt.savefig(
         save_path / f"fold{fold}_confusion_matrix.png", dpi=300, bbox_inches="tight"
     )
+    plt.close()
 
     logger.info(
         f"save the confusion matrix into {save_path}/fold{fold}_confusion_matrix.png"
@@ -228,6 +276,9 @@ def save_CM(
 #     target_layer = [model.blocks[-2].res_blocks[-1]]
 #     # target_layer = [model.model.blocks[-2]]
 
+#     from pytorch_grad_cam import GradCAMPlusPlus
+#     from captum.attr import visualization as viz
+
 #     cam = GradCAMPlusPlus(model, target_layer)
 
 #     # save the CAM
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/project/inference/ensemble.py
+Project: /workspace/code/project/inference
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+Fold ensemble for the production prediction.
+Each video is decoded and preprocessed once, then all the K fold models run on the same device tensor.
+When the classifier is a plain feed-forward network (has predict_input), the fold weights are stacked
+with torch.func.stack_module_state and run in one vmap call.
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 2:40:11 pm
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+from __future__ import annotations
+
+import copy
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import torch
+import torch.nn as nn
+from torch.func import functional_call, stack_module_state, vmap
+from torch.utils.data import DataLoader
+from torchvision.transforms import Compose, Resize
+
+from pytorch_lightning import LightningModule
+
+from project.dataloader.gait_video_dataset import labeled_gait_video_dataset
+from project.dataloader.utils import Div255
+from project.cross_validation import class_num_mapping_Dict
+from project.utils.checkpoint import load_lightning_state_dict
+
+from project.trainer import get_trainer
+
+logger = logging.getLogger(__name__)
+
+
+def find_fold_checkpoint(ckpt_path: Path, fold: int) -> Path:
+    """find the best ckpt for one fold.
+
+    The ckpt moved by MoveBestModelCallback is named {fold}_best_model.ckpt.
+    The ckpt saved by ModelCheckpoint is under {ckpt_path}/{fold}/version_*/checkpoints/,
+    the file name is {epoch}-{val/loss}-{val/video_acc}, so select the max val/video_acc one.
+
+    Args:
+        ckpt_path (Path): the ckpt root path, usually the train.log_path.
+        fold (int): the fold index.
+
+    Returns:
+        Path: the selected ckpt path.
+    """
+
+    moved_ckpt = ckpt_path / f"{fold}_best_model.ckpt"
+    if moved_ckpt.exists():
+        return moved_ckpt
+
+    candidates = sorted((ckpt_path / str(fold)).rglob("*.ckpt"))
+    if not candidates:
+        raise FileNotFoundError(f"no ckpt found for fold {fold} in {ckpt_path}")
+
+    def _video_acc(path: Path) -> float:
+        try:
+            return float(path.stem.split("-")[-1])
+        except ValueError:
+            return float("-inf")
+
+    return max(candidates, key=_video_acc)
+
+
+def make_classifier(hparams) -> LightningModule:
+    """make the classification module with the backbone, same as the project.main.train"""
+
+    return get_trainer(hparams.train.backbone)(hparams)
+
+
+def load_fold_classifiers(hparams, device: torch.device) -> List[LightningModule]:
+    """load the K fold trained classifier from inference.ckpt_path.
+
+    Args:
+        hparams (hydra): the hyperparameters.
+        device (torch.device): the device to inference.
+
+    Returns:
+        List[LightningModule]: the classifier for each fold, in eval mode.
+    """
+
+    ckpt_path = Path(hparams.inference.ckpt_path)
+    models = []
+
+    for fold in range(hparams.train.fold):
+        fold_ckpt = find_fold_checkpoint(ckpt_path, fold)
+
+        module = make_classifier(hparams)
+        module.load_state_dict(load_lightning_state_dict(fold_ckpt))
+        module.to(device).eval()
+
+        logger.info(f"load fold {fold} classifier from {fold_ckpt}")
+        models.append(module)
+
+    return models
+
+
+def vmap_unsupported(e: RuntimeError) -> bool:
+    """the error raised by the torch.func when some op of the model has no batching rule, not the real error."""
+
+    msg = str(e)
+    return "vmap" in msg or "Batching rule not implemented" in msg
+
+
+class FoldEnsemble(nn.Module):
+    """
+    Run the K fold classifiers on the same input.
+    The output is the softmax result of each fold model, (fold, b, class_num).
+    """
+
+    def __init__(self, models: List[LightningModule]) -> None:
+        super().__init__()
+
+        # * keep in list, the fold models are not the submodule of the ensemble.
+        self.models = models
+
+        self.stacked = len(models) > 1 and all(
+            hasattr(m, "predict_input") for m in models
+        )
+
+        if self.stacked:
+            self._params, self._buffers_stack = stack_module_state(models)
+
+            # the stateless copy, only used for the functional_call
+            self._base = [copy.deepcopy(models[0]).to("meta")]
+
+            # * the stacked weights are the only copy on the device, the fold models are kept on the meta device.
+            for model in models:
+                model.to("meta")
+
+    def unstack(self) -> None:
+        """write the stacked weights back into the fold models, and drop the stacked weights."""
+
+        for i, model in enumerate(self.models):
+            model.to_empty(device=next(iter(self._params.values())).device)
+
+            with torch.no_grad():
+                for name, param in model.named_parameters():
+                    param.copy_(self._params[name][i])
+                for name, buffer in model.named_buffers():
+                    buffer.copy_(self._buffers_stack[name][i])
+
+        self.stacked = False
+        del self._params, self._buffers_stack, self._base
+
+    def stacked_forward(self, video: torch.Tensor) -> torch.Tensor:
+        """forward all the fold models in one vmap call.
+
+        Args:
+            video (torch.Tensor): b, c, t, h, w
+
+        Returns:
+            torch.Tensor: fold, b, class_num
+        """
+
+        base = self._base[0]
+        x = base.predict_input(video)
+
+        def fmodel(params, buffers, x):
+            return functional_call(base, (params, buffers), (x,))
+
+        with torch.no_grad():
+            preds = vmap(fmodel, in_dims=(0, 0, None))(self._params, self._buffers_stack, x)
+
+        return torch.softmax(preds, dim=-1)
+
+    def forward(self, video: torch.Tensor) -> torch.Tensor:
+
+        if self.stacked:
+            try:
+                return self.stacked_forward(video)
+            except RuntimeError as e:
+                # * only the op without the vmap support falls back, the shape error and the oom are raised.
+                if not vmap_unsupported(e):
+                    raise
+
+                logger.warning(f"vmap the fold models failed, run one by one from now on. {e}")
+                self.unstack()
+
+        return torch.stack(
+            [model.predict_step({"video": video}, 0) for model in self.models], dim=0
+        )
+
+
+class EnsemblePredictor(object):
+    """
+    Predict the json defined videos with the fold ensemble.
+    The video is decoded and preprocessed by the LabeledGaitVideoDataset once for all the folds.
+    """
+
+    def __init__(self, hparams) -> None:
+
+        self.device = torch.device(hparams.inference.device)
+        self.class_num = hparams.model.model_class_num
+        self._img_size = hparams.data.img_size
+        self._num_workers = hparams.inference.num_workers
+
+        self.ensemble = FoldEnsemble(load_fold_classifiers(hparams, self.device))
+
+        video_json = Path(hparams.inference.video_json)
+        if video_json.is_dir():
+            self.video_json_list = sorted(video_json.rglob("*.json"))
+        else:
+            self.video_json_list = [video_json]
+
+        self.dataset = labeled_gait_video_dataset(
+            experiment=hparams.train.experiment,
+            dataset_idx=self.video_json_list,
+            transform=Compose(
+                [Div255(), Resize(size=[self._img_size, self._img_size])]
+            ),
+            hparams=hparams,
+        )
+
+    def __call__(self) -> Iterator[Dict[str, Any]]:
+        """predict the videos one by one.
+
+        Yields:
+            Dict[str, Any]: the per-fold and averaged result of one video.
+        """
+
+        class_map = class_num_mapping_Dict[self.class_num]
+
+        data_loader = DataLoader(
+            self.dataset,
+            batch_size=None,  # one video in one step, the clip number is different.
+            num_workers=self._num_workers,
+            pin_memory=self.device.type == "cuda",
+        )
+
+        for sample in data_loader:
+
+            video = sample["video"].to(self.device, non_blocking=True)  # b, c, t, h, w
+
+            fold_probs = self.ensemble(video).mean(dim=1).cpu()  # fold, class_num
+            probs = fold_probs.mean(dim=0)
+
+            yield {
+                "video_name": sample["video_name"],
+                "disease": sample["disease"],
+                "fold_probs": fold_probs.tolist(),
+                "probs": probs.tolist(),
+                "pred": class_map[int(probs.argmax())],
+            }
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/project/inference/export.py
+Project: /workspace/code/project/inference
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+Export the trained classifier and filter model into TorchScript and ONNX,
+so the inference node only need the torch runtime (or onnxruntime), without lightning/hydra.
+The lightning wrapper is stripped, only the pure torch network is exported.
+After export, the exported model is checked with the eager output on the same input.
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 4:05:47 pm
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+import os
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import hydra
+import torch
+import torch.nn as nn
+
+from project.utils.checkpoint import load_lightning_state_dict
+
+logger = logging.getLogger(__name__)
+
+# the attribute name of the torch network in the lightning module, used as the state dict prefix.
+MODEL_PREFIX = {
+    "3dcnn": "video_cnn.",
+    "2dcnn": "model.",
+    "cnn_lstm": "model.",
+    "filter": "model.",
+}
+
+
+def make_export_model(hparams, backbone: str) -> nn.Module:
+    """make the pure torch network, same structure with the lightning module.
+
+    Args:
+        hparams (hydra): the hyperparameters.
+        backbone (str): 3dcnn, 2dcnn, cnn_lstm or filter.
+
+    Returns:
+        nn.Module: the torch network.
+    """
+
+    # * import here, the filter export not need pytorchvideo.
+    from project.models.make_model import MakeImageModule, MakeVideoModule, CNNLSTM
+
+    if backbone == "3dcnn":
+        return MakeVideoModule(hparams).make_resnet()
+    elif backbone in ["2dcnn", "filter"]:
+        # keep same with the CNNModule, the rgb frame input.
+        return MakeImageModule(hparams).make_resnet(3)
+    elif backbone == "cnn_lstm":
+        return CNNLSTM(hparams)
+    else:
+        raise ValueError(f"the {backbone} is not supported to export.")
+
+
+def example_input(hparams, backbone: str) -> Tuple[torch.Tensor, Dict[int, str]]:
+    """make the example input for trace, and the dynamic axes of the input.
+
+    Args:
+        hparams (hydra): the hyperparameters.
+        backbone (str): 3dcnn, 2dcnn, cnn_lstm or filter.
+
+    Returns:
+        Tuple[torch.Tensor, Dict[int, str]]: the example input and the dynamic axes.
+    """
+
+    t = hparams.train.uniform_temporal_subsample_num
+    img_size = hparams.data.img_size
+
+    if backbone in ["2dcnn", "filter"]:
+        # * the 2d model is frame wise, the rgb frames (b*t) is the first dim.
+        return torch.randn(t, 3, img_size, img_size), {0: "frames"}
+
+    # b, c, t, h, w
+    video = torch.randn(1, 3, t, img_size, img_size)
+
+    if backbone == "cnn_lstm":
+        # the batch loop in CNNLSTM.forward is unrolled by trace, so the batch is fixed.
+        axes = {}
+    else:
+        axes = {0: "batch"}
+
+    if hparams.export.dynamic_t:
+        axes[2] = "time"
+
+    return video, axes
+
+
+def export_torchscript(model: nn.Module, example: torch.Tensor, save_path: Path) -> Path:
+    """trace the model and save as TorchScript.
+
+    Args:
+        model (nn.Module): the torch model in eval mode.
+        example (torch.Tensor): the example input.
+        save_path (Path): the .pt save path.
+
+    Returns:
+        Path: the save path.
+    """
+
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+    traced.save(str(save_path))
+
+    return save_path
+
+
+def export_onnx(
+    model: nn.Module,
+    example: torch.Tensor,
+    save_path: Path,
+    dynamic_axes: Dict[int, str],
+    opset: int = 17,
+) -> Path:
+    """export the model into ONNX.
+
+    Args:
+        model (nn.Module): the torch model in eval mode.
+        example (torch.Tensor): the example input.
+        save_path (Path): the .onnx save path.
+        dynamic_axes (Dict[int, str]): the dynamic axes of the input.
+        opset (int, optional): the onnx opset version. Defaults to 17.
+
+    Returns:
+        Path: the save path.
+    """
+
+    output_axes = {0: dynamic_axes[0]} if 0 in dynamic_axes else {}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            example,
+            str(save_path),
+            input_names=["video"],
+            output_names=["logits"],
+            dynamic_axes={"video": dynamic_axes, "logits": output_axes},
+            opset_version=opset,
+        )
+
+    return save_path
+
+
+def check_parity(
+    model: nn.Module, exported: Path, inputs: List[torch.Tensor], atol: float = 1e-4
+) -> float:
+    """compare the exported model output with the eager output.
+
+    Args:
+        model (nn.Module): the eager model in eval mode.
+        exported (Path): the .pt or .onnx file.
+        inputs (List[torch.Tensor]): the test inputs, can have different dynamic dims.
+        atol (float, optional): the tolerance. Defaults to 1e-4.
+
+    Returns:
+        float: the max abs difference over all the inputs.
+    """
+
+    if exported.suffix == ".onnx":
+        import onnxruntime
+
+        session = onnxruntime.InferenceSession(
+            str(exported), providers=["CPUExecutionProvider"]
+        )
+        run = lambda x: torch.from_numpy(session.run(None, {"video": x.numpy()})[0])
+    else:
+        scripted = torch.jit.load(str(exported), map_location="cpu")
+        run = scripted
+
+    max_diff = 0.0
+
+    with torch.no_grad():
+        for x in inputs:
+            diff = (model(x) - run(x)).abs().max().item()
+            max_diff = max(max_diff, diff)
+
+    if max_diff > atol:
+        raise RuntimeError(
+            f"the exported model {exported} is different from eager model, max diff {max_diff}"
+        )
+
+    return max_diff
+
+
+def export_one(hparams, backbone: str, ckpt_path: Path, save_path: Path) -> Dict[str, float]:
+    """load the lightning ckpt, export and check one model.
+
+    Args:
+        hparams (hydra): the hyperparameters.
+        backbone (str): 3dcnn, 2dcnn, cnn_lstm or filter.
+        ckpt_path (Path): the lightning ckpt path.
+        save_path (Path): the save path without suffix.
+
+    Returns:
+        Dict[str, float]: the max abs difference of each exported format.
+    """
+
+    model = make_export_model(hparams, backbone)
+    model.load_state_dict(load_lightning_state_dict(ckpt_path, MODEL_PREFIX[backbone]))
+    model.eval()
+
+    example, dynamic_axes = example_input(hparams, backbone)
+
+    # the parity input, also check the dynamic axes with the other size.
+    inputs = [example]
+    if 0 in dynamic_axes:
+        inputs.append(torch.cat([example, example], dim=0))
+    if 2 in dynamic_axes:
+        inputs.append(
+            torch.randn(*example.shape[:2], example.shape[2] * 2, *example.shape[3:])
+        )
+
+    parity = {}
+
+    for fmt in hparams.export.format:
+        if fmt == "torchscript":
+            exported = export_torchscript(model, example, save_path.with_suffix(".pt"))
+        elif fmt == "onnx":
+            exported = export_onnx(
+                model,
+                example,
+                save_path.with_suffix(".onnx"),
+                dynamic_axes,
+                hparams.export.opset,
+            )
+        else:
+            raise ValueError(f"the export format {fmt} is not supported.")
+
+        try:
+            parity[fmt] = check_parity(model, exported, inputs, hparams.export.atol)
+        except ImportError:
+            logger.warning(f"onnxruntime is not installed, skip the parity check of {exported}")
+            continue
+
+        logger.info(f"export {exported}, max diff with eager {parity[fmt]}")
+
+    return parity
+
+
+@hydra.main(
+    version_base=None,
+    config_path="../../configs",  # * the config_path is relative to location of the python script
+    config_name="inference_config.yaml",
+)
+def init_params(config):
+
+    save_path = Path(config.export.save_path)
+    save_path.mkdir(parents=True, exist_ok=True)
+
+    export_info = {}
+
+    if config.export.target == "classifier":
+
+        from project.inference.ensemble import find_fold_checkpoint
+
+        backbone = config.train.backbone
+        if backbone not in MODEL_PREFIX:
+            raise ValueError(f"the {backbone} is not supported to export.")
+
+        for fold in range(config.train.fold):
+            fold_ckpt = find_fold_checkpoint(Path(config.inference.ckpt_path), fold)
+            export_info[f"fold{fold}"] = export_one(
+                config, backbone, fold_ckpt, save_path / f"{backbone}_{fold}"
+            )
+
+    elif config.export.target == "filter":
+
+        phases = ["stance", "swing"] if config.filter.phase == "mix" else [config.filter.phase]
+
+        for phase in phases:
+            ckpt_path = Path(config.filter.path) / phase / f"{config.filter.fold}_best_model.ckpt"
+            export_info[phase] = export_one(
+                config, "filter", ckpt_path, save_path / f"filter_{phase}_{config.filter.fold}"
+            )
+
+    else:
+        raise ValueError(f"the export target {config.export.target} is not supported.")
+
+    with open(save_path / "export_info.json", "w") as f:
+        json.dump(export_info, f, indent=4)
+
+
+if __name__ == "__main__":
+
+    os.environ["HYDRA_FULL_ERROR"] = "1"
+    init_params()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/project/inference/main.py
+Project: /workspace/code/project/inference
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+Classify the new patient video with the trained fold ensemble.
+stream: input is the raw gait video with the gait cycle/bbox json file,
+the per-cycle and patient-level results are saved into the .jsonl file during the prediction.
+ensemble: input is the filter scored json file (or folder), each video is decoded once for all the folds.
+window: the sliding windows of the long video in the fixed memory, only for the plain clip mode.
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 10:12:31 am
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+import os
+import json
+import logging
+from pathlib import Path
+
+import hydra
+
+from project.inference.stream_predictor import StreamPredictor
+from project.inference.ensemble import EnsemblePredictor
+from project.inference.sliding_window import SlidingWindowPredictor
+
+logger = logging.getLogger(__name__)
+
+
+def stream_predict(config):
+    """classify one new video cycle by cycle, with the streaming predictor."""
+
+    with open(config.inference.video_json, "r") as f:
+        file_info_dict = json.load(f)
+
+    video_name = file_info_dict["video_name"]
+
+    if config.inference.video_path is not None:
+        video_path = config.inference.video_path
+    else:
+        video_path = file_info_dict["video_path"].replace(
+            "/workspace/data", config.data.root_path
+        )
+
+    predictor = StreamPredictor(config)
+
+    save_path = Path(config.inference.log_path)
+    save_path.mkdir(parents=True, exist_ok=True)
+    save_file = save_path / f"{video_name}_pred.jsonl"
+
+    logger.info("#" * 50)
+    logger.info(f"Start predict {video_name}")
+    logger.info("#" * 50)
+
+    with open(save_file, "w") as f:
+        for res in predictor(
+            video_path,
+            file_info_dict["gait_cycle_index"],
+            file_info_dict["bbox"],
+            file_info_dict.get("none_index", []),
+        ):
+            logger.info(
+                f"cycle {res['cycle']} {res['frame_range']}: {res['cycle_pred']}, patient: {res['patient_pred']} {res['patient_probs']}"
+            )
+
+            # flush for each cycle, so the running result can be read during the prediction.
+            f.write(json.dumps(res) + "\n")
+            f.flush()
+
+    logger.info(f"save the prediction into {save_file}")
+
+
+def ensemble_predict(config):
+    """classify the json defined videos (one file or one folder) with the fold ensemble."""
+
+    predictor = EnsemblePredictor(config)
+
+    save_path = Path(config.inference.log_path)
+    save_path.mkdir(parents=True, exist_ok=True)
+    save_file = save_path / "ensemble_pred.jsonl"
+
+    logger.info("#" * 50)
+    logger.info(f"Start predict {len(predictor.video_json_list)} videos")
+    logger.info("#" * 50)
+
+    with open(save_file, "w") as f:
+        for res in predictor():
+            logger.info(f"{res['video_name']}: {res['pred']} {res['probs']}")
+
+            f.write(json.dumps(res) + "\n")
+            f.flush()
+
+    logger.info(f"save the prediction into {save_file}")
+
+
+def window_predict(config):
+    """classify the long videos (one json file or one folder) with the sliding windows."""
+
+    predictor = SlidingWindowPredictor(config)
+
+    save_path = Path(config.inference.log_path)
+    save_path.mkdir(parents=True, exist_ok=True)
+    save_file = save_path / "window_pred.jsonl"
+
+    logger.info("#" * 50)
+    logger.info(f"Start predict {len(predictor.video_json_list)} videos, window stride {predictor.stride}")
+    logger.info("#" * 50)
+
+    with open(save_file, "w") as f:
+        for res in predictor():
+            logger.info(f"{res['video_name']}: {res['window_num']} windows, {res['pred']} {res['probs']}")
+
+            f.write(json.dumps(res) + "\n")
+            f.flush()
+
+    logger.info(f"save the prediction into {save_file}")
+
+
+@hydra.main(
+    version_base=None,
+    config_path="../../configs",  # * the config_path is relative to location of the python script
+    config_name="inference_config.yaml",
+)
+def init_params(config):
+
+    if config.inference.mode == "stream":
+        stream_predict(config)
+    elif config.inference.mode == "ensemble":
+        ensemble_predict(config)
+    elif config.inference.mode == "window":
+        window_predict(config)
+    else:
+        raise ValueError(f"the inference mode {config.inference.mode} is not supported.")
+
+
+if __name__ == "__main__":
+
+    os.environ["HYDRA_FULL_ERROR"] = "1"
+    init_params()
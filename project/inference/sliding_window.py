@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/project/inference/sliding_window.py
+Project: /workspace/code/project/inference
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+Sliding window prediction of the long video, for the plain clip mode (train.filter=False, train.temporal_mix=False).
+The frames are decoded one by one and resized on arrival, only the frames of the current window are kept.
+The windows (uniform_temporal_subsample_num frames, inference.window_stride apart, the overlap is window - stride)
+are classified in chunks of inference.window_chunk windows, and the fold outputs are aggregated after each chunk,
+so the memory does not grow with the video length. With train.clip_tail, the last window ends at the last frame.
+
+python -m project.inference.main inference.mode=window inference.video_json=<json or folder> inference.window_stride=4
+
+Have a good code time :)
+-----
+Last Modified: Tuesday October 20th 2026 1:48:20 am
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import torch
+import torch.nn.functional as F
+from torchvision.io import VideoReader
+from torchvision.transforms import Compose, Resize
+
+from project.cross_validation import class_num_mapping_Dict
+from project.dataloader.utils import Div255
+from project.inference.ensemble import FoldEnsemble, load_fold_classifiers
+
+logger = logging.getLogger(__name__)
+
+
+class WindowAggregator(object):
+    """
+    The running aggregate of the window predictions of each fold, same methods as the patient_aggregate.
+    mean: the running sum, max: the running max, vote: the argmax count.
+    """
+
+    def __init__(self, fold_num: int, class_num: int, method: str = "mean") -> None:
+
+        if method not in ("mean", "max", "vote"):
+            raise ValueError(f"the aggregate method {method} is not supported.")
+
+        self.method = method
+        self.class_num = class_num
+        self.state = torch.zeros(fold_num, class_num)
+        self.count = 0
+
+    def update(self, probs: torch.Tensor) -> None:
+        """add the predictions of one chunk.
+
+        Args:
+            probs (torch.Tensor): the softmax result, fold, n, class_num. n is the window number (the frame number for the 2dcnn).
+        """
+
+        probs = probs.float().cpu()
+
+        if self.method == "mean":
+            self.state += probs.sum(dim=1)
+        elif self.method == "max":
+            self.state = torch.maximum(self.state, probs.amax(dim=1))
+        else:
+            self.state += F.one_hot(probs.argmax(dim=-1), self.class_num).sum(dim=1)
+
+        self.count += probs.shape[1]
+
+    def result(self) -> torch.Tensor:
+        """the aggregated probability of each fold, fold, class_num"""
+
+        if self.method == "max":
+            return self.state.clone()
+
+        return self.state / max(self.count, 1)
+
+
+def sliding_windows(
+    frames: Iterator[torch.Tensor], window: int, stride: int, transform, tail: bool = False
+) -> Iterator[torch.Tensor]:
+    """the sliding windows of the frame stream, same start frames as window_starts.
+
+    Args:
+        frames (Iterator[torch.Tensor]): the decoded frames, c, h, w
+        window (int): the window length.
+        stride (int): the frames between the window starts.
+        transform (Callable): the frame transform, applied once on arrival.
+        tail (bool, optional): add the last window ending at the last frame, same as train.clip_tail. Defaults to False.
+
+    Yields:
+        torch.Tensor: one window, c, t, h, w
+    """
+
+    buffer: deque = deque(maxlen=window)
+    frame_idx = -1
+    last_end = -1
+
+    for frame_idx, frame in enumerate(frames):
+
+        # * the frame in the gap between the windows (stride > window) is never used,
+        # * except for the tail window, the last frames are unknown until the stream ends.
+        if not tail and frame_idx % stride >= window:
+            continue
+
+        buffer.append(transform(frame))
+
+        start = frame_idx + 1 - window
+        if start >= 0 and start % stride == 0:
+            last_end = frame_idx
+            yield torch.stack(list(buffer), dim=1)
+
+    if tail and last_end >= 0 and last_end < frame_idx:
+        yield torch.stack(list(buffer), dim=1)
+
+
+class SlidingWindowPredictor(object):
+    """
+    Classify the long video with the sliding windows in the fixed memory.
+    """
+
+    def __init__(self, hparams) -> None:
+
+        if hparams.train.filter or hparams.train.temporal_mix:
+            raise ValueError(
+                "the sliding window is for the plain clip mode, set train.filter=False and train.temporal_mix=False."
+            )
+
+        self.device = torch.device(hparams.inference.device)
+        self.class_num = hparams.model.model_class_num
+        self.window = hparams.train.uniform_temporal_subsample_num
+        self.stride = hparams.inference.get("window_stride", None) or self.window
+        self.tail = hparams.train.get("clip_tail", False)
+        self.chunk = hparams.inference.get("window_chunk", 16)
+        self.aggregate = hparams.inference.get("window_aggregate", "mean")
+        self.root_path = hparams.data.root_path
+
+        if self.stride < 1:
+            raise ValueError(f"the window stride {self.stride} should be >= 1.")
+
+        self.ensemble = FoldEnsemble(load_fold_classifiers(hparams, self.device))
+        self.fold_num = hparams.train.fold
+
+        video_json = Path(hparams.inference.video_json)
+        if video_json.is_dir():
+            self.video_json_list = sorted(video_json.rglob("*.json"))
+        else:
+            self.video_json_list = [video_json]
+
+        # * each frame is resized on arrival, same result as the clip transform of the dataset.
+        self.transform = Compose(
+            [Div255(), Resize(size=[hparams.data.img_size, hparams.data.img_size])]
+        )
+
+    def windows(self, frames: Iterator[torch.Tensor]) -> Iterator[torch.Tensor]:
+        """the sliding windows of the frame stream.
+
+        Args:
+            frames (Iterator[torch.Tensor]): the decoded frames, c, h, w, uint8
+
+        Yields:
+            torch.Tensor: one window, c, t, h, w
+        """
+
+        yield from sliding_windows(frames, self.window, self.stride, self.transform, self.tail)
+
+    @torch.no_grad()
+    def predict_video(self, video_path: str) -> Dict[str, Any]:
+        """classify one video window by window.
+
+        Args:
+            video_path (str): the video path.
+
+        Returns:
+            Dict[str, Any]: the window number, the per-fold and averaged result.
+        """
+
+        aggregator = WindowAggregator(self.fold_num, self.class_num, self.aggregate)
+        chunk: List[torch.Tensor] = []
+        window_num = 0
+
+        def run_chunk() -> None:
+            video = torch.stack(chunk, dim=0).to(self.device, non_blocking=True)  # b, c, t, h, w
+            aggregator.update(self.ensemble(video))
+            chunk.clear()
+
+        frames = (frame["data"] for frame in VideoReader(video_path, "video"))
+
+        for window in self.windows(frames):
+            chunk.append(window)
+            window_num += 1
+
+            if len(chunk) == self.chunk:
+                run_chunk()
+
+        if chunk:
+            run_chunk()
+
+        fold_probs = aggregator.result()
+
+        return {"window_num": window_num, "fold_probs": fold_probs, "probs": fold_probs.mean(dim=0)}
+
+    def __call__(self) -> Iterator[Dict[str, Any]]:
+        """predict the videos one by one.
+
+        Yields:
+            Dict[str, Any]: the per-fold and averaged result of one video.
+        """
+
+        class_map = class_num_mapping_Dict[self.class_num]
+
+        for video_json in self.video_json_list:
+
+            with open(video_json, "r") as f:
+                file_info_dict = json.load(f)
+
+            video_path = file_info_dict["video_path"].replace("/workspace/data", self.root_path)
+            res = self.predict_video(video_path)
+
+            if res["window_num"] == 0:
+                logger.warning(f"{video_path} is shorter than one window, skip it.")
+                continue
+
+            yield {
+                "video_name": file_info_dict["video_name"],
+                "disease": file_info_dict.get("disease", None),
+                "window_num": res["window_num"],
+                "fold_probs": res["fold_probs"].tolist(),
+                "probs": res["probs"].tolist(),
+                "pred": class_map[int(res["probs"].argmax())],
+            }
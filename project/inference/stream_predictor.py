@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/project/inference/stream_predictor.py
+Project: /workspace/code/project/inference
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+Streaming predictor for the new patient video.
+The frames are decoded one by one, when one gait cycle (first phase + second phase) is finished,
+the cycle is scored by the filter model, fused/selected as the training data, and classified by the fold ensemble.
+Only the frames of the current gait cycle are kept in memory.
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 10:12:31 am
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import torch
+from torchvision.io import VideoReader
+from torchvision.transforms import Compose, Resize
+
+from project.dataloader.bbox_tube import build_tube
+from project.dataloader.filter import Filter
+from project.dataloader.phase_mix import PhaseMix
+from project.dataloader.utils import Div255, window_starts
+from project.cross_validation import class_num_mapping_Dict
+from project.inference.ensemble import FoldEnsemble, load_fold_classifiers
+
+from filter.filter_score.filter import Filter as FilterScore
+
+logger = logging.getLogger(__name__)
+
+
+def split_cycle_range(gait_cycle_index: list) -> List[Tuple[int, int, int]]:
+    """split the gait cycle index into the (start, mid, end) frame range of each complete gait cycle.
+    first phase is [start, mid), second phase is [mid, end), same as split_gait_cycle.
+    When only one phase is defined, the second phase is same as the first phase, so mid == end.
+    The trailing first phase of the even length index is also one cycle with mid == end.
+
+    Args:
+        gait_cycle_index (list): the gait cycle index from json file.
+
+    Returns:
+        List[Tuple[int, int, int]]: the frame range of each gait cycle.
+    """
+
+    if len(gait_cycle_index) == 2:
+        return [(gait_cycle_index[0], gait_cycle_index[1], gait_cycle_index[1])]
+
+    cycle_range = [
+        (gait_cycle_index[i], gait_cycle_index[i + 1], gait_cycle_index[i + 2])
+        for i in range(0, len(gait_cycle_index) - 2, 2)
+    ]
+
+    # * the even length index ends with a first phase, the training keeps it (paired with the last second phase).
+    # * here it is classified as one cycle with only the first phase, same as the len 2 case.
+    if len(gait_cycle_index) > 2 and len(gait_cycle_index) % 2 == 0:
+        cycle_range.append((gait_cycle_index[-2], gait_cycle_index[-1], gait_cycle_index[-1]))
+
+    return cycle_range
+
+
+class StreamPredictor(object):
+    """
+    Classify the new patient video cycle by cycle.
+    The filter scoring and phase split run as soon as one gait cycle is decoded,
+    and the per-cycle and aggregated patient-level probabilities are emitted after each cycle.
+    """
+
+    def __init__(self, hparams) -> None:
+
+        self.device = torch.device(hparams.inference.device)
+        self.class_num = hparams.model.model_class_num
+        self.uniform_temporal_subsample = hparams.train.uniform_temporal_subsample_num
+        self.clip_stride = hparams.train.get("clip_stride", None) or self.uniform_temporal_subsample
+        self.clip_tail = hparams.train.get("clip_tail", False)
+        self._img_size = hparams.data.img_size
+
+        self.filter = hparams.train.filter
+        self.temporal_mix = hparams.train.temporal_mix
+
+        # * the classifier of each fold
+        self.ensemble = FoldEnsemble(load_fold_classifiers(hparams, self.device))
+
+        # * the filter score model, the training data use the fold0 score, so keep same here.
+        if self.filter or self.temporal_mix:
+            hparams.train.current_fold = hparams.filter.fold
+            self._filter_score = FilterScore(hparams)
+        else:
+            self._filter_score = None
+
+        self._filter = Filter(hparams) if self.filter else False
+        self._temporal_mix = PhaseMix(hparams) if self.temporal_mix else False
+
+        self.transform = Compose(
+            [Div255(), Resize(size=[self._img_size, self._img_size])]
+        )
+
+    @staticmethod
+    def decode(video_path: str) -> Iterator[torch.Tensor]:
+        """decode the video frame by frame.
+
+        Args:
+            video_path (str): the video path.
+
+        Yields:
+            torch.Tensor: one frame, c, h, w, uint8
+        """
+
+        reader = VideoReader(video_path, "video")
+
+        for frame in reader:
+            yield frame["data"]
+
+    def score_phase(self, first_phase: torch.Tensor, second_phase: torch.Tensor) -> Dict[str, dict]:
+        """score the frames of one gait cycle, keep the same format with filter_info in json file.
+
+        Args:
+            first_phase (torch.Tensor): first phase frames, t, c, h, w
+            second_phase (torch.Tensor): second phase frames, t, c, h, w
+
+        Returns:
+            Dict[str, dict]: the filter info for one gait cycle.
+        """
+
+        filtered_res = self._filter_score(
+            {
+                "first_phase": [first_phase],
+                "second_phase": [second_phase],
+                "label": None,
+            }
+        )
+
+        first_scores, first_sorted_idx = filtered_res["first_phase"]
+        second_scores, second_sorted_idx = filtered_res["second_phase"]
+
+        return {
+            "first_phase": {
+                "fold0": {"filtered_scores": first_scores, "sorted_idx": first_sorted_idx}
+            },
+            "second_phase": {
+                "fold0": {"filtered_scores": second_scores, "sorted_idx": second_sorted_idx}
+            },
+        }
+
+    def make_clips(
+        self, frames: torch.Tensor, cycle_index: list, bbox: list, tube: Optional[torch.Tensor] = None
+    ) -> Optional[torch.Tensor]:
+        """make the classifier input from one gait cycle, same as the LabeledGaitVideoDataset.
+
+        Args:
+            frames (torch.Tensor): the frames of one gait cycle, t, c, h, w
+            cycle_index (list): the gait cycle index in this cycle, start from 0.
+            bbox (list): the bbox of this cycle.
+            tube (Optional[torch.Tensor], optional): the crop window of the segments of this cycle, for the PhaseMix. Defaults to None.
+
+        Returns:
+            Optional[torch.Tensor]: b, c, t, h, w. None when the plain cycle is shorter than one clip.
+        """
+
+        if self.filter or self.temporal_mix:
+            first_phase = frames[cycle_index[0] : cycle_index[1]]
+            second_phase = frames[cycle_index[-2] : cycle_index[-1]]
+            filter_info = self.score_phase(first_phase, second_phase)
+
+        if self.temporal_mix:
+            clips = self._temporal_mix(frames, cycle_index, bbox, None, filter_info, tube=tube)
+        elif self.filter:
+            clips = self._filter(frames, cycle_index, bbox, None, filter_info)
+        else:
+            # * same clips as the plain clip mode of the dataset, train.clip_stride and train.clip_tail.
+            t = self.uniform_temporal_subsample
+            clips = [
+                frames[i : i + t].permute(1, 0, 2, 3)
+                for i in window_starts(frames.shape[0], t, self.clip_stride, self.clip_tail)
+            ]
+
+            if not clips:
+                return None
+
+        return torch.stack([self.transform(clip) for clip in clips], dim=0)
+
+    @torch.no_grad()
+    def classify(self, video: torch.Tensor) -> torch.Tensor:
+        """classify the clips of one gait cycle with all the fold models.
+
+        Args:
+            video (torch.Tensor): b, c, t, h, w
+
+        Returns:
+            torch.Tensor: softmax result of each fold, fold, class_num
+        """
+
+        video = video.to(self.device)
+
+        return self.ensemble(video).mean(dim=1).cpu()
+
+    def __call__(
+        self, video_path: str, gait_cycle_index: list, bbox: list, none_index: list = ()
+    ) -> Iterator[Dict[str, Any]]:
+        """run the prediction, yield the result when one gait cycle is classified.
+
+        Args:
+            video_path (str): the video path.
+            gait_cycle_index (list): the gait cycle index from json file.
+            bbox (list): the bbox of each frame from json file.
+            none_index (list, optional): the frame index without the person from json file. Defaults to ().
+
+        Yields:
+            Dict[str, Any]: per-cycle and aggregated patient-level result.
+        """
+
+        cycle_range = split_cycle_range(gait_cycle_index)
+        class_map = class_num_mapping_Dict[self.class_num]
+
+        if not cycle_range:
+            logger.warning(f"no complete gait cycle in {video_path}")
+            return
+
+        # * the crop window of the whole video, same as the training tube (interpolated and smoothed along the video).
+        video_tube = (
+            build_tube(bbox, gait_cycle_index, none_index, self._temporal_mix.tube_smooth)
+            if self.temporal_mix
+            else None
+        )
+
+        cycle_num = 0
+        start, mid, end = cycle_range[cycle_num]
+        buffer: List[torch.Tensor] = []
+
+        patient_probs_sum = torch.zeros(self.class_num)
+        classified_num = 0
+        frame_idx = -1
+
+        for frame_idx, frame in enumerate(self.decode(video_path)):
+
+            if frame_idx < start:
+                continue
+
+            buffer.append(frame)
+
+            if frame_idx + 1 < end:
+                continue
+
+            # * one gait cycle is finished, classify it and release the frames.
+            frames = torch.stack(buffer, dim=0)  # t, c, h, w
+            buffer = []
+
+            if mid == end:
+                cycle_index = [0, mid - start]
+            else:
+                cycle_index = [0, mid - start, end - start]
+
+            # * the segments of the cycle i start from gait_cycle_index[2 * i].
+            tube = None
+            if video_tube is not None:
+                tube = video_tube[2 * cycle_num : 2 * cycle_num + len(cycle_index) - 1]
+
+            video = self.make_clips(frames, cycle_index, bbox[start:end], tube)
+
+            if video is None:
+                logger.warning(
+                    f"the gait cycle {cycle_num} {[start, end]} is shorter than {self.uniform_temporal_subsample} frames, skip it."
+                )
+            else:
+                fold_probs = self.classify(video)
+                cycle_probs = fold_probs.mean(dim=0)
+
+                patient_probs_sum += cycle_probs
+                classified_num += 1
+                patient_probs = patient_probs_sum / classified_num
+
+                yield {
+                    "cycle": cycle_num,
+                    "frame_range": [start, end],
+                    "fold_probs": fold_probs.tolist(),
+                    "cycle_probs": cycle_probs.tolist(),
+                    "cycle_pred": class_map[int(cycle_probs.argmax())],
+                    "patient_probs": patient_probs.tolist(),
+                    "patient_pred": class_map[int(patient_probs.argmax())],
+                }
+
+            cycle_num += 1
+            if cycle_num == len(cycle_range):
+                break
+
+            start, mid, end = cycle_range[cycle_num]
+
+        if cycle_num < len(cycle_range):
+            logger.warning(
+                f"the video {video_path} ends at frame {frame_idx}, {len(cycle_range) - cycle_num} gait cycle not finished."
+            )
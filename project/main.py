@@ -41,11 +41,8 @@ from project.dataloader.data_loader import WalkDataModule
 # select different experiment trainer
 #####################################
 
-# compare experiment
-from project.trainer.train_two_stream import TwoStreamModule
-from project.trainer.train_cnn_lstm import CNNLstmModule
-from project.trainer.train_2dcnn import CNNModule
-from project.trainer.train_3dcnn import Res3DCNNModule
+# * the trainer is imported lazily, only the selected backbone.
+from project.trainer import get_trainer
 
 from project.cross_validation import DefineCrossValidation
 
@@ -68,21 +65,8 @@ def train(hparams: DictConfig, dataset_idx, fold: int):
 
     hparams.train.current_fold = int(fold)
 
-    # * select experiment
-    if hparams.train.backbone == "3dcnn":
-        classification_module = Res3DCNNModule(hparams)
-    # * compare experiment
-    elif hparams.train.backbone == "two_stream":
-        classification_module = TwoStreamModule(hparams)
-    # * compare experiment
-    elif hparams.train.backbone == "cnn_lstm":
-        classification_module = CNNLstmModule(hparams)
-    # * compare experiment
-    elif hparams.train.backbone == "2dcnn":
-        classification_module = CNNModule(hparams)
-
-    else:
-        raise ValueError("the experiment backbone is not supported.")
+    # * select experiment, 3dcnn, and the compare experiment two_stream, cnn_lstm, 2dcnn
+    classification_module = get_trainer(hparams.train.backbone)(hparams)
 
     data_module = WalkDataModule(hparams, dataset_idx)
 
@@ -115,11 +99,16 @@ def train(hparams: DictConfig, dataset_idx, fold: int):
 
     lr_monitor = LearningRateMonitor(logging_interval="step")
 
+    # * bf16-mixed on cpu is the cpu autocast, 16-mixed/bf16-mixed on gpu is the cuda autocast.
+    if hparams.train.accelerator == "gpu":
+        devices = [int(hparams.train.gpu_num)]
+    else:
+        devices = 1
+
     trainer = Trainer(
-        devices=[
-            int(hparams.train.gpu_num),
-        ],
-        accelerator="gpu",
+        devices=devices,
+        accelerator=hparams.train.accelerator,
+        precision=hparams.train.precision,
         max_epochs=hparams.train.max_epochs,
         logger=tb_logger,
         check_val_every_n_epoch=1,
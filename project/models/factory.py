@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/project/models/factory.py
+Project: /workspace/code/project/models
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+The offline model factory, the pretrained backbone is built from the local weight only, never from the torch.hub.
+The weight is resolved from the content-addressed cache ({ckpt.cache_dir}/{sha256}.pth, the manifest.json maps
+the weight name (the ckpt key, res3dcnn, res2dcnn ...) to the sha256), or from the ckpt path in the config.
+The backbone is built on the meta device, and the mmap state dict is assigned into it, so the random init is not allocated.
+
+python -m project.models.factory add --name res3dcnn --path ckpt/model/SLOW_8x8_R50.pyth
+python -m project.models.factory verify
+
+Have a good code time :)
+-----
+Last Modified: Tuesday October 20th 2026 0:21:15 am
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _slow_r50() -> nn.Module:
+    from pytorchvideo.models.hub import slow_r50
+
+    return slow_r50(pretrained=False)
+
+
+def _resnet50() -> nn.Module:
+    from torchvision.models import resnet50
+
+    return resnet50(weights=None)
+
+
+def _resnet101() -> nn.Module:
+    from torchvision.models import resnet101
+
+    return resnet101(weights=None)
+
+
+# * the architecture without the weight, the pretrained weight is always from the local file.
+ARCH_REGISTRY: Dict[str, Callable[[], nn.Module]] = {
+    "slow_r50": _slow_r50,
+    "resnet50": _resnet50,
+    "resnet101": _resnet101,
+}
+
+
+def sha256sum(path: Path, chunk_size: int = 1 << 20) -> str:
+    """the sha256 of the file."""
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+class WeightCache(object):
+    """
+    The content-addressed weight cache, {cache_dir}/{sha256}.pth and {cache_dir}/manifest.json.
+    The hash of each file is verified once in the process.
+    """
+
+    _verified: Dict[str, str] = {}
+
+    def __init__(self, cache_dir: Path) -> None:
+
+        self.cache_dir = Path(cache_dir)
+        self.manifest_path = self.cache_dir / MANIFEST_NAME
+
+    def manifest(self) -> Dict[str, str]:
+        """the weight name to the sha256."""
+
+        if not self.manifest_path.exists():
+            return {}
+
+        with open(self.manifest_path, "r") as f:
+            return json.load(f)
+
+    def add(self, name: str, path: Path) -> Path:
+        """copy the weight file into the cache, and record the name in the manifest.
+
+        Args:
+            name (str): the weight name, the ckpt key in the config.
+            path (Path): the weight file.
+
+        Returns:
+            Path: the cached file path.
+        """
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        digest = sha256sum(path)
+        cached = self.cache_dir / f"{digest}.pth"
+
+        if not cached.exists():
+            tmp_path = cached.with_suffix(f".{os.getpid()}.tmp")
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, cached)
+
+        manifest = self.manifest()
+        manifest[name] = digest
+
+        tmp_path = self.manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+        logger.info(f"add the weight {name} ({digest}) into {self.cache_dir}")
+
+        return cached
+
+    def verify(self, path: Path, digest: str) -> Path:
+        """verify the sha256 of the file, raise when not matched."""
+
+        key = str(Path(path).resolve())
+
+        if self._verified.get(key) != digest:
+            actual = sha256sum(path)
+            if actual != digest:
+                raise ValueError(f"the sha256 of {path} is {actual}, expected {digest}.")
+            self._verified[key] = digest
+
+        return Path(path)
+
+    def resolve(self, name: str) -> Optional[Path]:
+        """the verified cached file of the weight name, None when not in the cache."""
+
+        digest = self.manifest().get(name)
+        if digest is None:
+            return None
+
+        cached = self.cache_dir / f"{digest}.pth"
+        if not cached.exists():
+            raise FileNotFoundError(f"the weight {name} is in the manifest, but {cached} is missing.")
+
+        return self.verify(cached, digest)
+
+
+def resolve_weight(name: str, ckpt) -> Path:
+    """find the local weight file, the cache first, then the ckpt path in the config.
+    The ckpt path is verified with the manifest sha256 when the name is in the manifest,
+    otherwise it is loaded unverified with a warning.
+
+    Args:
+        name (str): the weight name, the ckpt key (res3dcnn, res2dcnn ...).
+        ckpt (DictConfig): the hparams.ckpt, with the optional cache_dir.
+
+    Raises:
+        FileNotFoundError: no local weight, the network is never used.
+        ValueError: the sha256 of the weight is not same as the manifest.
+
+    Returns:
+        Path: the weight file path.
+    """
+
+    cache, digest = None, None
+
+    cache_dir = ckpt.get("cache_dir", None)
+    if cache_dir is not None:
+        cache = WeightCache(cache_dir)
+        digest = cache.manifest().get(name)
+
+        cached = cache.cache_dir / f"{digest}.pth"
+        if digest is not None and cached.exists():
+            return cache.verify(cached, digest)
+
+    path = ckpt.get(name, None)
+    if path is not None and os.path.exists(path):
+        # * the cached file is missing, the same weight in the ckpt path is still checked.
+        if digest is not None:
+            return cache.verify(path, digest)
+
+        logger.warning(
+            f"the weight {name} ({path}) is not in the cache manifest, loaded without the sha256 check. "
+            f"add it with python -m project.models.factory add --name {name} --path {path}"
+        )
+        return Path(path)
+
+    raise FileNotFoundError(
+        f"the weight {name} is not found in the cache {cache_dir} or the path {path}, "
+        f"add it with python -m project.models.factory add --name {name} --path <weight file>"
+    )
+
+
+def load_weight(path: Path) -> Dict[str, torch.Tensor]:
+    """load the state dict with mmap, the pytorchvideo .pyth is {model_state: state_dict}.
+    The old (non zip) format can not be mmaped, fallback to the normal load.
+    """
+
+    try:
+        state_dict = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    except RuntimeError:
+        state_dict = torch.load(path, map_location="cpu", weights_only=True)
+
+    if "model_state" in state_dict:
+        state_dict = state_dict["model_state"]
+
+    return state_dict
+
+
+def make_pretrained(arch: str, name: str, ckpt) -> nn.Module:
+    """build the pretrained backbone from the local weight.
+
+    Args:
+        arch (str): the architecture in the ARCH_REGISTRY.
+        name (str): the weight name, the ckpt key.
+        ckpt (DictConfig): the hparams.ckpt.
+
+    Returns:
+        nn.Module: the pretrained backbone on cpu.
+    """
+
+    path = resolve_weight(name, ckpt)
+    logger.info(f"load the {arch} weight from {path}")
+
+    # * the parameters on the meta device are not allocated, the weight is assigned from the mmap state dict.
+    with torch.device("meta"):
+        model = ARCH_REGISTRY[arch]()
+
+    model.load_state_dict(load_weight(path), assign=True)
+
+    meta = [k for k, v in model.state_dict().items() if v.is_meta]
+    if meta:
+        raise RuntimeError(f"the {arch} weight {path} has no value for {meta}")
+
+    return model
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="the local weight cache of the model factory.")
+    parser.add_argument("command", choices=["add", "verify"])
+    parser.add_argument("--cache_dir", type=str, default="ckpt/cache")
+    parser.add_argument("--name", type=str, help="the weight name, the ckpt key in the config.")
+    parser.add_argument("--path", type=str, help="the weight file to add.")
+    args = parser.parse_args()
+
+    cache = WeightCache(args.cache_dir)
+
+    if args.command == "add":
+        cache.add(args.name, Path(args.path))
+    else:
+        for name in cache.manifest():
+            logger.info(f"{name}: {cache.resolve(name)} ok")
@@ -23,14 +23,12 @@ Date      	By	Comments
 """
 
 from typing import Any, List
-import os
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
-from torchvision.models import resnet50
-from pytorchvideo.models.hub import slow_r50
+from project.models.factory import make_pretrained
 
 
 class MakeVideoModule(nn.Module):
@@ -46,21 +44,12 @@ class MakeVideoModule(nn.Module):
         self.model_name = hparams.model.model
         self.model_class_num = hparams.model.model_class_num
         self.model_path = hparams.ckpt.res3dcnn  # the resnet model path
+        self.ckpt = hparams.ckpt
 
     def make_resnet(self, input_channel: int = 3) -> nn.Module:
 
-        if os.path.exists(self.model_path):
-            print(f"load model from {self.model_path}")
-
-            model = slow_r50(pretrained=False, input_channel=input_channel)
-            state_dict = torch.load(self.model_path, map_location="cpu")['model_state']
-            model.load_state_dict(state_dict)
-
-        else:
-
-            model = torch.hub.load(
-                "facebookresearch/pytorchvideo", "slow_r50", pretrained=True
-            )
+        # * the local weight only (cache or ckpt.res3dcnn), pytorchvideo is only imported for the 3dcnn backbone.
+        model = make_pretrained("slow_r50", "res3dcnn", self.ckpt)
 
         # for the folw model and rgb model
         model.blocks[0].conv = nn.Conv3d(
@@ -97,30 +86,17 @@ class MakeImageModule(nn.Module):
         self.model_name = hparams.model.model
         self.model_class_num = hparams.model.model_class_num
         self.model_path = hparams.ckpt.res2dcnn  # the resnet model path
+        self.ckpt = hparams.ckpt
 
     def make_resnet(self, input_channel: int = 3) -> nn.Module:
 
-        if os.path.exists(self.model_path):
-            print(f"load model from {self.model_path}")
-
-            model = resnet50(pretrained=False)
+        # * the local weight only (cache or ckpt.res2dcnn), not the torch.hub.
+        model = make_pretrained("resnet50", "res2dcnn", self.ckpt)
 
-            state_dict = torch.load(self.model_path, map_location="cpu")
-            model.load_state_dict(state_dict)
-
-            model.conv1 = nn.Conv2d(
-                input_channel, 64, kernel_size=7, stride=2, padding=3, bias=False
-            )
-            model.fc = nn.Linear(2048, self.model_class_num)
-        else:
-
-            model = torch.hub.load(
-                "pytorch/vision:v0.10.0", "resnet50", pretrained=True
-            )
-            model.conv1 = nn.Conv2d(
-                input_channel, 64, kernel_size=7, stride=2, padding=3, bias=False
-            )
-            model.fc = nn.Linear(2048, self.model_class_num)
+        model.conv1 = nn.Conv2d(
+            input_channel, 64, kernel_size=7, stride=2, padding=3, bias=False
+        )
+        model.fc = nn.Linear(2048, self.model_class_num)
 
         return model
 
@@ -144,30 +120,17 @@ class MakeOriginalTwoStream(nn.Module):
 
         self.model_class_num = hparams.model.model_class_num
         self.model_path = hparams.ckpt.res2dcnn
+        self.ckpt = hparams.ckpt
 
     def make_resnet(self, input_channel: int = 3) -> nn.Module:
 
-        if os.path.exists(self.model_path):
-            print(f"load model from {self.model_path}")
+        # * the local weight only (cache or ckpt.res2dcnn), not the torch.hub.
+        model = make_pretrained("resnet50", "res2dcnn", self.ckpt)
 
-            model = resnet50(pretrained=False)
-
-            state_dict = torch.load(self.model_path, map_location="cpu")
-            model.load_state_dict(state_dict)
-
-            model.conv1 = nn.Conv2d(
-                input_channel, 64, kernel_size=7, stride=2, padding=3, bias=False
-            )
-            model.fc = nn.Linear(2048, self.model_class_num)
-        else:
-
-            model = torch.hub.load(
-                "pytorch/vision:v0.10.0", "resnet50", pretrained=True
-            )
-            model.conv1 = nn.Conv2d(
-                input_channel, 64, kernel_size=7, stride=2, padding=3, bias=False
-            )
-            model.fc = nn.Linear(2048, self.model_class_num)
+        model.conv1 = nn.Conv2d(
+            input_channel, 64, kernel_size=7, stride=2, padding=3, bias=False
+        )
+        model.fc = nn.Linear(2048, self.model_class_num)
 
         return model
 
@@ -183,6 +146,7 @@ class CNNLSTM(nn.Module):
 
         self.model_class_num = hparams.model.model_class_num
         self.model_path = hparams.ckpt.res2dcnn
+        self.ckpt = hparams.ckpt
 
         self.cnn = self.make_resnet()
         # LSTM
@@ -193,27 +157,13 @@ class CNNLSTM(nn.Module):
 
     def make_resnet(self, input_channel: int = 3) -> nn.Module:
 
-        if os.path.exists(self.model_path):
-            print(f"load model from {self.model_path}")
-
-            model = resnet50(pretrained=False)
-
-            state_dict = torch.load(self.model_path, map_location="cpu")
-            model.load_state_dict(state_dict)
-
-            model.conv1 = nn.Conv2d(
-                input_channel, 64, kernel_size=7, stride=2, padding=3, bias=False
-            )
-            model.fc = nn.Linear(2048, 300)
-        else:
+        # * the local weight only (cache or ckpt.res2dcnn), not the torch.hub.
+        model = make_pretrained("resnet50", "res2dcnn", self.ckpt)
 
-            model = torch.hub.load(
-                "pytorch/vision:v0.10.0", "resnet50", pretrained=True
-            )
-            model.conv1 = nn.Conv2d(
-                input_channel, 64, kernel_size=7, stride=2, padding=3, bias=False
-            )
-            model.fc = nn.Linear(2048, 300)
+        model.conv1 = nn.Conv2d(
+            input_channel, 64, kernel_size=7, stride=2, padding=3, bias=False
+        )
+        model.fc = nn.Linear(2048, 300)
 
         return model
 
@@ -234,3 +184,27 @@ class CNNLSTM(nn.Module):
             res.append(out)
 
         return torch.cat(res, dim=0)
+
+    def forward_features(self, x):
+        """the head from the frame features of the cnn trunk, the cnn.fc, lstm and fc.
+
+        Args:
+            x (torch.Tensor): b, 2048, t
+
+        Returns:
+            torch.Tensor: b*t, class_num
+        """
+
+        res = []
+
+        for i in range(x.size()[0]):
+            hidden = None
+            out = self.cnn.fc(x[i].permute(1, 0))
+            out, hidden = self.lstm(out, hidden)
+
+            out = F.relu(out)
+            out = self.fc(out)
+
+            res.append(out)
+
+        return torch.cat(res, dim=0)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+File: /workspace/code/project/patient_aggregate.py
+Project: /workspace/code/project
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+Patient-level aggregation of the clip-level prediction.
+One patient video is expanded into many clips (rows) by the collate_fn,
+here the rows of the same video are reduced into one patient prediction with scatter_reduce.
+The group id of each row is saved into {log_path}/patient_index/{fold}_group.pt in the test,
+so the clip-level and patient-level metrics can be computed from the saved best_preds without rerunning inference.
+
+python -m project.patient_aggregate --log_path logs/classifier/3dcnn_False_True/... --method mean
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 7:40:12 pm
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+"""
+
+import argparse
+import json
+import logging
+from pathlib import Path
+
+import torch
+import torch.nn.functional as F
+
+logger = logging.getLogger(__name__)
+
+
+def aggregate_patient(
+    pred: torch.Tensor, label: torch.Tensor, group: torch.Tensor, method: str = "mean"
+) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """reduce the clip-level prediction into the patient-level prediction.
+
+    Args:
+        pred (torch.Tensor): the softmax pred of each clip, n, class_num
+        label (torch.Tensor): the label of each clip, n
+        group (torch.Tensor): the video index of each clip, n
+        method (str, optional): mean, max or vote. Defaults to "mean".
+
+    Returns:
+        tuple[torch.Tensor, torch.Tensor, torch.Tensor]: the patient pred (p, class_num), patient label (p), video index (p).
+    """
+
+    pred = pred.float()
+    video_index, inverse = torch.unique(group, return_inverse=True)
+    patient_num, class_num = video_index.shape[0], pred.shape[1]
+
+    index = inverse.unsqueeze(1).expand(-1, class_num)
+
+    if method == "mean":
+        patient_pred = pred.new_zeros(patient_num, class_num).scatter_reduce(
+            0, index, pred, reduce="mean", include_self=False
+        )
+    elif method == "max":
+        patient_pred = pred.new_zeros(patient_num, class_num).scatter_reduce(
+            0, index, pred, reduce="amax", include_self=False
+        )
+    elif method == "vote":
+        # the vote ratio of each class, used as the patient probability.
+        votes = F.one_hot(pred.argmax(dim=1), class_num).float()
+        patient_pred = pred.new_zeros(patient_num, class_num).scatter_reduce(
+            0, index, votes, reduce="sum", include_self=False
+        )
+        patient_pred = patient_pred / patient_pred.sum(dim=1, keepdim=True)
+    else:
+        raise ValueError(f"the aggregate method {method} is not supported.")
+
+    # * the clips of one video have the same label.
+    patient_label = label.new_zeros(patient_num).scatter_reduce(
+        0, inverse, label, reduce="amax", include_self=False
+    )
+
+    return patient_pred, patient_label, video_index
+
+
+def save_group(all_group: list[torch.Tensor], video_name: dict, fold: str, save_path: str):
+    """save the video index of each row, and the video name of each index.
+
+    Args:
+        all_group (list[torch.Tensor]): the video index of each row, for each batch.
+        video_name (dict): video index to video name.
+        fold (str): fold number.
+        save_path (str): save path.
+    """
+
+    save_path = Path(save_path) / "patient_index"
+    save_path.mkdir(parents=True, exist_ok=True)
+
+    torch.save(torch.cat(all_group, dim=0), save_path / f"{fold}_group.pt")
+
+    with open(save_path / f"{fold}_video_name.json", "w") as f:
+        json.dump({int(k): v for k, v in video_name.items()}, f, indent=4)
+
+
+def patient_metrics(
+    pred: torch.Tensor,
+    label: torch.Tensor,
+    group: torch.Tensor,
+    num_class: int,
+    method: str = "mean",
+) -> dict[str, dict[str, torch.Tensor]]:
+    """compute the clip-level and patient-level metrics.
+
+    Args:
+        pred (torch.Tensor): the softmax pred of each clip, n, class_num
+        label (torch.Tensor): the label of each clip, n
+        group (torch.Tensor): the video index of each clip, n
+        num_class (int): number of class.
+        method (str, optional): mean, max or vote. Defaults to "mean".
+
+    Returns:
+        dict[str, dict[str, torch.Tensor]]: {clip: metrics, patient: metrics}
+    """
+
+    from project.helper import compute_metrics
+
+    patient_pred, patient_label, _ = aggregate_patient(pred, label, group, method)
+
+    return {
+        "clip": compute_metrics([pred], [label], num_class),
+        "patient": compute_metrics([patient_pred], [patient_label], num_class),
+    }
+
+
+def save_patient_metrics(
+    metrics: dict[str, dict[str, torch.Tensor]], fold: str, save_path: str, method: str
+):
+    """save the clip-level and patient-level metrics to .txt file.
+
+    Args:
+        metrics (dict[str, dict[str, torch.Tensor]]): from patient_metrics.
+        fold (str): the fold number.
+        save_path (str): the path to save the metrics.
+        method (str): the aggregate method.
+    """
+
+    save_path = Path(save_path) / "patient_metrics.txt"
+
+    with open(save_path, "a") as f:
+        f.writelines(f"Fold {fold}, aggregate: {method}\n")
+        for level, one_metrics in metrics.items():
+            for name, value in one_metrics.items():
+                f.writelines(f"{level}/{name}: {value}\n")
+                logger.info(f"fold {fold} {level}/{name}: {value}")
+        f.writelines("#" * 100)
+        f.writelines("\n")
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(
+        description="clip-level and patient-level metrics from the saved best_preds."
+    )
+    parser.add_argument("--log_path", type=str, required=True, help="the train.log_path")
+    parser.add_argument("--method", type=str, default="mean", choices=["mean", "max", "vote"])
+    parser.add_argument("--num_class", type=int, default=3)
+    args = parser.parse_args()
+
+    log_path = Path(args.log_path)
+
+    for group_file in sorted((log_path / "patient_index").glob("*_group.pt")):
+        fold = group_file.name.split("_")[0]
+
+        pred = torch.load(log_path / "best_preds" / f"{fold}_pred.pt", map_location="cpu")
+        label = torch.load(log_path / "best_preds" / f"{fold}_label.pt", map_location="cpu")
+        group = torch.load(group_file, map_location="cpu")
+
+        save_patient_metrics(
+            patient_metrics(pred, label, group, args.num_class, args.method),
+            fold,
+            log_path,
+            args.method,
+        )
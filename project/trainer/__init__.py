@@ -19,3 +19,35 @@ HISTORY:
 Date      	By	Comments
 ----------	---	---------------------------------------------------------
 '''
+
+import importlib
+
+# * the trainer of each backbone, "module:class". only the selected backbone's trainer
+# * (and its model, pytorchvideo/optical flow) is imported, by get_trainer.
+TRAINER_REGISTRY = {
+    "3dcnn": "project.trainer.train_3dcnn:Res3DCNNModule",
+    "2dcnn": "project.trainer.train_2dcnn:CNNModule",
+    "cnn_lstm": "project.trainer.train_cnn_lstm:CNNLstmModule",
+    "two_stream": "project.trainer.train_two_stream:TwoStreamModule",
+}
+
+
+def get_trainer(backbone: str):
+    """import the trainer class of the backbone lazily.
+
+    Args:
+        backbone (str): the train.backbone.
+
+    Raises:
+        ValueError: the backbone is not in the registry.
+
+    Returns:
+        type: the LightningModule class.
+    """
+
+    if backbone not in TRAINER_REGISTRY:
+        raise ValueError("the experiment backbone is not supported.")
+
+    module_name, class_name = TRAINER_REGISTRY[backbone].split(":")
+
+    return getattr(importlib.import_module(module_name), class_name)
@@ -27,16 +27,17 @@ from pytorch_lightning import LightningModule
 
 import logging
 
+from torchmetrics import MetricCollection
 from torchmetrics.classification import (
     MulticlassAccuracy,
     MulticlassPrecision,
     MulticlassRecall,
     MulticlassF1Score,
-    MulticlassConfusionMatrix,
 )
 
+from project.dataloader.features import load_feature_trunk
 from project.models.make_model import MakeImageModule
-from project.helper import save_helper
+from project.helper import save_helper, to_cpu_buffer
 
 logger = logging.getLogger(__name__)
 
@@ -54,16 +55,37 @@ class CNNModule(LightningModule):
         # model define
 
         model = MakeImageModule(hparams)
-        self.model = model.make_resnet(self.num_classes)
+        # * the rgb frame, the class num is the fc output, not the input channel.
+        self.model = model.make_resnet(3)
+
+        # * the frame wise resnet is conv2d, so use the channels_last memory format.
+        self.channels_last = hparams.train.get("channels_last", False)
+        if self.channels_last:
+            self.model = self.model.to(memory_format=torch.channels_last)
+
+        # * the head-only mode, the trunk is frozen and the input is the frame feature (b, 2048, t) of the feature cache.
+        # * the trunk is same as the feature extraction, so the saved ckpt also works on the pixels.
+        self.head_only = hparams.train.get("head_only", False)
+        if self.head_only:
+            load_feature_trunk(self.model, hparams)
+            for name, param in self.model.named_parameters():
+                param.requires_grad = name.startswith("fc.")
 
         # save the hyperparameters to the file and ckpt
         self.save_hyperparameters()
 
-        self._accuracy = MulticlassAccuracy(num_classes=self.num_classes)
-        self._precision = MulticlassPrecision(num_classes=self.num_classes)
-        self._recall = MulticlassRecall(num_classes=self.num_classes)
-        self._f1_score = MulticlassF1Score(num_classes=self.num_classes)
-        self._confusion_matrix = MulticlassConfusionMatrix(num_classes=self.num_classes)
+        # * the metric state is updated in each step, and computed once at the epoch end.
+        metrics = MetricCollection(
+            {
+                "video_acc": MulticlassAccuracy(num_classes=self.num_classes),
+                "video_precision": MulticlassPrecision(num_classes=self.num_classes),
+                "video_recall": MulticlassRecall(num_classes=self.num_classes),
+                "video_f1_score": MulticlassF1Score(num_classes=self.num_classes),
+            }
+        )
+        self.train_metrics = metrics.clone(prefix="train/")
+        self.val_metrics = metrics.clone(prefix="val/")
+        self.test_metrics = metrics.clone(prefix="test/")
 
     def forward(self, x):
         return self.model(x)
@@ -116,9 +138,10 @@ class CNNModule(LightningModule):
 
     def on_test_start(self) -> None:
         """hook function for test start"""
-        self.test_outputs: list[torch.Tensor] = []
         self.test_pred_list: list[torch.Tensor] = []
         self.test_label_list: list[torch.Tensor] = []
+        self.test_group_list: list[torch.Tensor] = []
+        self.test_video_name: dict[int, str] = {}
 
         logger.info("test start")
 
@@ -162,10 +185,20 @@ class CNNModule(LightningModule):
 
         pred_softmax, pred, label = outputs
 
-        self.test_outputs.append(outputs)
+        # * keep the pred and label on cpu, the device memory is not grown during the test.
+        pred_softmax, label = to_cpu_buffer(pred_softmax, label)
         self.test_pred_list.append(pred_softmax)
         self.test_label_list.append(label)
 
+        # the video index of each clip, expand to the pred rows (the frame wise model has t rows for one clip).
+        video_index = batch["video_index"].detach().cpu()
+        self.test_group_list.append(
+            video_index.repeat_interleave(pred_softmax.shape[0] // video_index.shape[0])
+        )
+        self.test_video_name.update(
+            {i["video_index"]: i["video_name"] for i in batch["info"]}
+        )
+
     def on_test_epoch_end(self) -> None:
         """hook function for test epoch end"""
 
@@ -176,10 +209,45 @@ class CNNModule(LightningModule):
             fold=self.logger.root_dir.split("/")[-1],
             save_path=self.logger.save_dir,
             num_class=self.num_classes,
+            all_group=self.test_group_list,
+            video_name=self.test_video_name,
+            aggregate=self.hparams.hparams.train.get("patient_aggregate", "mean"),
         )
 
         logger.info("test epoch end")
 
+    def predict_step(self, batch, batch_idx):
+        """
+        predict step for the new video, without label.
+
+        Args:
+            batch (3D tensor): b, c, t, h, w
+            batch_idx (_type_): _description_
+
+        Returns:
+            torch.Tensor: softmax result of each frame, (b*t, class_num)
+        """
+
+        video = self.predict_input(batch["video"].detach())  # b*t, c, h, w
+
+        with torch.no_grad():
+            preds = self(video)
+
+        return torch.softmax(preds, dim=-1)
+
+    @staticmethod
+    def predict_input(video: torch.Tensor) -> torch.Tensor:
+        """the input of forward for predict, same reshape as single_logic.
+
+        Args:
+            video (torch.Tensor): b, c, t, h, w
+
+        Returns:
+            torch.Tensor: b*t, c, h, w
+        """
+        b, c, t, h, w = video.shape
+        return video.reshape(b * t, c, h, w)
+
     def configure_optimizers(self):
         """
         configure the optimizer and lr scheduler
@@ -189,7 +257,10 @@ class CNNModule(LightningModule):
             lr_scheduler: the selected lr scheduler.
         """
 
-        optimzier = torch.optim.Adam(self.parameters(), lr=self.lr)
+        # * the frozen trunk is not in the optimizer.
+        optimzier = torch.optim.Adam(
+            [p for p in self.parameters() if p.requires_grad], lr=self.lr
+        )
 
         return {
             "optimizer": optimzier,
@@ -201,22 +272,31 @@ class CNNModule(LightningModule):
 
     def single_logic(self, label: torch.Tensor, video: torch.Tensor):
 
-        b, c, t, h, w = video.shape
+        if self.head_only:
+            b, d, t = video.shape
+            # * one row per frame in the time order, b*t, 2048.
+            re_video = video.permute(0, 2, 1).reshape(b * t, d)
+            forward = self.model.fc
+        else:
+            b, c, t, h, w = video.shape
+            re_video = video.reshape(b * t, c, h, w)
+            forward = self.model
 
-        re_video = video.reshape(b * t, c, h, w)
+        if self.channels_last and not self.head_only:
+            re_video = re_video.contiguous(memory_format=torch.channels_last)
 
         if self.training:
 
             inv = b
             if re_video.size()[0] > inv:
-                re_video = re_video[:inv, :, :, :]
+                re_video = re_video[:inv]
                 label = label[:inv]
 
-            preds = self.model(re_video)
+            preds = forward(re_video)
 
         else:
             with torch.no_grad():
-                preds = self.model(re_video)
+                preds = forward(re_video)
 
         loss = F.cross_entropy(preds.squeeze(dim=-1), label.long())
 
@@ -225,67 +305,36 @@ class CNNModule(LightningModule):
         return torch.softmax(preds, dim=-1), preds, loss
 
     def save_log(self, pred: torch.Tensor, label: torch.Tensor, loss):
+        """update the metric state of current stage, and log the loss.
+        The metrics are computed and logged once at the epoch end.
 
-        if self.training:
-
-            preds = pred
+        Args:
+            pred (torch.Tensor): the model output.
+            label (torch.Tensor): the label.
+            loss (torch.Tensor): the loss.
+        """
 
-            # when torch.size([1]), not squeeze.
-            if preds.size()[0] != 1 or len(preds.size()) != 1:
-                preds = preds.squeeze(dim=-1)
-                pred_softmax = torch.softmax(preds, dim=-1)
-            else:
-                pred_softmax = torch.softmax(preds)
-
-            # video rgb metrics
-            accuracy = self._accuracy(pred_softmax, label)
-            precision = self._precision(pred_softmax, label)
-            recall = self._recall(pred_softmax, label)
-            f1_score = self._f1_score(pred_softmax, label)
-            confusion_matrix = self._confusion_matrix(pred_softmax, label)
-
-            # log to tensorboard
-            self.log_dict(
-                {
-                    "train/loss": loss,
-                    "train/video_acc": accuracy,
-                    "train/video_precision": precision,
-                    "train/video_recall": recall,
-                    "train/video_f1_score": f1_score,
-                },
-                on_epoch=True,
-                on_step=True,
-                batch_size=label.size()[0],
-            )
+        # when torch.size([1]), not squeeze.
+        if pred.size()[0] != 1 or len(pred.size()) != 1:
+            pred = pred.squeeze(dim=-1)
 
+        if self.training:
+            stage, metrics = "train", self.train_metrics
+            pred_softmax = torch.softmax(pred, dim=-1)
         else:
+            if self.trainer.testing:
+                stage, metrics = "test", self.test_metrics
+            else:
+                stage, metrics = "val", self.val_metrics
+            pred_softmax = torch.sigmoid(pred)
 
-            preds = pred
+        metrics.update(pred_softmax, label.long())
 
-            # when torch.size([1]), not squeeze.
-            if preds.size()[0] != 1 or len(preds.size()) != 1:
-                preds = preds.squeeze(dim=-1)
-                pred_softmax = torch.sigmoid(preds)
-            else:
-                pred_softmax = torch.sigmoid(preds)
-
-            # video rgb metrics
-            accuracy = self._accuracy(pred_softmax, label)
-            precision = self._precision(pred_softmax, label)
-            recall = self._recall(pred_softmax, label)
-            f1_score = self._f1_score(pred_softmax, label)
-            confusion_matrix = self._confusion_matrix(pred_softmax, label)
-
-            # log to tensorboard
-            self.log_dict(
-                {
-                    "val/loss": loss,
-                    "val/video_acc": accuracy,
-                    "val/video_precision": precision,
-                    "val/video_recall": recall,
-                    "val/video_f1_score": f1_score,
-                },
-                on_epoch=True,
-                on_step=True,
-                batch_size=label.size()[0],
-            )
+        self.log(
+            f"{stage}/loss",
+            loss,
+            on_epoch=True,
+            on_step=True,
+            batch_size=label.size()[0],
+        )
+        self.log_dict(metrics, on_epoch=True, on_step=False)
@@ -35,17 +35,17 @@ import logging
 
 from pytorch_lightning import LightningModule
 
+from torchmetrics import MetricCollection
 from torchmetrics.classification import (
     MulticlassAccuracy,
     MulticlassPrecision,
     MulticlassRecall,
     MulticlassF1Score,
-    MulticlassConfusionMatrix,
 )
 
 from project.models.make_model import MakeVideoModule
 
-from project.helper import save_helper
+from project.helper import save_helper, to_cpu_buffer
 
 logger = logging.getLogger(__name__)
 
@@ -62,18 +62,38 @@ class Res3DCNNModule(LightningModule):
         # define model
         self.video_cnn = MakeVideoModule(hparams)()
 
+        # * slow_r50 is conv3d, so use the channels_last_3d memory format for the weight and input.
+        self.channels_last = hparams.train.get("channels_last", False)
+        if self.channels_last:
+            self.video_cnn = self.video_cnn.to(memory_format=torch.channels_last_3d)
+
         # save the hyperparameters to the file and ckpt
         self.save_hyperparameters()
 
-        self._accuracy = MulticlassAccuracy(num_classes=self.num_classes)
-        self._precision = MulticlassPrecision(num_classes=self.num_classes)
-        self._recall = MulticlassRecall(num_classes=self.num_classes)
-        self._f1_score = MulticlassF1Score(num_classes=self.num_classes)
-        self._confusion_matrix = MulticlassConfusionMatrix(num_classes=self.num_classes)
+        # * the metric state is updated in each step, and computed once at the epoch end.
+        metrics = MetricCollection(
+            {
+                "video_acc": MulticlassAccuracy(num_classes=self.num_classes),
+                "video_precision": MulticlassPrecision(num_classes=self.num_classes),
+                "video_recall": MulticlassRecall(num_classes=self.num_classes),
+                "video_f1_score": MulticlassF1Score(num_classes=self.num_classes),
+            }
+        )
+        self.train_metrics = metrics.clone(prefix="train/")
+        self.val_metrics = metrics.clone(prefix="val/")
+        self.test_metrics = metrics.clone(prefix="test/")
 
     def forward(self, x):
         return self.video_cnn(x)
 
+    def on_after_batch_transfer(self, batch: Any, dataloader_idx: int) -> Any:
+        """convert the video into channels_last_3d on device, used by all the steps."""
+
+        if self.channels_last:
+            batch["video"] = batch["video"].contiguous(memory_format=torch.channels_last_3d)
+
+        return batch
+
     def training_step(self, batch: torch.Tensor, batch_idx: int):
 
         # prepare the input and label
@@ -96,24 +116,9 @@ class Res3DCNNModule(LightningModule):
 
         self.log("train/loss", loss, on_epoch=True, on_step=True, batch_size=b)
 
-        # log metrics
-        video_acc = self._accuracy(video_preds_softmax, label)
-        video_precision = self._precision(video_preds_softmax, label)
-        video_recall = self._recall(video_preds_softmax, label)
-        video_f1_score = self._f1_score(video_preds_softmax, label)
-        video_confusion_matrix = self._confusion_matrix(video_preds_softmax, label)
-
-        self.log_dict(
-            {
-                "train/video_acc": video_acc,
-                "train/video_precision": video_precision,
-                "train/video_recall": video_recall,
-                "train/video_f1_score": video_f1_score,
-            },
-            on_epoch=True,
-            on_step=True,
-            batch_size=b,
-        )
+        # log metrics, only update the state here, computed at the epoch end.
+        self.train_metrics.update(video_preds_softmax, label.long())
+        self.log_dict(self.train_metrics, on_epoch=True, on_step=False)
 
         return loss
 
@@ -138,24 +143,9 @@ class Res3DCNNModule(LightningModule):
 
         self.log("val/loss", loss, on_epoch=True, on_step=True, batch_size=b)
 
-        # log metrics
-        video_acc = self._accuracy(video_preds_softmax, label)
-        video_precision = self._precision(video_preds_softmax, label)
-        video_recall = self._recall(video_preds_softmax, label)
-        video_f1_score = self._f1_score(video_preds_softmax, label)
-        video_confusion_matrix = self._confusion_matrix(video_preds_softmax, label)
-
-        self.log_dict(
-            {
-                "val/video_acc": video_acc,
-                "val/video_precision": video_precision,
-                "val/video_recall": video_recall,
-                "val/video_f1_score": video_f1_score,
-            },
-            on_epoch=True,
-            on_step=True,
-            batch_size=b,
-        )
+        # log metrics, only update the state here, computed at the epoch end.
+        self.val_metrics.update(video_preds_softmax, label.long())
+        self.log_dict(self.val_metrics, on_epoch=True, on_step=False)
 
     ##############
     # test step
@@ -165,9 +155,10 @@ class Res3DCNNModule(LightningModule):
 
     def on_test_start(self) -> None:
         """hook function for test start"""
-        self.test_outputs: list[torch.Tensor] = []
         self.test_pred_list: list[torch.Tensor] = []
         self.test_label_list: list[torch.Tensor] = []
+        self.test_group_list: list[torch.Tensor] = []
+        self.test_video_name: dict[int, str] = {}
 
         logger.info("test start")
 
@@ -196,24 +187,9 @@ class Res3DCNNModule(LightningModule):
 
         self.log("test/loss", loss, on_epoch=True, on_step=True, batch_size=b)
 
-        # log metrics
-        video_acc = self._accuracy(video_preds_softmax, label)
-        video_precision = self._precision(video_preds_softmax, label)
-        video_recall = self._recall(video_preds_softmax, label)
-        video_f1_score = self._f1_score(video_preds_softmax, label)
-        video_confusion_matrix = self._confusion_matrix(video_preds_softmax, label)
-
-        self.log_dict(
-            {
-                "test/video_acc": video_acc,
-                "test/video_precision": video_precision,
-                "test/video_recall": video_recall,
-                "test/video_f1_score": video_f1_score,
-            },
-            on_epoch=True,
-            on_step=True,
-            batch_size=b,
-        )
+        # log metrics, only update the state here, computed at the epoch end.
+        self.test_metrics.update(video_preds_softmax, label.long())
+        self.log_dict(self.test_metrics, on_epoch=True, on_step=False)
 
         return video_preds_softmax, video_preds
 
@@ -236,10 +212,20 @@ class Res3DCNNModule(LightningModule):
         pred_softmax, pred = outputs
         label = batch["label"].detach().float()
 
-        self.test_outputs.append(outputs)
+        # * keep the pred and label on cpu, the device memory is not grown during the test.
+        pred_softmax, label = to_cpu_buffer(pred_softmax, label)
         self.test_pred_list.append(pred_softmax)
         self.test_label_list.append(label)
 
+        # the video index of each clip, expand to the pred rows (the frame wise model has t rows for one clip).
+        video_index = batch["video_index"].detach().cpu()
+        self.test_group_list.append(
+            video_index.repeat_interleave(pred_softmax.shape[0] // video_index.shape[0])
+        )
+        self.test_video_name.update(
+            {i["video_index"]: i["video_name"] for i in batch["info"]}
+        )
+
     def on_test_epoch_end(self) -> None:
         """hook function for test epoch end"""
 
@@ -250,10 +236,43 @@ class Res3DCNNModule(LightningModule):
             fold=self.logger.root_dir.split("/")[-1],
             save_path=self.logger.save_dir,
             num_class=self.num_classes,
+            all_group=self.test_group_list,
+            video_name=self.test_video_name,
+            aggregate=self.hparams.hparams.train.get("patient_aggregate", "mean"),
         )
 
         logger.info("test epoch end")
 
+    def predict_step(self, batch: torch.Tensor, batch_idx: int):
+        """predict step for the new video, without label.
+
+        Args:
+            batch (torch.Tensor): {video: b, c, t, h, w}
+            batch_idx (int): the index of current batch.
+
+        Returns:
+            torch.Tensor: softmax result, b, class_num
+        """
+
+        video = self.predict_input(batch["video"].detach())  # b, c, t, h, w
+
+        with torch.no_grad():
+            video_preds = self(video)
+
+        return torch.softmax(video_preds, dim=1)
+
+    @staticmethod
+    def predict_input(video: torch.Tensor) -> torch.Tensor:
+        """the input of forward for predict, the video clip is used directly.
+
+        Args:
+            video (torch.Tensor): b, c, t, h, w
+
+        Returns:
+            torch.Tensor: b, c, t, h, w
+        """
+        return video
+
     def configure_optimizers(self):
         """
         configure the optimizer and lr scheduler
@@ -33,15 +33,15 @@ from project.models.optical_flow import Optical_flow
 
 from pytorch_lightning import LightningModule
 
+from torchmetrics import MetricCollection
 from torchmetrics.classification import (
     MulticlassAccuracy,
     MulticlassPrecision,
     MulticlassRecall,
     MulticlassF1Score,
-    MulticlassConfusionMatrix,
 )
 
-from project.helper import save_helper
+from project.helper import save_helper, to_cpu_buffer
 
 logger = logging.getLogger(__name__)
 
@@ -63,14 +63,27 @@ class TwoStreamModule(LightningModule):
         self.model_rgb = self.model.make_resnet(3)
         self.model_flow = self.model.make_resnet(2)
 
+        # * the rgb and flow resnet is conv2d, the input follows the channels_last weight in conv.
+        self.channels_last = hparams.train.get("channels_last", False)
+        if self.channels_last:
+            self.model_rgb = self.model_rgb.to(memory_format=torch.channels_last)
+            self.model_flow = self.model_flow.to(memory_format=torch.channels_last)
+
         # save the hyperparameters to the file and ckpt
         self.save_hyperparameters()
 
-        self._accuracy = MulticlassAccuracy(num_classes=self.num_classes)
-        self._precision = MulticlassPrecision(num_classes=self.num_classes)
-        self._recall = MulticlassRecall(num_classes=self.num_classes)
-        self._f1_score = MulticlassF1Score(num_classes=self.num_classes)
-        self._confusion_matrix = MulticlassConfusionMatrix(num_classes=self.num_classes)
+        # * the metric state is updated in each step, and computed once at the epoch end.
+        metrics = MetricCollection(
+            {
+                "video_acc": MulticlassAccuracy(num_classes=self.num_classes),
+                "video_precision": MulticlassPrecision(num_classes=self.num_classes),
+                "video_recall": MulticlassRecall(num_classes=self.num_classes),
+                "video_f1_score": MulticlassF1Score(num_classes=self.num_classes),
+            }
+        )
+        self.train_metrics = metrics.clone(prefix="train/")
+        self.val_metrics = metrics.clone(prefix="val/")
+        self.test_metrics = metrics.clone(prefix="test/")
 
     def forward(self, x):
         return self.model(x)
@@ -125,9 +138,10 @@ class TwoStreamModule(LightningModule):
 
     def on_test_start(self) -> None:
         """hook function for test start"""
-        self.test_outputs: list[torch.Tensor] = []
         self.test_pred_list: list[torch.Tensor] = []
         self.test_label_list: list[torch.Tensor] = []
+        self.test_group_list: list[torch.Tensor] = []
+        self.test_video_name: dict[int, str] = {}
 
         logger.info("test start")
 
@@ -172,10 +186,20 @@ class TwoStreamModule(LightningModule):
 
         pred_softmax, pred, label = outputs
 
-        self.test_outputs.append(outputs)
+        # * keep the pred and label on cpu, the device memory is not grown during the test.
+        pred_softmax, label = to_cpu_buffer(pred_softmax, label)
         self.test_pred_list.append(pred_softmax)
         self.test_label_list.append(label)
 
+        # the video index of each clip, expand to the pred rows (the frame wise model has t rows for one clip).
+        video_index = batch["video_index"].detach().cpu()
+        self.test_group_list.append(
+            video_index.repeat_interleave(pred_softmax.shape[0] // video_index.shape[0])
+        )
+        self.test_video_name.update(
+            {i["video_index"]: i["video_name"] for i in batch["info"]}
+        )
+
     def on_test_epoch_end(self) -> None:
         """hook function for test epoch end"""
 
@@ -186,10 +210,39 @@ class TwoStreamModule(LightningModule):
             fold=self.logger.root_dir.split("/")[-1],
             save_path=self.logger.save_dir,
             num_class=self.num_classes,
+            all_group=self.test_group_list,
+            video_name=self.test_video_name,
+            aggregate=self.hparams.hparams.train.get("patient_aggregate", "mean"),
         )
 
         logger.info("test epoch end")
 
+    def predict_step(self, batch, batch_idx):
+        """
+        predict step for the new video, without label.
+
+        Args:
+            batch (3D tensor): b, c, t, h, w
+            batch_idx (_type_): _description_
+
+        Returns:
+            torch.Tensor: softmax result of each frame pair, (b*(t-1), class_num)
+        """
+
+        video = batch["video"].detach()  # b, c, t, h, w
+        video_flow = self.optical_flow_model.process_batch(video)  # b, c, t, h, w
+
+        b, c, t, h, w = video.shape
+
+        single_img = video[:, :, :-1, :].reshape(-1, 3, h, w)
+        single_flow = video_flow.contiguous().view(-1, 2, h, w)
+
+        with torch.no_grad():
+            pred_video_rgb = self.model_rgb(single_img)
+            pred_video_flow = self.model_flow(single_flow)
+
+        return torch.softmax((pred_video_rgb + pred_video_flow) / 2, dim=-1)
+
     def configure_optimizers(self):
         """
         configure the optimizer and lr scheduler
@@ -251,67 +304,36 @@ class TwoStreamModule(LightningModule):
         return torch.softmax(pred_total, dim=-1), pred_total, loss
 
     def save_log(self, pred: torch.Tensor, label: torch.Tensor, loss):
+        """update the metric state of current stage, and log the loss.
+        The metrics are computed and logged once at the epoch end.
 
-        if self.training:
-
-            preds = pred
+        Args:
+            pred (torch.Tensor): the model output.
+            label (torch.Tensor): the label.
+            loss (torch.Tensor): the loss.
+        """
 
-            # when torch.size([1]), not squeeze.
-            if preds.size()[0] != 1 or len(preds.size()) != 1:
-                preds = preds.squeeze(dim=-1)
-                pred_softmax = torch.softmax(preds, dim=-1)
-            else:
-                pred_softmax = torch.softmax(preds)
-
-            # video rgb metrics
-            accuracy = self._accuracy(pred_softmax, label)
-            precision = self._precision(pred_softmax, label)
-            recall = self._recall(pred_softmax, label)
-            f1_score = self._f1_score(pred_softmax, label)
-            confusion_matrix = self._confusion_matrix(pred_softmax, label)
-
-            # log to tensorboard
-            self.log_dict(
-                {
-                    "train/loss": loss,
-                    "train/video_acc": accuracy,
-                    "train/video_precision": precision,
-                    "train/video_recall": recall,
-                    "train/video_f1_score": f1_score,
-                },
-                on_epoch=True,
-                on_step=True,
-                batch_size=label.size()[0],
-            )
+        # when torch.size([1]), not squeeze.
+        if pred.size()[0] != 1 or len(pred.size()) != 1:
+            pred = pred.squeeze(dim=-1)
 
+        if self.training:
+            stage, metrics = "train", self.train_metrics
+            pred_softmax = torch.softmax(pred, dim=-1)
         else:
+            if self.trainer.testing:
+                stage, metrics = "test", self.test_metrics
+            else:
+                stage, metrics = "val", self.val_metrics
+            pred_softmax = torch.sigmoid(pred)
 
-            preds = pred
+        metrics.update(pred_softmax, label.long())
 
-            # when torch.size([1]), not squeeze.
-            if preds.size()[0] != 1 or len(preds.size()) != 1:
-                preds = preds.squeeze(dim=-1)
-                pred_softmax = torch.sigmoid(preds)
-            else:
-                pred_softmax = torch.sigmoid(preds)
-
-            # video rgb metrics
-            accuracy = self._accuracy(pred_softmax, label)
-            precision = self._precision(pred_softmax, label)
-            recall = self._recall(pred_softmax, label)
-            f1_score = self._f1_score(pred_softmax, label)
-            confusion_matrix = self._confusion_matrix(pred_softmax, label)
-
-            # log to tensorboard
-            self.log_dict(
-                {
-                    "val/loss": loss,
-                    "val/video_acc": accuracy,
-                    "val/video_precision": precision,
-                    "val/video_recall": recall,
-                    "val/video_f1_score": f1_score,
-                },
-                on_epoch=True,
-                on_step=True,
-                batch_size=label.size()[0],
-            )
+        self.log(
+            f"{stage}/loss",
+            loss,
+            on_epoch=True,
+            on_step=True,
+            batch_size=label.size()[0],
+        )
+        self.log_dict(metrics, on_epoch=True, on_step=False)
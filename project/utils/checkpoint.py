@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''
+File: /workspace/code/project/utils/checkpoint.py
+Project: /workspace/code/project/utils
+Created Date: Monday October 19th 2026
+Author: Kaixu Chen
+-----
+Comment:
+Load the pytorch lightning ckpt as the pure torch state dict.
+The ckpt is loaded with mmap (the tensors are paged in when they are used), and cached in the process
+by (path, mtime, device), so the K fold ckpts are read from the disk only once.
+The prefix is stripped by the PrefixStateDict view, the tensors and the cached dict are not copied.
+
+Have a good code time :)
+-----
+Last Modified: Monday October 19th 2026 4:05:47 pm
+Modified By: the developer formerly known as Kaixu Chen at <chenkaixusan@gmail.com>
+-----
+Copyright (c) 2026 The University of Tsukuba
+-----
+HISTORY:
+Date      	By	Comments
+----------	---	---------------------------------------------------------
+'''
+
+import logging
+import os
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional, Tuple
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+# * (resolved path, mtime_ns, device) -> the state dict of the lightning ckpt.
+_STATE_DICT_CACHE: Dict[Tuple[str, int, str], Dict[str, torch.Tensor]] = {}
+
+
+def strip_state_dict_prefix(
+    state_dict: Dict[str, torch.Tensor], prefix: str
+) -> Dict[str, torch.Tensor]:
+    """strip the prefix of the lightning module attribute, e.g. model. or video_cnn.
+    The key without the prefix is kept as it is.
+
+    Args:
+        state_dict (Dict[str, torch.Tensor]): the state dict from lightning ckpt.
+        prefix (str): the prefix to strip.
+
+    Returns:
+        Dict[str, torch.Tensor]: the state dict for the torch model.
+    """
+
+    return {
+        (k[len(prefix) :] if k.startswith(prefix) else k): v
+        for k, v in state_dict.items()
+    }
+
+
+class PrefixStateDict(Mapping):
+    """
+    The read only view of the state dict with the prefix stripped, the key is mapped when it is accessed.
+    Same keys as the strip_state_dict_prefix, and it can be passed to the load_state_dict directly.
+    """
+
+    def __init__(self, state_dict: Dict[str, torch.Tensor], prefix: str) -> None:
+
+        self._state_dict = state_dict
+        self._prefix = prefix
+
+    def __getitem__(self, key: str) -> torch.Tensor:
+
+        if self._prefix + key in self._state_dict:
+            return self._state_dict[self._prefix + key]
+
+        # * the key without the prefix is kept as it is.
+        if not key.startswith(self._prefix) and key in self._state_dict:
+            return self._state_dict[key]
+
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+
+        for k in self._state_dict:
+            yield k[len(self._prefix) :] if k.startswith(self._prefix) else k
+
+    def __len__(self) -> int:
+
+        return len(self._state_dict)
+
+
+def _torch_load(ckpt_path: str, map_location) -> Dict:
+    """torch.load with mmap, fallback when the ckpt can not be mmaped (the old non zip format).
+    The lightning ckpt of this repo has the hyper_parameters (DictConfig), which is not loaded with weights_only,
+    so the ckpt is loaded without weights_only once, only load our own ckpt here.
+    """
+
+    try:
+        return torch.load(ckpt_path, map_location=map_location, mmap=True, weights_only=False)
+    except RuntimeError:
+        return torch.load(ckpt_path, map_location=map_location, weights_only=False)
+
+
+def load_checkpoint_state_dict(
+    ckpt_path: str, map_location="cpu", cache: bool = True
+) -> Dict[str, torch.Tensor]:
+    """load the state dict of the lightning ckpt, cached in the process.
+    The cached state dict is shared by the callers, do not modify it in place.
+
+    Args:
+        ckpt_path (str): the lightning ckpt path.
+        map_location (optional): the device to load. Defaults to "cpu".
+        cache (bool, optional): use the process cache. Defaults to True.
+
+    Returns:
+        Dict[str, torch.Tensor]: the state dict with the lightning prefix.
+    """
+
+    path = os.path.realpath(ckpt_path)
+    # * the mtime in the key, the ckpt rewritten by the next training is loaded again.
+    key = (path, os.stat(path).st_mtime_ns, str(map_location))
+
+    if cache and key in _STATE_DICT_CACHE:
+        return _STATE_DICT_CACHE[key]
+
+    state_dict = _torch_load(path, map_location)["state_dict"]
+
+    if cache:
+        # * the old mtime of the same path and device is not used anymore.
+        for old in [k for k in _STATE_DICT_CACHE if k[0] == key[0] and k[2] == key[2]]:
+            del _STATE_DICT_CACHE[old]
+        _STATE_DICT_CACHE[key] = state_dict
+
+    return state_dict
+
+
+def clear_checkpoint_cache() -> None:
+    """release the cached state dict of the process."""
+
+    _STATE_DICT_CACHE.clear()
+
+
+def load_lightning_state_dict(
+    ckpt_path: str, prefix: Optional[str] = None, map_location="cpu", cache: bool = True
+) -> Mapping:
+    """load the state dict from the lightning ckpt, and strip the prefix.
+
+    Args:
+        ckpt_path (str): the lightning ckpt path.
+        prefix (Optional[str], optional): the prefix to strip. Defaults to None.
+        map_location (optional): the device to load. Defaults to "cpu".
+        cache (bool, optional): use the process cache. Defaults to True.
+
+    Returns:
+        Mapping: the state dict for the torch model, the PrefixStateDict view when the prefix is given.
+    """
+
+    state_dict = load_checkpoint_state_dict(ckpt_path, map_location, cache)
+
+    if prefix is not None:
+        state_dict = PrefixStateDict(state_dict, prefix)
+
+    return state_dict
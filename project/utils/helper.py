@@ -22,8 +22,6 @@ Date      	By	Comments
 
 import logging
 from pathlib import Path
-import matplotlib.pyplot as plt
-import seaborn as sns
 import torch
 
 from torchmetrics.classification import (
@@ -35,10 +33,6 @@ from torchmetrics.classification import (
     MulticlassAUROC,
 )
 
-from pytorch_grad_cam import (
-    GradCAMPlusPlus
-)
-
 def save_inference(all_pred: list, all_label: list, fold: str, save_path: str):
     """save the inference results to .pt file.
 
@@ -136,6 +130,10 @@ def save_CM(all_pred: list, all_label: list, save_path: str, num_class: int, fol
 
     logging.info("_confusion_matrix: %s" % _confusion_matrix(all_pred, all_label))
 
+    # * the plotting libs are only imported when the confusion matrix is saved.
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     # set the font and title
     plt.rcParams.update({"font.size": 30, "font.family": "sans-serif"})
 
@@ -194,6 +192,9 @@ def save_CM(all_pred: list, all_label: list, save_path: str, num_class: int, fol
 #     target_layer = [model.blocks[-2].res_blocks[-1]]
 #     # target_layer = [model.model.blocks[-2]]
 
+#     from pytorch_grad_cam import GradCAMPlusPlus
+#     from captum.attr import visualization as viz
+
 #     cam = GradCAMPlusPlus(model, target_layer)
 
 #     # save the CAM
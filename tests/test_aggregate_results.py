@@ -0,0 +1,36 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+torchmetrics = pytest.importorskip("torchmetrics")
+
+from project.aggregate_results import bootstrap_ci, confusion_counts, metrics_from_counts
+from project.helper import compute_metrics
+
+
+def _pred_label():
+    # class 3 is only in the pred, class 4 is neither in the label nor in the pred.
+    label = torch.tensor([0, 0, 1, 1, 2, 2, 2, 0, 1, 2])
+    pred_class = torch.tensor([0, 1, 1, 3, 2, 0, 2, 0, 1, 3])
+    pred = torch.nn.functional.one_hot(pred_class, 5).float()
+    return pred, label
+
+
+def test_metrics_from_counts_equal_torchmetrics():
+    pred, label = _pred_label()
+
+    expected = compute_metrics([pred], [label], 5)
+    res = metrics_from_counts(confusion_counts(pred.argmax(dim=1), label, 5))
+
+    for name, value in res.items():
+        assert value.item() == pytest.approx(expected[name].item(), abs=1e-6)
+
+
+def test_bootstrap_ci_chunked_brackets_point():
+    pred, label = _pred_label()
+    pred, label = pred.repeat(50, 1), label.repeat(50)
+
+    point = compute_metrics([pred], [label], 5)
+    ci = bootstrap_ci(pred, label, 5, num_samples=200, max_elements=len(label) * 16)
+
+    for name, (low, high) in ci.items():
+        assert low <= point[name].item() <= high
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("hydra")
+
+from project.dataloader.bbox_tube import build_tube, interpolate_none
+
+
+def _widest_window_reference(bbox, start, end):
+    """the previous PhaseMix.process_phase step1."""
+
+    stored_x_max = float("-inf")
+    stored_xmax = 0
+    stored_xmin = 0
+
+    for k in range(end - start):
+        x, y, w, h = bbox[start + k]
+        xmin = int(x - w / 2)
+        xmax = int(x + w / 2)
+
+        if xmax - xmin > stored_x_max:
+            stored_x_max = xmax - xmin
+            stored_xmax = xmax
+            stored_xmin = xmin
+
+    return stored_xmin, stored_xmax
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_build_tube_same_as_process_phase(seed):
+    rng = random.Random(seed)
+    bbox = [
+        [rng.uniform(300, 1500), rng.uniform(300, 700), rng.uniform(100, 250), rng.uniform(300, 600)]
+        for _ in range(120)
+    ]
+    gait_cycle_index = sorted(rng.sample(range(120), 7))
+
+    tube = build_tube(bbox, gait_cycle_index)
+
+    assert tube.dtype == torch.int16
+    assert tube.shape == (len(gait_cycle_index) - 1, 4)
+
+    for j in range(len(gait_cycle_index) - 1):
+        xmin, xmax = _widest_window_reference(bbox, gait_cycle_index[j], gait_cycle_index[j + 1])
+        assert (int(tube[j, 0]), int(tube[j, 2])) == (xmin, xmax)
+
+
+def test_interpolate_none():
+    bbox = torch.tensor([[0.0] * 4, [10.0] * 4, [0.0] * 4, [0.0] * 4, [40.0] * 4, [0.0] * 4])
+
+    res = interpolate_none(bbox, [0, 2, 3, 5])
+
+    assert res[:, 0].tolist() == pytest.approx([10.0, 10.0, 20.0, 30.0, 40.0, 40.0])
+
+
+def test_load_tubes_drops_changed_json(tmp_path):
+    import os
+
+    from project.dataloader.bbox_tube import TUBE_NAME, json_mtime_ns, load_tubes
+
+    for name in ["0.json", "1.json"]:
+        (tmp_path / "ASD").mkdir(exist_ok=True)
+        (tmp_path / "ASD" / name).write_text("{}")
+
+    tubes = {"ASD/0.json": torch.zeros(1, 4), "ASD/1.json": torch.ones(1, 4)}
+    torch.save(
+        {"smooth": 1, "tubes": tubes, "mtime_ns": {k: json_mtime_ns(tmp_path, k) for k in tubes}},
+        tmp_path / TUBE_NAME,
+    )
+
+    assert load_tubes(tmp_path, 1).keys() == tubes.keys()
+
+    # the json is rewritten after the tube is built.
+    stat = os.stat(tmp_path / "ASD" / "1.json")
+    os.utime(tmp_path / "ASD" / "1.json", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert list(load_tubes(tmp_path, 1).keys()) == ["ASD/0.json"]
+    assert load_tubes(tmp_path, 5) == {}
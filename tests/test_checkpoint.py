@@ -0,0 +1,55 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+torchvision = pytest.importorskip("torchvision")
+
+from project.utils.checkpoint import load_lightning_state_dict
+
+
+def _resnet():
+    model = torchvision.models.resnet18(num_classes=3)
+    return model.eval()
+
+
+def test_load_lightning_state_dict_cached(tmp_path):
+    model = _resnet()
+    ckpt = tmp_path / "1_best_model.ckpt"
+    torch.save(
+        {"state_dict": {f"model.{k}": v for k, v in model.state_dict().items()}}, ckpt
+    )
+
+    first = load_lightning_state_dict(ckpt, "model.")
+    second = load_lightning_state_dict(ckpt, "model.")
+
+    # the same cached tensor, not copied by the prefix view.
+    key = "conv1.weight"
+    assert second[key].data_ptr() == first[key].data_ptr()
+    assert torch.equal(second[key], model.state_dict()[key])
+
+
+def test_load_lightning_ckpt_with_hyper_parameters_once(tmp_path, monkeypatch):
+    OmegaConf = pytest.importorskip("omegaconf").OmegaConf
+    model = _resnet()
+    ckpt = tmp_path / "2_best_model.ckpt"
+    torch.save(
+        {
+            "state_dict": {f"model.{k}": v for k, v in model.state_dict().items()},
+            "hyper_parameters": OmegaConf.create({"train": {"fold": 3}}),
+        },
+        ckpt,
+    )
+
+    calls = []
+    torch_load = torch.load
+
+    def _counted_load(*args, **kwargs):
+        calls.append(kwargs)
+        return torch_load(*args, **kwargs)
+
+    monkeypatch.setattr(torch, "load", _counted_load)
+
+    state_dict = load_lightning_state_dict(ckpt, "model.")
+
+    # the DictConfig ckpt is unpickled once, no failed weights_only load before it.
+    assert len(calls) == 1
+    assert torch.equal(state_dict["conv1.weight"], model.state_dict()["conv1.weight"])
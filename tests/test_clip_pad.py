@@ -0,0 +1,36 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+
+from project.utils.utils import clip_pad_with_bbox, clip_pad_with_bbox_batched
+
+
+# the box height is 20, the square region is 20 x 20, so the crop is not resized and is compared element by element.
+BOXES = [
+    (20, 5, 30, 25),  # inside the frame, padded left and right.
+    (2, 10, 12, 30),  # padded region partly outside the left.
+    (40, 30, 50, 50),  # partly outside the bottom.
+    (70, 10, 80, 30),  # wholly outside the right.
+    (8, 0, 32, 20),  # wider than tall, the negative gap.
+]
+
+
+@pytest.mark.parametrize("dtype", [torch.float32, torch.uint8])
+def test_batched_equal_clip_pad_with_bbox(dtype):
+    # the non-square frame, h 40, w 60
+    frames = torch.randint(1, 255, (len(BOXES), 3, 40, 60)).to(dtype)
+    boxes = torch.tensor(BOXES)
+
+    batched = clip_pad_with_bbox_batched(frames, boxes, img_size=20)
+
+    for t, box in enumerate(BOXES):
+        expected = clip_pad_with_bbox(frames[t], [box], img_size=20)[0]
+
+        assert batched[t].shape == expected.shape
+        assert torch.allclose(batched[t].float(), expected.float(), atol=1e-3)
+
+    # the outside of the frame is filled with 0.
+    assert batched[3].eq(0).all()
+    assert batched[1][..., :3].eq(0).all()
+    assert batched[2][:, 10:].eq(0).all()
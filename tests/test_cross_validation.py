@@ -0,0 +1,77 @@
+import copy
+import random
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("sklearn")
+pytest.importorskip("imblearn")
+
+from project.cross_validation import DefineCrossValidation
+
+
+def _magic_move_reference(train_mapped_path, val_mapped_path):
+    """the previous list.index/pop implementation."""
+
+    new_train_mapped_path = copy.deepcopy(train_mapped_path)
+    new_val_mapped_path = copy.deepcopy(val_mapped_path)
+
+    train_tmp_dict = {}
+    for i in train_mapped_path:
+        if "ASD" in i.name:
+            continue
+        train_tmp_dict[i.name.split("-")[0]] = i
+
+    val_tmp_dict = {}
+    for i in val_mapped_path:
+        if "ASD" in i.name:
+            continue
+        val_tmp_dict[i.name.split("-")[0]] = i
+
+    for k, v in train_tmp_dict.items():
+        new_val_mapped_path.append(v)
+        new_train_mapped_path.pop(new_train_mapped_path.index(v))
+
+    for k, v in val_tmp_dict.items():
+        new_train_mapped_path.append(v)
+        new_val_mapped_path.pop(new_val_mapped_path.index(v))
+
+    return new_train_mapped_path, new_val_mapped_path
+
+
+def _synthetic_split(seed: int):
+    rng = random.Random(seed)
+
+    def one_split(patient_num: int, prefix: str):
+        paths = []
+        for p in range(patient_num):
+            disease = rng.choice(["ASD", "DHS", "LCS", "HipOA"])
+            for cycle in range(rng.randint(1, 4)):
+                path = Path(f"/data/{disease}/{prefix}{disease}{p}-{cycle}.json")
+                # oversampled duplicates
+                paths.extend([path] * rng.randint(1, 3))
+        rng.shuffle(paths)
+        return paths
+
+    return one_split(20, "train"), one_split(8, "val")
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_magic_move_equivalence(seed):
+    train, val = _synthetic_split(seed)
+
+    expected = _magic_move_reference(train, val)
+    result = DefineCrossValidation.magic_move(list(train), list(val))
+
+    assert result[0] == expected[0]
+    assert result[1] == expected[1]
+
+
+def test_magic_move_not_modify_input():
+    train, val = _synthetic_split(0)
+    train_copy, val_copy = list(train), list(val)
+
+    DefineCrossValidation.magic_move(train, val)
+
+    assert train == train_copy
+    assert val == val_copy
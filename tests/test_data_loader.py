@@ -0,0 +1,39 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+pytest.importorskip("pytorch_lightning")
+pytest.importorskip("hydra")
+
+from torch.utils.data import DataLoader, Dataset
+
+from project.dataloader.data_loader import WalkDataModule
+
+
+class _ClipDataset(Dataset):
+    # the sample i has i % 3 + 1 clips, filled with i.
+    def __len__(self):
+        return 6
+
+    def __getitem__(self, index):
+        return torch.full((index % 3 + 1, 3, 2, 4, 4), float(index))
+
+
+def _collate(batch):
+    return WalkDataModule.cat_video(batch)
+
+
+def test_cat_video_shared_in_worker():
+    loader = DataLoader(_ClipDataset(), batch_size=3, num_workers=2, collate_fn=_collate)
+
+    for i, video in enumerate(loader):
+        expected = torch.cat([_ClipDataset()[j] for j in range(i * 3, i * 3 + 3)], dim=0)
+
+        assert video.is_shared()
+        assert torch.equal(video, expected)
+
+
+def test_cat_video_main_process():
+    batch = [_ClipDataset()[i] for i in range(3)]
+
+    assert torch.equal(WalkDataModule.cat_video(batch), torch.cat(batch, dim=0))
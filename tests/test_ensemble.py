@@ -0,0 +1,43 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+pytest.importorskip("pytorch_lightning")
+pytest.importorskip("hydra")
+
+from project.inference.ensemble import FoldEnsemble
+
+
+class _Head(torch.nn.Module):
+    def __init__(self, item: bool = False):
+        super().__init__()
+        self.fc = torch.nn.Linear(6, 3)
+        self.item = item
+
+    @staticmethod
+    def predict_input(video):
+        return video.flatten(1)
+
+    def forward(self, x):
+        # .item() has no vmap support, the ensemble falls back to the loop.
+        if self.item:
+            x = x * x.sum().item()
+        return self.fc(x)
+
+    def predict_step(self, batch, batch_idx):
+        return torch.softmax(self(self.predict_input(batch["video"])), dim=1)
+
+
+@pytest.mark.parametrize("item", [False, True])
+def test_fold_ensemble_same_as_each_fold(item):
+    video = torch.randn(4, 1, 2, 1, 3)
+    models = [_Head(item).eval() for _ in range(3)]
+    expected = torch.stack([m.predict_step({"video": video}, 0) for m in models], dim=0)
+
+    ensemble = FoldEnsemble(models)
+
+    # the stacked weights are the only device copy.
+    assert all(p.is_meta for m in models for p in m.parameters())
+
+    assert torch.allclose(ensemble(video), expected, atol=1e-6)
+    assert ensemble.stacked is not item
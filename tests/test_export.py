@@ -0,0 +1,90 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+torchvision = pytest.importorskip("torchvision")
+pytest.importorskip("hydra")
+
+from project.inference.export import check_parity, export_onnx, export_torchscript
+from project.utils.checkpoint import load_lightning_state_dict
+
+
+def _resnet():
+    model = torchvision.models.resnet18(num_classes=3)
+    return model.eval()
+
+
+def test_load_lightning_state_dict(tmp_path):
+    model = _resnet()
+    ckpt = tmp_path / "0_best_model.ckpt"
+    torch.save(
+        {"state_dict": {f"model.{k}": v for k, v in model.state_dict().items()}}, ckpt
+    )
+
+    state_dict = load_lightning_state_dict(ckpt, "model.")
+
+    assert state_dict.keys() == model.state_dict().keys()
+    _resnet().load_state_dict(state_dict)
+
+
+def test_torchscript_parity(tmp_path):
+    model = _resnet()
+    example = torch.randn(4, 3, 64, 64)
+
+    exported = export_torchscript(model, example, tmp_path / "filter.pt")
+
+    # the frames dim is different from the trace input.
+    max_diff = check_parity(model, exported, [example, torch.randn(7, 3, 64, 64)])
+    assert max_diff < 1e-4
+
+
+def test_onnx_parity(tmp_path):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+
+    model = _resnet()
+    example = torch.randn(4, 3, 64, 64)
+
+    exported = export_onnx(model, example, tmp_path / "filter.onnx", {0: "frames"})
+
+    max_diff = check_parity(model, exported, [example, torch.randn(7, 3, 64, 64)])
+    assert max_diff < 1e-4
+
+
+
+def test_export_one_project_2dcnn(tmp_path, monkeypatch):
+    OmegaConf = pytest.importorskip("omegaconf").OmegaConf
+    from torchvision.models.resnet import Bottleneck, ResNet
+
+    from project.inference.export import example_input, export_one, make_export_model
+    from project.models import factory
+
+    # the small resnet with the 2048-d pooled feature, instead of the resnet50.
+    def _small():
+        return ResNet(Bottleneck, [1, 1, 1, 1])
+
+    monkeypatch.setitem(factory.ARCH_REGISTRY, "resnet50", _small)
+    weight = tmp_path / "res2dcnn.pth"
+    torch.save(_small().state_dict(), weight)
+
+    # the class num is not 3, the input is still the rgb frame.
+    hparams = OmegaConf.create(
+        {
+            "model": {"model": "resnet", "model_class_num": 2},
+            "ckpt": {"res2dcnn": str(weight)},
+            "data": {"img_size": 32},
+            "train": {"uniform_temporal_subsample_num": 2},
+            "export": {"format": ["torchscript"], "opset": 17, "atol": 1e-4, "dynamic_t": False},
+        }
+    )
+
+    model = make_export_model(hparams, "2dcnn")
+    ckpt = tmp_path / "0_best_model.ckpt"
+    torch.save({"state_dict": {f"model.{k}": v for k, v in model.state_dict().items()}}, ckpt)
+
+    example, _ = example_input(hparams, "2dcnn")
+    assert example.shape == (2, 3, 32, 32)
+
+    parity = export_one(hparams, "2dcnn", ckpt, tmp_path / "2dcnn_0")
+
+    assert parity["torchscript"] < 1e-4
+    assert (tmp_path / "2dcnn_0.pt").exists()
@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+torch = pytest.importorskip("torch")
+np = pytest.importorskip("numpy")
+pytest.importorskip("torchvision")
+OmegaConf = pytest.importorskip("omegaconf").OmegaConf
+
+from project.dataloader import features
+
+
+def _write_store(tmp_path, frame_nums, dim=4):
+    arrays = [np.random.rand(n, dim).astype(np.float16) for n in frame_nums]
+
+    with open(tmp_path / features.FEATURE_NAME, "wb") as f:
+        for a in arrays:
+            f.write(a.tobytes())
+
+    offsets = np.cumsum([0] + list(frame_nums))
+    index = {
+        "meta": {"dim": dim, "img_size": 224, "ckpt_path": None},
+        "videos": {f"ASD/{i}.json": [int(offsets[i]), n] for i, n in enumerate(frame_nums)},
+    }
+    with open(tmp_path / features.INDEX_NAME, "w") as f:
+        json.dump(index, f)
+
+    return arrays
+
+
+def test_feature_store_read(tmp_path):
+    arrays = _write_store(tmp_path, [5, 3])
+    store = features.FeatureStore(tmp_path)
+
+    assert torch.equal(store.read("ASD/1.json"), torch.from_numpy(arrays[1]))
+    assert torch.equal(store.read("ASD/0.json", slice(1, 3)), torch.from_numpy(arrays[0][1:3]))
+
+
+def test_feature_dataset_clips(tmp_path):
+    arrays = _write_store(tmp_path, [10])
+    json_path = tmp_path / "ASD" / "0.json"
+    json_path.parent.mkdir()
+    json_path.write_text(
+        json.dumps(
+            {
+                "label": 0,
+                "disease": "ASD",
+                "video_name": "0",
+                "gait_cycle_index": [],
+                "none_index": [],
+            }
+        )
+    )
+    hparams = OmegaConf.create(
+        {"data": {"gait_seg_data_path": str(tmp_path)}, "train": {"uniform_temporal_subsample_num": 4}}
+    )
+
+    dataset = features.FeatureGaitVideoDataset([json_path], features.FeatureStore(tmp_path), hparams)
+    video = dataset[0]["video"]
+
+    # 10 frames, 2 clips of 4 frames, the last 2 frames are discarded. b, dim, t
+    assert video.shape == (2, 4, 4)
+    assert torch.equal(video[1, :, 0], torch.from_numpy(arrays[0][4]).float())
+
+    # same clips as the pixels with the overlap and the tail clip.
+    hparams.train.clip_stride = 3
+    hparams.train.clip_tail = True
+    video = features.FeatureGaitVideoDataset([json_path], features.FeatureStore(tmp_path), hparams)[0]["video"]
+
+    assert video.shape == (3, 4, 4)
+    assert torch.equal(video[1, :, 0], torch.from_numpy(arrays[0][3]).float())
+    assert torch.equal(video[2, :, -1], torch.from_numpy(arrays[0][9]).float())
+
+
+def test_head_only_module_matches_features(tmp_path, monkeypatch):
+    pytest.importorskip("pytorch_lightning")
+    from torchvision.models.resnet import Bottleneck, ResNet
+
+    from project.models import factory
+    from project.trainer.train_2dcnn import CNNModule
+
+    # the small resnet with the 2048-d pooled feature, instead of the resnet50.
+    def _small():
+        return ResNet(Bottleneck, [1, 1, 1, 1])
+
+    monkeypatch.setitem(factory.ARCH_REGISTRY, "resnet50", _small)
+    weight = tmp_path / "res2dcnn.pth"
+    torch.save(_small().state_dict(), weight)
+
+    hparams = OmegaConf.create(
+        {
+            "optimizer": {"lr": 0.001},
+            "model": {"model": "resnet", "model_class_num": 3},
+            "ckpt": {"res2dcnn": str(weight)},
+            "train": {"head_only": True, "channels_last": False},
+            "feature": {"save_path": str(tmp_path), "ckpt_path": None, "prefix": "model."},
+        }
+    )
+    with open(tmp_path / features.INDEX_NAME, "w") as f:
+        json.dump({"meta": {"dim": 2048, "img_size": 32, "ckpt_path": None, "prefix": "model."}, "videos": {}}, f)
+
+    trunk = features.make_trunk(hparams)
+    module = CNNModule(hparams).eval()
+
+    frames = torch.rand(4, 3, 32, 32)
+    with torch.no_grad():
+        from_features = module.model.fc(trunk(frames))
+        from_pixels = module(frames)
+
+    assert torch.allclose(from_pixels, from_features, atol=1e-5)
@@ -0,0 +1,20 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchmetrics")
+
+from project.helper import METRIC_NAMES, compute_metrics, save_metrics
+
+
+def test_save_metrics_fixed_order(tmp_path):
+    label = torch.tensor([0, 1, 2, 2, 1, 0])
+    pred = torch.nn.functional.one_hot(torch.tensor([0, 1, 2, 1, 1, 0]), 3).float()
+
+    metrics = compute_metrics([pred[:4], pred[4:]], [label[:4], label[4:]], 3)
+    assert tuple(metrics) == METRIC_NAMES
+
+    save_metrics(metrics, "0", tmp_path)
+
+    lines = (tmp_path / "metrics.txt").read_text().splitlines()
+    names = [line.split(":")[0] for line in lines if ":" in line]
+    assert names[: len(METRIC_NAMES)] == list(METRIC_NAMES)
@@ -0,0 +1,70 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+OmegaConf = pytest.importorskip("omegaconf").OmegaConf
+
+from project.models import factory
+
+
+def _small():
+    return torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3), torch.nn.BatchNorm2d(4))
+
+
+@pytest.fixture
+def small_arch(monkeypatch):
+    monkeypatch.setitem(factory.ARCH_REGISTRY, "small", _small)
+    monkeypatch.setattr(factory.WeightCache, "_verified", {})
+
+
+def test_make_pretrained_from_cache(tmp_path, small_arch):
+    model = _small()
+    weight = tmp_path / "small.pth"
+    torch.save(model.state_dict(), weight)
+
+    cache_dir = tmp_path / "cache"
+    factory.WeightCache(cache_dir).add("small_ckpt", weight)
+    ckpt = OmegaConf.create({"cache_dir": str(cache_dir), "small_ckpt": None})
+
+    loaded = factory.make_pretrained("small", "small_ckpt", ckpt)
+
+    for k, v in model.state_dict().items():
+        assert not loaded.state_dict()[k].is_meta
+        assert torch.equal(loaded.state_dict()[k], v)
+
+
+def test_tampered_cache_raises(tmp_path, small_arch):
+    weight = tmp_path / "small.pth"
+    torch.save(_small().state_dict(), weight)
+
+    cached = factory.WeightCache(tmp_path / "cache").add("small_ckpt", weight)
+    torch.save(_small().state_dict(), cached)
+    ckpt = OmegaConf.create({"cache_dir": str(tmp_path / "cache")})
+
+    with pytest.raises(ValueError):
+        factory.make_pretrained("small", "small_ckpt", ckpt)
+
+
+def test_missing_weight_not_download(tmp_path):
+    ckpt = OmegaConf.create({"cache_dir": str(tmp_path / "cache"), "res2dcnn": str(tmp_path / "none.pth")})
+
+    with pytest.raises(FileNotFoundError):
+        factory.resolve_weight("res2dcnn", ckpt)
+
+
+def test_ckpt_path_verified_with_manifest(tmp_path, small_arch):
+    weight = tmp_path / "small.pth"
+    torch.save(_small().state_dict(), weight)
+
+    cache = factory.WeightCache(tmp_path / "cache")
+    cached = cache.add("small_ckpt", weight)
+    ckpt = OmegaConf.create({"cache_dir": str(tmp_path / "cache"), "small_ckpt": str(weight)})
+
+    # the cached file is removed, the ckpt path is used after the sha256 check.
+    cached.unlink()
+    assert factory.resolve_weight("small_ckpt", ckpt) == weight
+
+    # the ckpt path is replaced by the other weight.
+    torch.save(_small().state_dict(), weight)
+    factory.WeightCache._verified.clear()
+    with pytest.raises(ValueError):
+        factory.resolve_weight("small_ckpt", ckpt)
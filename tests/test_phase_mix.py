@@ -0,0 +1,54 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("hydra")
+OmegaConf = pytest.importorskip("omegaconf").OmegaConf
+
+from project.dataloader.phase_mix import PhaseMix
+
+
+def _reference_fuse_frames(T, first_phase, second_phase, first_sorted, second_sorted):
+    """the fuse_frames before the rewrite, pad by cat, select one by one, stack and cat."""
+
+    res = []
+    for pack in range(len(first_phase)):
+        out = []
+        for phase, sorted_idx in [(first_phase, first_sorted), (second_phase, second_sorted)]:
+            frames = phase[pack]
+            idx = sorted(sorted_idx[pack][:T])
+
+            if frames.size()[0] < T:
+                for _ in range(T - frames.size()[0]):
+                    frames = torch.cat([frames, frames[-1].unsqueeze(0)], dim=0)
+                    idx.append(idx[-1])
+
+            out.append(torch.stack([frames[idx[i]] for i in range(T)], dim=0))
+
+        res.append(torch.cat(out, dim=3))
+
+    return res
+
+
+def _pack(n, w):
+    return torch.randint(0, 255, (n, 3, 6, w), dtype=torch.uint8)
+
+
+def test_fuse_frames_equal_reference():
+    T = 8
+    hparams = OmegaConf.create(
+        {"train": {"current_fold": 0, "uniform_temporal_subsample_num": T}, "data": {"tube_smooth": 1}}
+    )
+
+    # the long pack, the short pack (padded with the last frame), and the different widths.
+    first_phase = [_pack(12, 5), _pack(5, 4)]
+    second_phase = [_pack(10, 3), _pack(6, 7)]
+    first_sorted = [torch.randperm(12).tolist(), torch.randperm(5).tolist()]
+    second_sorted = [torch.randperm(10).tolist(), torch.randperm(6).tolist()]
+
+    expected = _reference_fuse_frames(T, first_phase, second_phase, first_sorted, second_sorted)
+    fused = PhaseMix(hparams).fuse_frames(first_phase, second_phase, first_sorted, second_sorted)
+
+    assert len(fused) == len(expected)
+    for a, b in zip(fused, expected):
+        assert a.shape == b.shape
+        assert torch.equal(a, b)
@@ -0,0 +1,33 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+pytest.importorskip("hydra")
+
+from project.dataloader.precrop import map_bbox, segment_windows
+
+
+def test_segment_windows():
+    tube = torch.tensor([[0, 0, 10, 10], [5, 5, 20, 20]], dtype=torch.int16)
+    gait_cycle_index = [2, 5, 9]
+
+    windows = segment_windows(tube, gait_cycle_index, 11)
+
+    # the frame before (after) the gait cycle uses the first (last) segment.
+    assert windows.shape == (11, 4)
+    assert windows[:5].tolist() == [[0, 0, 10, 10]] * 5
+    assert windows[5:].tolist() == [[5, 5, 20, 20]] * 6
+
+    # the chunk of the video, same windows as the whole video.
+    assert torch.equal(segment_windows(tube, gait_cycle_index, 8, 3), windows[3:8])
+
+
+def test_map_bbox():
+    regions = torch.tensor([[10.0, 20.0, 110.0, 220.0]] * 2)
+    bbox = [[60.0, 120.0, 20.0, 40.0], [10.0, 20.0, 100.0, 200.0]]
+
+    mapped = map_bbox(bbox, regions, 50)
+
+    assert mapped[0] == pytest.approx([25.0, 25.0, 10.0, 10.0])
+    # the region corner is the crop origin, the region size is the crop size.
+    assert mapped[1] == pytest.approx([0.0, 0.0, 50.0, 50.0])
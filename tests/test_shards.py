@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+torch = pytest.importorskip("torch")
+torchvision = pytest.importorskip("torchvision")
+pytest.importorskip("pytorch_lightning")
+pytest.importorskip("hydra")
+OmegaConf = pytest.importorskip("omegaconf").OmegaConf
+
+from torch.utils.data import DataLoader
+from torchvision.io import encode_jpeg
+
+from project.dataloader.shards import ShardedGaitVideoDataset, iter_tar, split_sample_num, split_shards, write_split
+from project.dataloader.utils import Div255
+
+
+def _write_samples(tmp_path, sample_num):
+    json_paths = []
+
+    for i in range(sample_num):
+        frames = torch.full((4, 3, 8, 8), i * 10, dtype=torch.uint8)
+        video_path = tmp_path / "videos" / f"{i}.pt"
+        video_path.parent.mkdir(exist_ok=True)
+        torch.save({"fps": 30, "frames": [encode_jpeg(f) for f in frames]}, video_path)
+
+        json_path = tmp_path / "json" / f"{i}.json"
+        json_path.parent.mkdir(exist_ok=True)
+        json_path.write_text(
+            json.dumps(
+                {
+                    "video_name": str(i),
+                    "video_path": str(video_path),
+                    "label": 0,
+                    "disease": "ASD",
+                    "gait_cycle_index": [0, 4],
+                    "none_index": [],
+                    "bbox": [[4, 4, 8, 8]] * 4,
+                    "filter_info": {},
+                }
+            )
+        )
+        json_paths.append(json_path)
+
+    return json_paths
+
+
+def test_shards_round_trip_two_workers(tmp_path):
+    json_paths = _write_samples(tmp_path, 9)
+    shard_root = tmp_path / "shards"
+
+    shard_num = write_split(json_paths, shard_root / "fold0", "train", "/workspace/data", 1e9, num_shards=2)
+    shards = split_shards(shard_root, 0, "train")
+
+    assert shard_num == len(shards) == 2
+    assert split_sample_num(shard_root, 0, "train") == 9
+    # the round robin, the shard j has the samples i % 2 == j.
+    assert [int(r["__key__"]) for r in iter_tar(shards[1])] == [1, 3, 5, 7]
+
+    hparams = OmegaConf.create(
+        {
+            "data": {"root_path": "/workspace/data"},
+            "train": {
+                "current_fold": 0,
+                "filter": False,
+                "temporal_mix": False,
+                "uniform_temporal_subsample_num": 2,
+            },
+        }
+    )
+    dataset = ShardedGaitVideoDataset(
+        "test", shards, Div255(), hparams, shuffle_buffer=3, sample_num=9
+    )
+
+    samples = list(DataLoader(dataset, batch_size=None, num_workers=2))
+
+    assert sorted(s["video_index"] for s in samples) == list(range(9))
+    for s in samples:
+        assert s["video"].shape == (2, 3, 2, 8, 8)
+        assert s["video_name"] == str(s["video_index"])
@@ -0,0 +1,43 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+pytest.importorskip("pytorch_lightning")
+
+from project.dataloader.utils import window_starts
+from project.inference.sliding_window import WindowAggregator, sliding_windows
+
+
+def test_window_starts():
+    # the stride same as the window is the non-overlapping clips, the remainder is dropped.
+    assert window_starts(20, 8, 8) == [0, 8]
+    assert window_starts(20, 8, 4) == [0, 4, 8, 12]
+    assert window_starts(20, 8, 8, tail=True) == [0, 8, 12]
+    assert window_starts(5, 8, 4, tail=True) == []
+
+
+@pytest.mark.parametrize("stride", [2, 4, 6])
+@pytest.mark.parametrize("tail", [False, True])
+def test_sliding_windows_same_as_window_starts(stride, tail):
+    frames = [torch.full((1, 2, 2), i) for i in range(11)]
+
+    windows = list(sliding_windows(iter(frames), 4, stride, lambda x: x, tail))
+    starts = [int(w[0, 0, 0, 0]) for w in windows]
+
+    assert starts == window_starts(11, 4, stride, tail)
+    for start, w in zip(starts, windows):
+        assert w[0, :, 0, 0].tolist() == list(range(start, start + 4))
+
+
+def test_window_aggregator_chunks():
+    probs = torch.softmax(torch.randn(3, 10, 4), dim=-1)
+
+    for method, expected in [
+        ("mean", probs.mean(dim=1)),
+        ("max", probs.amax(dim=1)),
+    ]:
+        aggregator = WindowAggregator(3, 4, method)
+        for chunk in probs.split(4, dim=1):
+            aggregator.update(chunk)
+
+        assert torch.allclose(aggregator.result(), expected)
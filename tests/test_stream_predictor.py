@@ -0,0 +1,28 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+pytest.importorskip("pytorch_lightning")
+pytest.importorskip("hydra")
+
+from project.dataloader.phase_mix import split_gait_cycle
+from project.inference.stream_predictor import split_cycle_range
+
+
+@pytest.mark.parametrize(
+    "gait_cycle_index",
+    [[0, 10], [0, 10, 20], [0, 10, 20, 30], [0, 10, 20, 30, 40], [0, 10, 20, 30, 40, 50]],
+)
+def test_split_cycle_range_covers_training_phases(gait_cycle_index):
+    video = torch.arange(60)
+
+    first, _ = split_gait_cycle(video, gait_cycle_index, 0)
+    second, _ = split_gait_cycle(video, gait_cycle_index, 1)
+
+    cycle_range = split_cycle_range(gait_cycle_index)
+
+    # every phase used in the training is in one of the cycles.
+    assert [video[s:m].tolist() for s, m, _ in cycle_range] == [p.tolist() for p in first]
+    # the single phase cycle (mid == end) uses the first phase as the second phase.
+    second_range = [video[m:e] if m != e else video[s:m] for s, m, e in cycle_range]
+    assert {tuple(p.tolist()) for p in second} <= {tuple(p.tolist()) for p in second_range}